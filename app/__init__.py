@@ -1 +1,6 @@
 # MasterCP Contest System
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env once, before any module reads them
+load_dotenv()
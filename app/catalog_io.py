@@ -0,0 +1,196 @@
+"""
+Streaming catalog format for standardized problems.
+
+The catalog is stored as JSON Lines: one header line, one line per problem and
+a trailing metadata line. Files ending in ``.gz`` are gzip-compressed and files
+ending in ``.zst`` are zstd-compressed (requires the optional ``zstandard``
+package). Writers and readers handle one record at a time, so neither side
+needs the whole catalog in memory.
+
+Legacy ``standardized_problems.json`` files (a single JSON document with a
+``problems`` array) can still be read, but are loaded in one go.
+"""
+
+import gzip
+import io
+import json
+import os
+import tempfile
+from typing import Any, Dict, IO, Iterable, Iterator, Optional
+
+CATALOG_FORMAT = "mastercp-catalog"
+CATALOG_VERSION = 1
+
+# Keys used for the non-problem lines of a JSON Lines catalog
+HEADER_KEY = "_catalog"
+METADATA_KEY = "_metadata"
+
+# Catalog file names, in order of preference when looking for a catalog
+CATALOG_FILENAMES = [
+    "standardized_problems.jsonl.zst",
+    "standardized_problems.jsonl.gz",
+    "standardized_problems.jsonl",
+    "standardized_problems.json",
+]
+
+
+def find_catalog_file(directory: str) -> str:
+    """
+    Return the preferred catalog file in a directory.
+
+    Falls back to the default compressed path when no catalog exists yet,
+    so callers get a meaningful path in their "not found" errors.
+    """
+    for filename in CATALOG_FILENAMES:
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            return path
+    return os.path.join(directory, CATALOG_FILENAMES[1])
+
+
+def _is_legacy_json(path: str) -> bool:
+    """Check whether a path points to a legacy single-document catalog."""
+    return path.endswith(".json")
+
+
+def catalog_compression(path: str) -> Optional[str]:
+    """Return the compression used for a catalog path ("gzip", "zstd" or None)."""
+    if path.endswith(".gz"):
+        return "gzip"
+    if path.endswith(".zst"):
+        return "zstd"
+    return None
+
+
+def open_catalog(path: str, mode: str = "r", compression: Optional[str] = None) -> IO[str]:
+    """
+    Open a catalog file as text.
+
+    Compression is taken from the file extension unless given explicitly.
+    """
+    if mode not in ("r", "w"):
+        raise ValueError(f"Unsupported catalog mode: {mode}")
+
+    if compression is None:
+        compression = catalog_compression(path)
+
+    if compression == "gzip":
+        return gzip.open(path, mode + "t", encoding="utf-8", compresslevel=6)
+
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise RuntimeError(
+                "zstd-compressed catalogs require the 'zstandard' package "
+                "(pip install zstandard)"
+            ) from e
+
+        if mode == "r":
+            raw = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        else:
+            raw = zstandard.ZstdCompressor(level=10).stream_writer(open(path, "wb"), closefd=True)
+        return io.TextIOWrapper(raw, encoding="utf-8")
+
+    return open(path, mode, encoding="utf-8")
+
+
+def write_catalog(
+    path: str,
+    records: Iterable[Dict[str, Any]],
+    metadata_factory=None,
+) -> int:
+    """
+    Stream problem records to a JSON Lines catalog.
+
+    Args:
+        path: Output path (``.jsonl``, ``.jsonl.gz`` or ``.jsonl.zst``)
+        records: Iterable of problem dicts, consumed lazily
+        metadata_factory: Optional callable returning the metadata dict; it is
+            called after all records have been written, so it can report
+            statistics gathered while streaming
+
+    Returns:
+        Number of records written
+    """
+    # Write to a temporary file first so readers never see a partial catalog.
+    # Its name is unique, so concurrent writers don't overwrite each other's.
+    directory, filename = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{filename}.", suffix=".tmp", dir=directory)
+    os.close(fd)
+    count = 0
+
+    try:
+        with open_catalog(tmp_path, "w", compression=catalog_compression(path)) as f:
+            header = {"format": CATALOG_FORMAT, "version": CATALOG_VERSION}
+            f.write(json.dumps({HEADER_KEY: header}) + "\n")
+
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+                f.write("\n")
+                count += 1
+
+            metadata = metadata_factory() if metadata_factory else {}
+            metadata.setdefault("total_problems", count)
+            f.write(json.dumps({METADATA_KEY: metadata}, ensure_ascii=False) + "\n")
+
+        # mkstemp creates the file readable by its owner only
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    return count
+
+
+def iter_catalog(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate over problem records in a catalog file.
+
+    JSON Lines catalogs are read one line at a time. Legacy ``.json``
+    catalogs are parsed in full and then iterated.
+    """
+    if _is_legacy_json(path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        yield from data.get("problems", [])
+        return
+
+    with open_catalog(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+
+            record = json.loads(line)
+
+            if HEADER_KEY in record:
+                header = record[HEADER_KEY]
+                if header.get("version", 0) > CATALOG_VERSION:
+                    raise ValueError(
+                        f"{path}: catalog version {header.get('version')} is newer "
+                        f"than supported version {CATALOG_VERSION}"
+                    )
+                continue
+
+            if METADATA_KEY in record:
+                continue
+
+            yield record
+
+
+def read_catalog_metadata(path: str) -> Optional[Dict[str, Any]]:
+    """Read the metadata of a catalog (scans the file for JSON Lines catalogs)."""
+    if _is_legacy_json(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("metadata")
+
+    metadata = None
+    with open_catalog(path, "r") as f:
+        for line in f:
+            if line.startswith('{"' + METADATA_KEY + '"'):
+                metadata = json.loads(line)[METADATA_KEY]
+    return metadata
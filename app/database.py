@@ -3,19 +3,23 @@ Database configuration and session management.
 Supports both SQLite (local development) and PostgreSQL (Neon production).
 """
 
+import hashlib
 import os
+from datetime import datetime
 
-from dotenv import load_dotenv
 from sqlalchemy import create_engine, text
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-# Load environment variables from .env file
-load_dotenv()
+from .instrumentation import instrument_engine
 
 # Database URL - defaults to SQLite if DATABASE_URL not set
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./mastercp.db")
 
+# SSL mode for PostgreSQL - Neon requires SSL, local servers usually don't support it
+DATABASE_SSLMODE = os.getenv("DATABASE_SSLMODE", "require")
+
 # Configure engine based on database type
 if "postgresql" in DATABASE_URL or "postgres" in DATABASE_URL:
     # PostgreSQL (Neon) configuration
@@ -27,7 +31,7 @@ if "postgresql" in DATABASE_URL or "postgres" in DATABASE_URL:
         max_overflow=10,  # Max connections beyond pool_size
         pool_recycle=300,  # Recycle connections after 5 minutes
         connect_args={
-            "sslmode": "require",  # Neon requires SSL
+            "sslmode": DATABASE_SSLMODE,  # Neon requires SSL
         },
     )
 elif "sqlite" in DATABASE_URL:
@@ -40,6 +44,9 @@ else:
     # Generic fallback
     engine = create_engine(DATABASE_URL)
 
+# Statement timings and pool usage for /metrics
+instrument_engine(engine)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -64,21 +71,108 @@ def get_database_type() -> str:
         return "Unknown"
 
 
-def init_db():
-    """Initialize database tables."""
+# Bump to force the schema checks on the next start even if no model changed
+# (for example after fixing a table by hand).
+SCHEMA_VERSION = 1
+
+
+def schema_version() -> str:
+    """
+    Version of the schema defined by the models.
+
+    Combines SCHEMA_VERSION with a hash of every table, column and index, so
+    any model change produces a new version.
+    """
+    digest = hashlib.sha256()
+    for table in sorted(Base.metadata.sorted_tables, key=lambda t: t.name):
+        digest.update(f"table {table.name}\n".encode())
+        for column in table.columns:
+            column_type = column.type.compile(dialect=engine.dialect)
+            digest.update(f"column {column.name} {column_type} {column.nullable}\n".encode())
+        for index in sorted(table.indexes, key=lambda i: i.name or ""):
+            columns = ",".join(c.name for c in index.columns)
+            digest.update(f"index {index.name} {columns} {index.unique}\n".encode())
+    return f"{SCHEMA_VERSION}-{digest.hexdigest()[:16]}"
+
+
+def init_db(force: bool = False):
+    """
+    Initialize database tables.
+
+    The table and column checks (create_all and _add_missing_columns) take
+    a round trip per table, so they only run when the schema version stored
+    in the database differs from the models' version.
+
+    Args:
+        force: Run the checks even if the stored version matches
+    """
     from . import models  # Import models to register them
 
     db_type = get_database_type()
     print(f"Connecting to database: {db_type}")
 
-    # Test connection
+    expected = schema_version()
+
+    # Test connection and read the stored schema version
     try:
         with engine.connect() as conn:
             conn.execute(text("SELECT 1"))
+            try:
+                stored = conn.execute(text("SELECT version FROM schema_version")).scalar()
+            except SQLAlchemyError:
+                stored = None  # No schema_version table yet
         print("Database connection successful!")
     except Exception as e:
         print(f"Warning: Could not verify database connection: {e}")
         raise
 
+    if stored == expected and not force:
+        print(f"Database schema up to date (version {expected})")
+        return
+
     Base.metadata.create_all(bind=engine)
-    print(f"Database tables initialized ({db_type})")
+    _add_missing_columns()
+
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM schema_version"))
+        conn.execute(
+            text("INSERT INTO schema_version (version, applied_at) VALUES (:version, :applied_at)"),
+            {"version": expected, "applied_at": datetime.utcnow()},
+        )
+    print(f"Database tables initialized ({db_type}, schema version {expected})")
+
+
+def _add_missing_columns():
+    """
+    Add nullable columns that were added to a model after its table was created.
+
+    create_all only creates missing tables, so existing databases would
+    otherwise never get new columns.
+    """
+    from sqlalchemy import inspect
+
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+
+            existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns or not column.nullable:
+                    continue
+
+                column_type = column.type.compile(dialect=engine.dialect)
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+
+                foreign_keys = list(column.foreign_keys)
+                if len(foreign_keys) == 1:
+                    fk = foreign_keys[0]
+                    ddl += f" REFERENCES {fk.column.table.name}({fk.column.name})"
+                    if fk.ondelete:
+                        ddl += f" ON DELETE {fk.ondelete}"
+
+                conn.execute(text(ddl))
+                print(f"Added column {table.name}.{column.name}")
@@ -0,0 +1,419 @@
+"""
+Request, database and LLM instrumentation.
+
+Collects metrics in-process and renders them in the Prometheus text format
+for the /metrics endpoint:
+
+- HTTP: request counts and latency histograms per route template, requests
+  in progress, and database statements per request (finds N+1 patterns)
+- Database: statement counts and durations per operation (SQLAlchemy
+  cursor events), connection pool usage and capacity
+- LLM providers: call counts and durations per provider and outcome
+
+Metrics are per process; with several uvicorn workers each worker reports
+its own numbers. Set METRICS_ENABLED=false to turn collection off.
+"""
+
+import functools
+import os
+import time
+from contextvars import ContextVar
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Histogram buckets (seconds)
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+LLM_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 90.0, 120.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Route label for requests that matched no route (keeps label values bounded)
+UNMATCHED_ROUTE = "<unmatched>"
+
+# SQL operations tracked by name; anything else is counted as "OTHER"
+_SQL_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "BEGIN", "COMMIT", "ROLLBACK", "WITH"}
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """Base class: a named metric with a fixed set of label names."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, set directly or read from a callback."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        callback: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None,
+    ):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callback = callback
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self) -> List[str]:
+        if self._callback is not None:
+            try:
+                values = list(self._callback().items())
+            except Exception:
+                values = []
+        else:
+            with self._lock:
+                values = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = HTTP_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # key -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [0.0] * (len(self.buckets) + 2)
+                self._values[key] = state
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = [(key, list(state)) for key, state in self._values.items()]
+
+        lines = []
+        for key, state in values:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {_format_value(cumulative)}"
+                )
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(state[-1])}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP requests by route template and status.",
+    ["method", "route", "status"],
+))
+HTTP_LATENCY = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.",
+    ["method", "route"], buckets=HTTP_BUCKETS,
+))
+HTTP_IN_PROGRESS = REGISTRY.register(Gauge(
+    "http_requests_in_progress", "HTTP requests being handled.",
+))
+HTTP_DB_STATEMENTS = REGISTRY.register(Histogram(
+    "http_request_db_statements", "Database statements executed per HTTP request.",
+    ["method", "route"], buckets=COUNT_BUCKETS,
+))
+DB_STATEMENTS = REGISTRY.register(Counter(
+    "db_statements_total", "Database statements by operation.",
+    ["operation"],
+))
+DB_LATENCY = REGISTRY.register(Histogram(
+    "db_statement_duration_seconds", "Database statement execution time by operation.",
+    ["operation"], buckets=DB_BUCKETS,
+))
+DB_ERRORS = REGISTRY.register(Counter(
+    "db_statement_errors_total", "Database statements that raised an error.",
+    ["operation"],
+))
+LLM_REQUESTS = REGISTRY.register(Counter(
+    "llm_requests_total", "LLM provider calls by provider and outcome.",
+    ["provider", "outcome"],
+))
+LLM_LATENCY = REGISTRY.register(Histogram(
+    "llm_request_duration_seconds", "LLM provider call latency.",
+    ["provider", "outcome"], buckets=LLM_BUCKETS,
+))
+
+# Statement counter of the request being handled (shared with threadpool workers)
+_request_statements: ContextVar[Optional[List[int]]] = ContextVar("request_statements", default=None)
+
+
+# ---------------------------------------------------------------------- #
+# HTTP
+# ---------------------------------------------------------------------- #
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and DB statements per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        status_holder = [500]
+        statements = [0]
+        token = _request_statements.set(statements)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        HTTP_IN_PROGRESS.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_PROGRESS.dec()
+            _request_statements.reset(token)
+
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or UNMATCHED_ROUTE
+            method = scope.get("method", "")
+
+            HTTP_REQUESTS.inc(method=method, route=route_path, status=status_holder[0])
+            HTTP_LATENCY.observe(elapsed, method=method, route=route_path)
+            HTTP_DB_STATEMENTS.observe(statements[0], method=method, route=route_path)
+
+
+# ---------------------------------------------------------------------- #
+# Database
+# ---------------------------------------------------------------------- #
+
+def _operation(statement: str) -> str:
+    words = statement.lstrip().split(None, 1)
+    operation = words[0].upper() if words else ""
+    return operation if operation in _SQL_OPERATIONS else "OTHER"
+
+
+def instrument_engine(engine) -> None:
+    """Record statement counts and durations and pool usage for an engine."""
+    if not METRICS_ENABLED:
+        return
+
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        operation = _operation(statement)
+        DB_STATEMENTS.inc(operation=operation)
+        DB_LATENCY.observe(elapsed, operation=operation)
+
+        statements = _request_statements.get()
+        if statements is not None:
+            statements[0] += 1
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_start"):
+            connection.info["query_start"].pop()
+        DB_ERRORS.inc(operation=_operation(exception_context.statement or ""))
+
+    _register_pool_gauges(engine)
+
+
+def _register_pool_gauges(engine) -> None:
+    """Expose connection pool usage, read when /metrics is scraped."""
+    pool = engine.pool
+
+    def read(method: str) -> Callable[[], Dict[Tuple[str, ...], float]]:
+        def callback():
+            reader = getattr(pool, method, None)
+            return {(): float(reader())} if reader else {}
+        return callback
+
+    def capacity() -> Dict[Tuple[str, ...], float]:
+        size = getattr(pool, "size", None)
+        if size is None:
+            return {}
+        return {(): float(size() + max(getattr(pool, "_max_overflow", 0), 0))}
+
+    REGISTRY.register(Gauge(
+        "db_pool_checked_out", "Connections currently checked out of the pool.",
+        callback=read("checkedout"),
+    ))
+    REGISTRY.register(Gauge(
+        "db_pool_checked_in", "Idle connections in the pool.",
+        callback=read("checkedin"),
+    ))
+    REGISTRY.register(Gauge(
+        "db_pool_overflow", "Connections open beyond the pool size (negative while the pool is not full).",
+        callback=read("overflow"),
+    ))
+    REGISTRY.register(Gauge(
+        "db_pool_max_connections", "Maximum connections the pool will open (pool size + max overflow).",
+        callback=capacity,
+    ))
+
+
+# ---------------------------------------------------------------------- #
+# LLM providers
+# ---------------------------------------------------------------------- #
+
+def record_llm_call(provider: str, seconds: float, outcome: str) -> None:
+    """Record one LLM provider call."""
+    if not METRICS_ENABLED:
+        return
+    LLM_REQUESTS.inc(provider=provider, outcome=outcome)
+    LLM_LATENCY.observe(seconds, provider=provider, outcome=outcome)
+
+
+def timed_llm_call(provider: str):
+    """
+    Decorator for async provider calls returning {"content": ..., "error": ...}.
+
+    The outcome is "success" when content came back, "timeout" for timeout
+    errors and "error" otherwise.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                result = await func(*args, **kwargs)
+                if result.get("content"):
+                    outcome = "success"
+                elif "timed out" in (result.get("error") or ""):
+                    outcome = "timeout"
+                return result
+            finally:
+                record_llm_call(provider, time.perf_counter() - start, outcome)
+        return wrapper
+    return decorator
+
+
+def render_metrics() -> str:
+    """Render all metrics for the /metrics endpoint."""
+    return REGISTRY.render()
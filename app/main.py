@@ -12,37 +12,96 @@ Run with: uvicorn app.main:app --reload
 
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-
-from .database import DATABASE_URL, get_database_type, init_db
-from .routers import contests, reflections, users
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy.orm import Session
+
+from .database import DATABASE_URL, SessionLocal, get_database_type, get_db, init_db
+from .instrumentation import CONTENT_TYPE, MetricsMiddleware, render_metrics
+from .profiling import ProfilingMiddleware, install_request_profiling
+from .routers import admin, contests, reflections, users
+from .services.contest_packs import get_contest_pack_service
+from .services.contest_scheduler import get_contest_scheduler
+from .services.invalidation_bus import get_invalidation_bus
+from .services.model_catalog import get_model_catalog
+from .services.openrouter_service import gemini_api_keys
 from .services.problem_service import get_problem_service
+from .services.stats_service import (
+    CONTESTS,
+    CONTESTS_ACTIVE,
+    CONTESTS_COMPLETED,
+    USERS,
+    get_stats_service,
+)
+from .startup import get_startup_tracker
+
+
+def _load_problems() -> None:
+    """Load the problem catalog (runs in a background thread at startup)."""
+    problem_service = get_problem_service()
+    try:
+        problem_service.load_problems()
+    except FileNotFoundError:
+        print("Run standardize_difficulty.py first to generate the problems file")
+        raise
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Application lifespan handler."""
+    """
+    Application lifespan handler.
+
+    Only the database check runs before the server accepts requests; the
+    problem catalog loads in the background (see /ready).
+    """
     # Startup
     print("Starting MasterCP Contest System...")
+    startup = get_startup_tracker()
 
-    # Initialize database
-    init_db()
+    # Initialize database (table checks only run when the schema version changed)
+    startup.run("database", init_db)
     print("Database initialized")
 
-    # Pre-load problems
-    try:
-        problem_service = get_problem_service()
-        problem_service.load_problems()
-        print(f"Loaded {len(problem_service._problems)} problems")
-    except FileNotFoundError as e:
-        print(f"Warning: Could not load problems: {e}")
-        print("Run standardize_difficulty.py first to generate the problems file")
+    # Load problems in the background; requests that need them wait for the load
+    startup.run_in_background("catalog", _load_problems)
+
+    # Receive cache invalidations from other workers
+    invalidation_bus = get_invalidation_bus()
+    invalidation_bus.start()
+    print(f"Cache invalidation bus: {invalidation_bus.backend}")
+
+    # Recount statistics counters in the background, then periodically
+    stats_service = get_stats_service()
+    stats_service.start(SessionLocal)
+
+    # Precompute contest packs in the background (after the catalog loads)
+    pack_service = get_contest_pack_service()
+    pack_service.start(SessionLocal)
+
+    # End contests at their time limit (heap of deadlines, rebuilt from the database)
+    contest_scheduler = get_contest_scheduler()
+    contest_scheduler.start(SessionLocal)
+
+    # Allow per-request cProfile capture (X-Profile header, admin only)
+    install_request_profiling(app)
+
+    # Discover Gemini models in the background (reflections never wait for it)
+    model_catalog = get_model_catalog()
+    model_catalog.start(gemini_api_keys())
+
+    seconds = startup.mark_serving()
+    print(f"Accepting requests {seconds:.2f}s after process start")
 
     yield
 
     # Shutdown
     print("Shutting down MasterCP Contest System...")
+    await model_catalog.stop()
+    await stats_service.stop()
+    await pack_service.stop()
+    await contest_scheduler.stop()
+    invalidation_bus.stop()
 
 
 app = FastAPI(
@@ -87,10 +146,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request profiling (X-Profile header with the admin token)
+app.add_middleware(ProfilingMiddleware)
+
+# Request metrics (outermost, so it times the whole request)
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(users.router)
 app.include_router(contests.router)
 app.include_router(reflections.router)
+app.include_router(admin.router)
 
 
 @app.get("/", tags=["root"])
@@ -109,10 +175,27 @@ def read_root():
 
 @app.get("/health", tags=["health"])
 def health_check():
-    """Health check endpoint."""
+    """Health (liveness) check endpoint. Does not wait for startup to finish."""
     return {"status": "healthy", "database": get_database_type()}
 
 
+@app.get("/ready", tags=["health"])
+def readiness_check():
+    """
+    Readiness check: 200 once the database is initialized and the problem
+    catalog is loaded, 503 before that. Includes startup phase timings.
+    """
+    startup_status = get_startup_tracker().status()
+    status_code = 200 if startup_status["ready"] else 503
+    return JSONResponse(status_code=status_code, content=startup_status)
+
+
+@app.get("/metrics", tags=["health"], include_in_schema=False)
+def metrics():
+    """Prometheus metrics (latency per route, DB statements, pool usage, LLM calls)."""
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
+
+
 @app.get("/database-info", tags=["health"])
 def database_info():
     """Get information about the current database connection."""
@@ -161,33 +244,16 @@ def database_info():
 
 
 @app.get("/stats", tags=["stats"])
-def get_system_stats():
-    """Get system statistics."""
-    from .database import SessionLocal
-    from .models import Contest, ContestStatus, User
+def get_system_stats(db: Session = Depends(get_db)):
+    """Get system statistics (from the counters table, cached briefly)."""
+    counters = get_stats_service().get_stats(db)
 
-    db = SessionLocal()
-    try:
-        total_users = db.query(User).count()
-        total_contests = db.query(Contest).count()
-        active_contests = (
-            db.query(Contest).filter(Contest.status == ContestStatus.ACTIVE).count()
-        )
-        completed_contests = (
-            db.query(Contest).filter(Contest.status == ContestStatus.COMPLETED).count()
-        )
-
-        problem_service = get_problem_service()
-        total_problems = (
-            len(problem_service._problems) if problem_service._loaded else 0
-        )
-
-        return {
-            "total_users": total_users,
-            "total_contests": total_contests,
-            "active_contests": active_contests,
-            "completed_contests": completed_contests,
-            "total_problems_available": total_problems,
-        }
-    finally:
-        db.close()
+    total_problems = get_problem_service().problem_count()
+
+    return {
+        "total_users": counters[USERS],
+        "total_contests": counters[CONTESTS],
+        "active_contests": counters[CONTESTS_ACTIVE],
+        "completed_contests": counters[CONTESTS_COMPLETED],
+        "total_problems_available": total_problems,
+    }
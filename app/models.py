@@ -4,10 +4,8 @@ Supports both SQLite and PostgreSQL (Neon).
 """
 
 import enum
-import os
 from datetime import datetime
 
-from dotenv import load_dotenv
 from sqlalchemy import (
     JSON,
     Boolean,
@@ -17,6 +15,7 @@ from sqlalchemy import (
     ForeignKey,
     Index,
     Integer,
+    LargeBinary,
     String,
     Text,
     UniqueConstraint,
@@ -25,14 +24,10 @@ from sqlalchemy import Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
-from .database import Base
-
-# Load environment variables and determine database type
-load_dotenv()
-_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./mastercp.db")
+from .database import DATABASE_URL, Base
 
 # Determine if we're using PostgreSQL for native enum support
-IS_POSTGRESQL = "postgresql" in _DATABASE_URL or "postgres" in _DATABASE_URL
+IS_POSTGRESQL = "postgresql" in DATABASE_URL or "postgres" in DATABASE_URL
 
 
 class ContestStatus(enum.Enum):
@@ -292,8 +287,13 @@ class ProblemReflection(Base):
     )
 
     # User-provided editorial (can be text or URL)
+    # New editorial text lives in the shared editorial store (editorial_id);
+    # editorial_text is only set on rows created before the store existed
     editorial_text = Column(Text, nullable=True)
     editorial_url = Column(String(500), nullable=True)
+    editorial_id = Column(
+        Integer, ForeignKey("editorials.id", ondelete="SET NULL"), nullable=True
+    )
 
     # AI-generated reflection content
     pivot_sentence = Column(Text, nullable=True)  # The key insight of the problem
@@ -317,3 +317,71 @@ class ProblemReflection(Base):
     contest_problem = relationship("ContestProblem", back_populates="reflection")
 
     __table_args__ = (Index("idx_reflection_contest_problem", "contest_problem_id"),)
+
+
+class Editorial(Base):
+    """Editorial text shared across users, stored once per distinct content."""
+
+    __tablename__ = "editorials"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # SHA-256 of the normalized text; identical editorials are stored once
+    content_hash = Column(String(64), unique=True, nullable=False)
+
+    # zlib-compressed UTF-8 text
+    content = Column(LargeBinary, nullable=False)
+    content_length = Column(Integer, nullable=False)  # uncompressed characters
+
+    source_url = Column(String(500), nullable=True)
+    created_at = Column(DateTime, default=func.now())
+
+
+class ProblemEditorial(Base):
+    """Maps a catalog problem to its editorial in the shared store."""
+
+    __tablename__ = "problem_editorials"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # Catalog problem ID (e.g. "cf-2191-B")
+    problem_id = Column(String(100), nullable=False, unique=True, index=True)
+    editorial_id = Column(
+        Integer, ForeignKey("editorials.id", ondelete="CASCADE"), nullable=False
+    )
+
+    # Where the editorial came from: "codeforces" (prefetched) or "user"
+    source = Column(String(50), nullable=False)
+    fetched_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    editorial = relationship("Editorial")
+
+
+class SystemCounter(Base):
+    """
+    Named counter for system statistics (users, contests by status).
+
+    Updated in the same transaction as the change it counts, so /stats can
+    read every figure from this small table instead of counting rows.
+    """
+
+    __tablename__ = "system_counters"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(50), unique=True, nullable=False)
+    value = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+
+class SchemaVersion(Base):
+    """
+    Schema version the database was last migrated to.
+
+    init_db compares it with the version of the current models and only runs
+    the (slow) table and column checks when they differ.
+    """
+
+    __tablename__ = "schema_version"
+
+    version = Column(String(100), primary_key=True)
+    applied_at = Column(DateTime, default=func.now())
@@ -0,0 +1,428 @@
+"""
+On-demand profiling for a running server.
+
+Two tools, both usable without restarting uvicorn:
+
+- SamplingProfiler: a background thread that samples the stacks of all
+  threads (sys._current_frames) at a fixed interval and aggregates them as
+  collapsed stacks ("frame;frame;frame count"), the input format of
+  flamegraph.pl, speedscope and similar tools. It is started and stopped at
+  runtime and costs nothing while stopped.
+
+- Per-request cProfile: a request sent with the "X-Profile: 1" header (and
+  the admin token) is profiled with cProfile. The profile is kept in memory
+  and can be fetched from the admin endpoints by the id returned in the
+  X-Profile-Id response header. For sync endpoints (run in a threadpool
+  worker) the profile covers the request alone. For async endpoints it is
+  enabled on the event loop thread while the endpoint awaits, so it also
+  records whatever other requests' coroutines run on the loop meanwhile;
+  profile those on an otherwise idle worker.
+
+Everything is disabled unless ADMIN_TOKEN is set. Profiles are kept per
+process: with several uvicorn workers, fetch results from the worker that
+handled the request (see the X-Profile-Worker response header).
+"""
+
+import cProfile
+import functools
+import hmac
+import inspect
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Header names
+PROFILE_HEADER = "x-profile"
+ADMIN_TOKEN_HEADER = "x-admin-token"
+
+# Sampler limits
+DEFAULT_SAMPLE_INTERVAL = 0.01
+MIN_SAMPLE_INTERVAL = 0.001
+MAX_SAMPLE_DURATION = 600.0
+MAX_STACK_DEPTH = 128
+
+# Number of request profiles kept in memory
+MAX_REQUEST_PROFILES = 50
+
+# Leaf frames of threads that are waiting rather than working
+_IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("socket.py", "accept"),
+    ("_base.py", "result"),
+    # Idle threadpool worker, blocked in SimpleQueue.get (implemented in C)
+    ("thread.py", "_worker"),
+}
+
+
+def profiling_enabled() -> bool:
+    """Profiling is opt-in: it needs an admin token."""
+    return bool(ADMIN_TOKEN)
+
+
+def check_admin_token(token: Optional[str]) -> bool:
+    """Compare a token with ADMIN_TOKEN in constant time."""
+    # As bytes: compare_digest rejects non-ASCII str
+    return bool(ADMIN_TOKEN) and bool(token) and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+def _frame_label(code) -> str:
+    """Label a stack frame as "function (file:line)" (line of the definition)."""
+    filename = os.path.basename(code.co_filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+# ---------------------------------------------------------------------- #
+# Sampling profiler
+# ---------------------------------------------------------------------- #
+
+class SamplingProfiler:
+    """Low-overhead sampling profiler producing collapsed stacks."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stacks: Counter = Counter()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+        self.interval = DEFAULT_SAMPLE_INTERVAL
+        self.include_idle = False
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+        self.deadline: Optional[float] = None
+        self.samples = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(
+        self,
+        interval: float = DEFAULT_SAMPLE_INTERVAL,
+        duration: float = 60.0,
+        include_idle: bool = False,
+    ) -> None:
+        """
+        Start sampling (clears earlier samples).
+
+        Args:
+            interval: Seconds between samples
+            duration: Stop automatically after this many seconds
+            include_idle: Also record threads that are only waiting
+
+        Raises:
+            RuntimeError: If the profiler is already running
+        """
+        with self._lock:
+            if self.running:
+                raise RuntimeError("Sampling profiler is already running")
+
+            self.interval = max(interval, MIN_SAMPLE_INTERVAL)
+            self.include_idle = include_idle
+            self._stacks = Counter()
+            self.samples = 0
+            self.started_at = time.time()
+            self.stopped_at = None
+            self.deadline = time.monotonic() + min(duration, MAX_SAMPLE_DURATION)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling; collected stacks remain available."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5)
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        names = {}
+        try:
+            while not self._stop.is_set() and time.monotonic() < self.deadline:
+                started = time.perf_counter()
+                if len(names) != threading.active_count():
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                self._sample(own_id, names)
+                elapsed = time.perf_counter() - started
+                self._stop.wait(max(self.interval - elapsed, 0))
+        finally:
+            self.stopped_at = time.time()
+
+    def _sample(self, own_id: int, names: Dict[int, str]) -> None:
+        """Record one stack per thread."""
+        frames = sys._current_frames()
+        collected = []
+        for thread_id, frame in frames.items():
+            if thread_id == own_id:
+                continue
+
+            if not self.include_idle:
+                leaf = (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name)
+                if leaf in _IDLE_LEAVES:
+                    continue
+
+            labels = []
+            while frame is not None and len(labels) < MAX_STACK_DEPTH:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            labels.append(names.get(thread_id, f"thread-{thread_id}"))
+            collected.append(";".join(reversed(labels)))
+        del frames
+
+        with self._lock:
+            self._stacks.update(collected)
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Return the samples as collapsed stacks, one "stack count" per line."""
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def status(self) -> Dict[str, Any]:
+        """Return the profiler state."""
+        with self._lock:
+            distinct = len(self._stacks)
+        return {
+            "running": self.running,
+            "interval_seconds": self.interval,
+            "include_idle": self.include_idle,
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+            "samples": self.samples,
+            "distinct_stacks": distinct,
+        }
+
+
+# ---------------------------------------------------------------------- #
+# Per-request cProfile
+# ---------------------------------------------------------------------- #
+
+@dataclass
+class RequestProfile:
+    """cProfile capture of one request."""
+    id: str
+    method: str
+    path: str
+    created_at: float
+    duration_seconds: float = 0.0
+    status: int = 0
+    profiles: List[cProfile.Profile] = field(default_factory=list, repr=False)
+
+    def stats(self) -> Optional[pstats.Stats]:
+        """Combined stats of every thread that worked on the request."""
+        stats = None
+        for profile in self.profiles:
+            if stats is None:
+                stats = pstats.Stats(profile, stream=io.StringIO())
+            else:
+                stats.add(profile)
+        return stats
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "created_at": self.created_at,
+            "duration_seconds": round(self.duration_seconds, 6),
+            "status": self.status,
+        }
+
+    def render_text(self, sort: str = "cumulative", limit: int = 50) -> str:
+        """Render the profile as pstats text."""
+        stats = self.stats()
+        if stats is None:
+            return "No profile data was recorded for this request.\n"
+        stream = io.StringIO()
+        stats.stream = stream
+        stats.sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+    def render_pstats(self) -> bytes:
+        """Dump the profile in the binary pstats format (for snakeviz, pstats.Stats)."""
+        stats = self.stats()
+        return marshal.dumps(stats.stats if stats is not None else {})
+
+
+class RequestProfileStore:
+    """Keeps the most recent request profiles in memory."""
+
+    def __init__(self, max_profiles: int = MAX_REQUEST_PROFILES):
+        self.max_profiles = max_profiles
+        self._profiles: "OrderedDict[str, RequestProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles[profile.id] = profile
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            profiles = list(self._profiles.values())
+        return [profile.summary() for profile in reversed(profiles)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._profiles.clear()
+
+
+# Profile of the request being handled (copied into threadpool workers)
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+
+# cProfile allows one active profiler per thread; the event loop thread runs
+# async endpoints of every request, so only one request is profiled at a time
+_profile_slot = threading.Lock()
+
+
+def _profiled_endpoint(call):
+    """Wrap an endpoint so it runs under the request's cProfile, if any."""
+    if inspect.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def async_wrapper(**kwargs):
+            # The profile is active on the event loop thread across awaits,
+            # so it also records other coroutines that run meanwhile
+            request_profile = _current_profile.get()
+            if request_profile is None:
+                return await call(**kwargs)
+            profile = cProfile.Profile()
+            request_profile.profiles.append(profile)
+            profile.enable()
+            try:
+                return await call(**kwargs)
+            finally:
+                profile.disable()
+        return async_wrapper
+
+    @functools.wraps(call)
+    def wrapper(**kwargs):
+        # Sync endpoints run in a threadpool worker: cProfile has to be
+        # enabled in that thread, not in the event loop thread
+        request_profile = _current_profile.get()
+        if request_profile is None:
+            return call(**kwargs)
+        profile = cProfile.Profile()
+        request_profile.profiles.append(profile)
+        profile.enable()
+        try:
+            return call(**kwargs)
+        finally:
+            profile.disable()
+    return wrapper
+
+
+def install_request_profiling(app) -> None:
+    """
+    Make every API route of the app profilable per request.
+
+    Call after all routers are included. Endpoints are wrapped in place;
+    the wrapper only checks a context variable unless a profiled request
+    is running.
+    """
+    from fastapi.routing import APIRoute
+
+    for route in app.routes:
+        if isinstance(route, APIRoute) and not getattr(route.dependant.call, "_profilable", False):
+            route.dependant.call = _profiled_endpoint(route.dependant.call)
+            route.dependant.call._profilable = True
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles requests carrying X-Profile and the admin token."""
+
+    def __init__(self, app, store: Optional[RequestProfileStore] = None):
+        self.app = app
+        self.store = store or get_request_profile_store()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profiling_enabled():
+            await self.app(scope, receive, send)
+            return
+
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        if headers.get(PROFILE_HEADER, "").lower() not in ("1", "true", "yes"):
+            await self.app(scope, receive, send)
+            return
+        if not check_admin_token(headers.get(ADMIN_TOKEN_HEADER)):
+            await self.app(scope, receive, send)
+            return
+
+        if not _profile_slot.acquire(blocking=False):
+            await self.app(scope, receive, self._with_headers(send, [(b"x-profile-status", b"busy")]))
+            return
+
+        request_profile = RequestProfile(
+            id=uuid.uuid4().hex[:12],
+            method=scope.get("method", ""),
+            path=scope.get("path", ""),
+            created_at=time.time(),
+        )
+        extra_headers = [
+            (b"x-profile-id", request_profile.id.encode()),
+            (b"x-profile-worker", str(os.getpid()).encode()),
+        ]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                request_profile.status = message["status"]
+            await send(message)
+
+        token = _current_profile.set(request_profile)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, self._with_headers(send_wrapper, extra_headers))
+        finally:
+            request_profile.duration_seconds = time.perf_counter() - start
+            _current_profile.reset(token)
+            _profile_slot.release()
+            self.store.add(request_profile)
+
+    @staticmethod
+    def _with_headers(send, extra_headers):
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + extra_headers
+            await send(message)
+        return send_with_headers
+
+
+# Singleton instances
+_sampling_profiler: Optional[SamplingProfiler] = None
+_request_profile_store: Optional[RequestProfileStore] = None
+
+
+def get_sampling_profiler() -> SamplingProfiler:
+    """Get the singleton sampling profiler instance."""
+    global _sampling_profiler
+    if _sampling_profiler is None:
+        _sampling_profiler = SamplingProfiler()
+    return _sampling_profiler
+
+
+def get_request_profile_store() -> RequestProfileStore:
+    """Get the singleton request profile store instance."""
+    global _request_profile_store
+    if _request_profile_store is None:
+        _request_profile_store = RequestProfileStore()
+    return _request_profile_store
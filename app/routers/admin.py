@@ -0,0 +1,130 @@
+"""
+Admin API routes for profiling a running server.
+
+All routes require the X-Admin-Token header to match ADMIN_TOKEN. When
+ADMIN_TOKEN is not set the routes respond with 404.
+"""
+
+import os
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse, Response
+from typing import Optional
+
+from ..profiling import (
+    check_admin_token,
+    get_request_profile_store,
+    get_sampling_profiler,
+    profiling_enabled,
+)
+
+# pstats sort keys accepted by /profiles/{id}
+SORT_KEYS = ["cumulative", "tottime", "calls", "ncalls", "filename", "name"]
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    """Dependency that rejects requests without a valid admin token."""
+    if not profiling_enabled():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not check_admin_token(x_admin_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+@router.post("/profiler/start")
+def start_sampling_profiler(
+    interval_ms: float = Query(10.0, ge=1.0, le=1000.0),
+    duration_seconds: float = Query(60.0, gt=0, le=600.0),
+    include_idle: bool = False,
+):
+    """
+    Start the sampling profiler in this worker.
+
+    It stops by itself after duration_seconds. Starting clears the samples
+    of the previous run.
+    """
+    profiler = get_sampling_profiler()
+    try:
+        profiler.start(
+            interval=interval_ms / 1000.0,
+            duration=duration_seconds,
+            include_idle=include_idle,
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    return {"worker": os.getpid(), **profiler.status()}
+
+
+@router.post("/profiler/stop")
+def stop_sampling_profiler():
+    """Stop the sampling profiler (samples are kept until the next start)."""
+    profiler = get_sampling_profiler()
+    profiler.stop()
+    return {"worker": os.getpid(), **profiler.status()}
+
+
+@router.get("/profiler/status")
+def sampling_profiler_status():
+    """Get the sampling profiler state of this worker."""
+    return {"worker": os.getpid(), **get_sampling_profiler().status()}
+
+
+@router.get("/profiler/collapsed", response_class=PlainTextResponse)
+def sampling_profiler_collapsed():
+    """
+    Get the samples as collapsed stacks.
+
+    Feed the output to flamegraph.pl or open it in speedscope.
+    """
+    return PlainTextResponse(get_sampling_profiler().collapsed())
+
+
+@router.get("/profiles")
+def list_request_profiles():
+    """List the request profiles kept by this worker (newest first)."""
+    return {"worker": os.getpid(), "profiles": get_request_profile_store().list()}
+
+
+@router.get("/profiles/{profile_id}")
+def get_request_profile(
+    profile_id: str,
+    format: str = Query("text", pattern="^(text|pstats)$"),
+    sort: str = Query("cumulative"),
+    limit: int = Query(50, ge=1, le=1000),
+):
+    """
+    Get a request profile.
+
+    format=text returns pstats output sorted by `sort`; format=pstats returns
+    the binary stats file (load with pstats.Stats or snakeviz).
+    """
+    if sort not in SORT_KEYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"sort must be one of {SORT_KEYS}",
+        )
+
+    profile = get_request_profile_store().get(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Profile {profile_id} not found in worker {os.getpid()}",
+        )
+
+    if format == "pstats":
+        return Response(
+            content=profile.render_pstats(),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.prof"'},
+        )
+    return PlainTextResponse(profile.render_text(sort=sort, limit=limit))
+
+
+@router.delete("/profiles")
+def clear_request_profiles():
+    """Delete all request profiles kept by this worker."""
+    get_request_profile_store().clear()
+    return {"message": "Profiles cleared"}
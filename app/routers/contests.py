@@ -2,7 +2,7 @@
 Contest management API routes.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
@@ -14,6 +14,7 @@ from ..schemas import (
     ContestResult, ProblemResult
 )
 from ..services.contest_service import get_contest_service
+from ..services.editorial_prefetcher import get_editorial_prefetcher
 
 router = APIRouter(prefix="/contests", tags=["contests"])
 
@@ -21,6 +22,7 @@ router = APIRouter(prefix="/contests", tags=["contests"])
 @router.post("/start/{user_id}", response_model=ContestDetailResponse, status_code=status.HTTP_201_CREATED)
 def start_contest(
     user_id: int,
+    background_tasks: BackgroundTasks,
     contest_config: ContestCreate = None,
     db: Session = Depends(get_db)
 ):
@@ -31,6 +33,8 @@ def start_contest(
     - Select problems at user's rating + 10 difficulty
     - Distribute topics across problems
     - Include weak topic problems if any exist
+
+    Editorials of the selected problems are prefetched in the background.
     """
     if contest_config is None:
         contest_config = ContestCreate()
@@ -52,6 +56,11 @@ def start_contest(
             detail=str(e)
         )
 
+    background_tasks.add_task(
+        get_editorial_prefetcher().prefetch_for_contest,
+        [problem.problem_id for problem in contest.problems],
+    )
+
     return contest
 
 
@@ -125,7 +134,7 @@ def submit_problem(
     contest_service = get_contest_service()
 
     try:
-        contest_problem = contest_service.submit_problem(
+        outcome = contest_service.submit_problem(
             db=db,
             contest_id=contest_id,
             problem_id=submission.problem_id,
@@ -143,8 +152,8 @@ def submit_problem(
     return SubmissionResponse(
         contest_id=contest_id,
         problem_id=submission.problem_id,
-        status=contest_problem.status.value,
-        time_taken_seconds=contest_problem.time_taken_seconds,
+        status=outcome.status.value,
+        time_taken_seconds=outcome.time_taken_seconds,
         message="Problem submitted successfully",
     )
 
@@ -160,33 +169,29 @@ def submit_all_problems(
     Useful for submitting all results at the end of a contest.
     """
     contest_service = get_contest_service()
-    results = []
+    outcomes = contest_service.submit_problems(
+        db=db,
+        contest_id=contest_id,
+        submissions=[submission.model_dump() for submission in submissions.submissions],
+    )
 
-    for submission in submissions.submissions:
-        try:
-            contest_problem = contest_service.submit_problem(
-                db=db,
-                contest_id=contest_id,
-                problem_id=submission.problem_id,
-                solved=submission.solved,
-                partial=submission.partial,
-                time_taken_seconds=submission.time_taken_seconds,
-                user_approach=submission.user_approach,
-            )
+    results = []
+    for outcome in outcomes:
+        if outcome.error:
             results.append(SubmissionResponse(
                 contest_id=contest_id,
-                problem_id=submission.problem_id,
-                status=contest_problem.status.value,
-                time_taken_seconds=contest_problem.time_taken_seconds,
-                message="Problem submitted successfully",
+                problem_id=outcome.problem_id,
+                status="error",
+                time_taken_seconds=None,
+                message=outcome.error,
             ))
-        except ValueError as e:
+        else:
             results.append(SubmissionResponse(
                 contest_id=contest_id,
-                problem_id=submission.problem_id,
-                status="error",
-                time_taken_seconds=None,
-                message=str(e),
+                problem_id=outcome.problem_id,
+                status=outcome.status.value,
+                time_taken_seconds=outcome.time_taken_seconds,
+                message="Problem submitted successfully",
             ))
 
     return results
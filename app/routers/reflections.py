@@ -11,7 +11,8 @@ from sqlalchemy.orm import Session
 
 from ..database import get_db
 from ..models import Contest, ContestProblem, ProblemReflection, SubmissionStatus
-from ..services.openrouter_service import generate_reflection
+from ..services.editorial_store import get_editorial_store
+from ..services.openrouter_service import generate_reflection, generate_reflections_batch
 
 router = APIRouter(prefix="/reflections", tags=["reflections"])
 
@@ -98,19 +99,26 @@ async def submit_editorial(
         .first()
     )
 
-    if reflection:
-        # Update existing
-        reflection.editorial_text = editorial.editorial_text
-        reflection.editorial_url = editorial.editorial_url
-    else:
-        # Create new
-        reflection = ProblemReflection(
-            contest_problem_id=problem_id,
-            editorial_text=editorial.editorial_text,
-            editorial_url=editorial.editorial_url,
-        )
+    if not reflection:
+        reflection = ProblemReflection(contest_problem_id=problem_id)
         db.add(reflection)
 
+    # Editorial text goes to the shared store; the reflection keeps a reference.
+    # It is not mapped to the problem, so it is never served to other users.
+    editorial_id = None
+    if editorial.editorial_text and editorial.editorial_text.strip():
+        stored = get_editorial_store().put(
+            db,
+            editorial.editorial_text,
+            problem_id=None,
+            source_url=editorial.editorial_url,
+        )
+        editorial_id = stored.id
+
+    reflection.editorial_id = editorial_id
+    reflection.editorial_text = None
+    reflection.editorial_url = editorial.editorial_url
+
     db.commit()
     db.refresh(reflection)
 
@@ -163,9 +171,11 @@ async def generate_problem_reflection(
     if reflection.pivot_sentence and not reflection.generation_error:
         return {
             "message": "Reflection already generated",
-            "reflection": _build_reflection_response(contest_problem, reflection),
+            "reflection": _build_reflection_response(db, contest_problem, reflection),
         }
 
+    editorial_text, editorial_url = _resolve_editorial(db, contest_problem, reflection)
+
     # Generate reflection using OpenRouter
     result = await generate_reflection(
         problem_name=contest_problem.problem_name,
@@ -175,8 +185,8 @@ async def generate_problem_reflection(
         solved=(contest_problem.status == SubmissionStatus.SOLVED),
         partial=(contest_problem.status == SubmissionStatus.PARTIAL),
         time_taken_seconds=contest_problem.time_taken_seconds,
-        editorial_text=reflection.editorial_text,
-        editorial_url=reflection.editorial_url,
+        editorial_text=editorial_text,
+        editorial_url=editorial_url,
         user_approach=contest_problem.user_approach,
         user_rating=contest.rating_at_start,
     )
@@ -198,7 +208,7 @@ async def generate_problem_reflection(
         "message": "Reflection generated successfully"
         if not result.get("error")
         else "Generation failed",
-        "reflection": _build_reflection_response(contest_problem, reflection),
+        "reflection": _build_reflection_response(db, contest_problem, reflection),
     }
 
 
@@ -206,12 +216,14 @@ async def generate_problem_reflection(
 async def generate_all_reflections(contest_id: int, db: Session = Depends(get_db)):
     """
     Generate reflections for all problems in a contest.
+    Pending problems are sent to the AI provider in a single batched request.
     """
     contest = db.query(Contest).filter(Contest.id == contest_id).first()
     if not contest:
         raise HTTPException(status_code=404, detail="Contest not found")
 
     results = []
+    pending = []
 
     for problem in contest.problems:
         # Get or create reflection
@@ -232,20 +244,34 @@ async def generate_all_reflections(contest_id: int, db: Session = Depends(get_db
             results.append({"problem_id": problem.id, "status": "already_generated"})
             continue
 
-        # Generate
-        result = await generate_reflection(
-            problem_name=problem.problem_name,
-            problem_url=problem.problem_url or "",
-            topic=problem.topic,
-            difficulty=problem.difficulty,
-            solved=(problem.status == SubmissionStatus.SOLVED),
-            partial=(problem.status == SubmissionStatus.PARTIAL),
-            time_taken_seconds=problem.time_taken_seconds,
-            editorial_text=reflection.editorial_text,
-            editorial_url=reflection.editorial_url,
-            user_approach=problem.user_approach,
-            user_rating=contest.rating_at_start,
-        )
+        pending.append((problem, reflection))
+
+    # Generate all pending reflections with one batched provider call
+    generated = await generate_reflections_batch(
+        [
+            {
+                "id": problem.id,
+                "problem_name": problem.problem_name,
+                "problem_url": problem.problem_url or "",
+                "topic": problem.topic,
+                "difficulty": problem.difficulty,
+                "solved": problem.status == SubmissionStatus.SOLVED,
+                "partial": problem.status == SubmissionStatus.PARTIAL,
+                "time_taken_seconds": problem.time_taken_seconds,
+                "editorial_text": editorial_text,
+                "editorial_url": editorial_url,
+                "user_approach": problem.user_approach,
+            }
+            for problem, reflection, (editorial_text, editorial_url) in (
+                (problem, reflection, _resolve_editorial(db, problem, reflection))
+                for problem, reflection in pending
+            )
+        ],
+        user_rating=contest.rating_at_start,
+    )
+
+    for problem, reflection in pending:
+        result = generated[problem.id]
 
         # Update
         reflection.pivot_sentence = result.get("pivot_sentence")
@@ -257,8 +283,6 @@ async def generate_all_reflections(contest_id: int, db: Session = Depends(get_db
         reflection.generation_error = result.get("error")
         reflection.generated_at = datetime.utcnow()
 
-        db.commit()
-
         results.append(
             {
                 "problem_id": problem.id,
@@ -267,6 +291,8 @@ async def generate_all_reflections(contest_id: int, db: Session = Depends(get_db
             }
         )
 
+    db.commit()
+
     return {
         "contest_id": contest_id,
         "results": results,
@@ -317,7 +343,7 @@ async def get_contest_reflections(contest_id: int, db: Session = Depends(get_db)
                 problem_data["has_reflection"] = True
                 problem_data["reflection"] = {
                     "id": reflection.id,
-                    "editorial_text": reflection.editorial_text,
+                    "editorial_text": _editorial_text(db, reflection),
                     "editorial_url": reflection.editorial_url,
                     "pivot_sentence": reflection.pivot_sentence,
                     "tips": reflection.tips,
@@ -333,7 +359,7 @@ async def get_contest_reflections(contest_id: int, db: Session = Depends(get_db)
                 reflections_pending += 1
                 problem_data["reflection"] = {
                     "id": reflection.id,
-                    "editorial_text": reflection.editorial_text,
+                    "editorial_text": _editorial_text(db, reflection),
                     "editorial_url": reflection.editorial_url,
                     "generation_error": reflection.generation_error,
                 }
@@ -389,7 +415,7 @@ async def get_problem_reflection(
         },
         "reflection": {
             "id": reflection.id if reflection else None,
-            "editorial_text": reflection.editorial_text if reflection else None,
+            "editorial_text": _editorial_text(db, reflection) if reflection else None,
             "editorial_url": reflection.editorial_url if reflection else None,
             "pivot_sentence": reflection.pivot_sentence if reflection else None,
             "tips": reflection.tips if reflection else None,
@@ -406,8 +432,44 @@ async def get_problem_reflection(
     }
 
 
+def _editorial_text(db: Session, reflection: ProblemReflection) -> Optional[str]:
+    """Return a reflection's editorial text (from the store, or legacy inline text)."""
+    if reflection.editorial_id is not None:
+        return get_editorial_store().get_text(db, reflection.editorial_id)
+    return reflection.editorial_text
+
+
+def _resolve_editorial(
+    db: Session, problem: ContestProblem, reflection: ProblemReflection
+) -> tuple:
+    """
+    Find the editorial to use for a reflection.
+
+    Uses the editorial the user submitted if there is one, otherwise the
+    shared editorial for the problem (e.g. prefetched from Codeforces), which
+    is then linked to the reflection.
+
+    Returns:
+        (editorial_text, editorial_url)
+    """
+    text = _editorial_text(db, reflection)
+    if text:
+        return text, reflection.editorial_url
+
+    store = get_editorial_store()
+    shared = store.get_for_problem(db, problem.problem_id)
+    if shared:
+        editorial_id, source_url = shared
+        reflection.editorial_id = editorial_id
+        if not reflection.editorial_url:
+            reflection.editorial_url = source_url
+        return store.get_text(db, editorial_id), reflection.editorial_url
+
+    return None, reflection.editorial_url
+
+
 def _build_reflection_response(
-    problem: ContestProblem, reflection: ProblemReflection
+    db: Session, problem: ContestProblem, reflection: ProblemReflection
 ) -> dict:
     """Helper to build reflection response dict."""
     return {
@@ -421,7 +483,7 @@ def _build_reflection_response(
         "partial": problem.status == SubmissionStatus.PARTIAL,
         "time_taken_seconds": problem.time_taken_seconds,
         "user_approach": problem.user_approach,
-        "editorial_text": reflection.editorial_text,
+        "editorial_text": _editorial_text(db, reflection),
         "editorial_url": reflection.editorial_url,
         "pivot_sentence": reflection.pivot_sentence,
         "tips": reflection.tips,
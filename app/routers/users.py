@@ -3,15 +3,18 @@ User management API routes.
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from typing import List
 
 from ..database import get_db
-from ..models import User, UserTopicRating, WeakTopic
+from ..models import Contest, User, UserTopicRating, WeakTopic
 from ..schemas import (
     UserCreate, UserUpdate, UserResponse, UserDetailResponse,
     TopicRatingResponse, WeakTopicResponse, UserStatistics
 )
+from ..services.stats_service import CONTESTS, STATUS_COUNTERS, USERS, get_stats_service
+from ..services.invalidation_bus import USER_CHANGED, get_invalidation_bus
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -42,6 +45,7 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
         rating=20,  # Starting rating (1-100 scale, beginner level)
     )
     db.add(db_user)
+    get_stats_service().increment(db, **{USERS: 1})
     db.commit()
     db.refresh(db_user)
 
@@ -124,8 +128,21 @@ def delete_user(user_id: int, db: Session = Depends(get_db)):
             detail=f"User {user_id} not found"
         )
 
+    # The user's contests are deleted with them
+    stats_service = get_stats_service()
+    deltas = {USERS: -1}
+    contest_counts = db.query(Contest.status, func.count(Contest.id)).filter(
+        Contest.user_id == user_id,
+    ).group_by(Contest.status).all()
+    for contest_status, count in contest_counts:
+        deltas[CONTESTS] = deltas.get(CONTESTS, 0) - count
+        if contest_status in STATUS_COUNTERS:
+            deltas[STATUS_COUNTERS[contest_status]] = -count
+
     db.delete(user)
+    stats_service.increment(db, **deltas)
     db.commit()
+    get_invalidation_bus().publish(USER_CHANGED, user_id)
 
 
 @router.get("/{user_id}/topic-ratings", response_model=List[TopicRatingResponse])
@@ -24,6 +24,7 @@ class SubmissionStatusEnum(str, Enum):
     PARTIAL = "partial"  # Partially solved - counts as failed for rating
     FAILED = "failed"
     SKIPPED = "skipped"
+    ERROR = "error"  # Batch submission item that was rejected
 
 
 # =============================================================================
@@ -0,0 +1,323 @@
+"""
+Precomputed contest packs.
+
+Starting a contest normally runs problem selection inside the request. For
+common (target difficulty, num_problems) combinations, a background
+generator keeps a reservoir of ready-made, topic-diverse problem sets
+("packs") built with ProblemService. create_contest takes a pack, drops the
+problems the user attempted recently and the topics of their weak topic
+problems, and serves the rest. Only when no pack fits does it fall back to
+live selection.
+
+Packs hold CONTEST_PACK_SPARE more problems than the contest needs, so most
+survive a user's exclusions. Each pack is served once. Combinations are
+registered when a contest asks for one (and at startup from the most common
+user ratings), up to CONTEST_PACK_MAX_KEYS, dropping the least recently
+used.
+"""
+
+import asyncio
+import os
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..instrumentation import REGISTRY, Counter, Gauge
+from ..models import User
+from .problem_service import get_problem_service
+
+CONTEST_PACKS_ENABLED = os.getenv("CONTEST_PACKS_ENABLED", "true").lower() in ("1", "true", "yes")
+CONTEST_PACK_RESERVOIR = int(os.getenv("CONTEST_PACK_RESERVOIR", "16"))
+CONTEST_PACK_MAX_KEYS = int(os.getenv("CONTEST_PACK_MAX_KEYS", "64"))
+CONTEST_PACK_SPARE = int(os.getenv("CONTEST_PACK_SPARE", "5"))
+CONTEST_PACK_REFILL_SECONDS = float(os.getenv("CONTEST_PACK_REFILL_SECONDS", "5"))
+
+# Contest size the reservoirs are prewarmed for (the API default)
+DEFAULT_NUM_PROBLEMS = 5
+
+# Packs tried per contest before falling back to live selection
+PACK_ATTEMPTS = 3
+
+# (target_difficulty, num_problems)
+PackKey = Tuple[int, int]
+
+# One pack entry: catalog number and the selection dict for the problem
+PackItem = Tuple[int, Dict[str, Any]]
+
+PACK_REQUESTS = REGISTRY.register(Counter(
+    "contest_pack_requests_total",
+    "Contest starts by pack outcome (hit, miss: no pack ready, unfit: packs did not fit the user).",
+    ["outcome"],
+))
+
+
+class ContestPackService:
+    """Keeps reservoirs of precomputed contest packs."""
+
+    def __init__(
+        self,
+        enabled: bool = CONTEST_PACKS_ENABLED,
+        reservoir_size: int = CONTEST_PACK_RESERVOIR,
+        max_keys: int = CONTEST_PACK_MAX_KEYS,
+        spare: int = CONTEST_PACK_SPARE,
+    ):
+        self.enabled = enabled
+        self.reservoir_size = reservoir_size
+        self.max_keys = max_keys
+        self.spare = spare
+        self.problem_service = get_problem_service()
+        self._reservoirs: "OrderedDict[PackKey, Deque[List[PackItem]]]" = OrderedDict()
+        self._catalog_version = 0
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def take(
+        self,
+        target_difficulty: int,
+        num_problems: int,
+        weak_topics: List[str],
+        excluded: int,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Serve a contest's problems from a pack.
+
+        Args:
+            target_difficulty: Contest target difficulty
+            num_problems: Number of problems
+            weak_topics: Weak topics to include (already limited to the
+                contest's weak topic count)
+            excluded: Problems to exclude, as a bitset
+
+        Returns:
+            Problem dicts as from select_problems_for_contest, or None if no
+            pack fits (the caller selects live)
+        """
+        if not self.enabled:
+            return None
+
+        key = (target_difficulty, num_problems)
+        with self._lock:
+            reservoir = self._reservoir(key)
+        if not reservoir:
+            PACK_REQUESTS.inc(outcome="miss")
+            self._request_refill()
+            return None
+
+        weak = None
+        unfit = []
+        try:
+            for _ in range(PACK_ATTEMPTS):
+                with self._lock:
+                    pack = reservoir.popleft() if reservoir else None
+                if pack is None:
+                    break
+                if weak is None:
+                    weak = self.problem_service.select_weak_topic_problems(
+                        target_difficulty, weak_topics, excluded,
+                    )
+                selected = self._fit(pack, weak, num_problems)
+                if selected is not None:
+                    PACK_REQUESTS.inc(outcome="hit")
+                    return selected
+                unfit.append(pack)
+        finally:
+            if unfit:
+                # Packs that did not fit this user may fit another one
+                with self._lock:
+                    reservoir.extend(unfit)
+            if len(reservoir) < self.reservoir_size // 2:
+                self._request_refill()
+
+        PACK_REQUESTS.inc(outcome="unfit" if unfit else "miss")
+        return None
+
+    def _check_catalog(self) -> None:
+        """Drop all packs if the catalog changed (call with the lock held)."""
+        # Packs hold catalog numbers, which change with the catalog
+        if self._catalog_version != self.problem_service.catalog_version:
+            for reservoir in self._reservoirs.values():
+                reservoir.clear()
+            self._catalog_version = self.problem_service.catalog_version
+
+    def _reservoir(self, key: PackKey) -> Deque[List[PackItem]]:
+        """Reservoir of a combination, registering it if new (call with the lock held)."""
+        self._check_catalog()
+        reservoir = self._reservoirs.get(key)
+        if reservoir is None:
+            reservoir = self._reservoirs[key] = deque()
+            while len(self._reservoirs) > self.max_keys:
+                self._reservoirs.popitem(last=False)
+        self._reservoirs.move_to_end(key)
+        return reservoir
+
+    def _fit(
+        self,
+        pack: List[PackItem],
+        weak: Tuple[List[Dict[str, Any]], int],
+        num_problems: int,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Weak topic problems plus pack problems the user may get, or None if too few."""
+        weak_selected, used = weak
+        selected = [dict(item) for item in weak_selected]
+        # Keep topics distinct, as live selection does
+        used_topics = {item["topic"] for item in weak_selected}
+
+        for number, item in pack:
+            if len(selected) >= num_problems:
+                break
+            if used >> number & 1 or item["topic"] in used_topics:
+                continue
+            selected.append(dict(item))
+            used |= self.problem_service.problem_bits(number)
+            used_topics.add(item["topic"])
+
+        return selected if len(selected) >= num_problems else None
+
+    def build_pack(self, target_difficulty: int, num_problems: int) -> Optional[List[PackItem]]:
+        """Select a topic-diverse pack for a combination (None if the catalog is too thin)."""
+        selected = self.problem_service.select_problems_for_contest(
+            target_difficulty=target_difficulty,
+            num_problems=num_problems + self.spare,
+            weak_topics=[],
+            include_weak_topics=False,
+            excluded=0,
+        )
+        if len(selected) < num_problems:
+            return None
+        return [(self.problem_service.problem_number(item["problem"].id), item) for item in selected]
+
+    def refill(self) -> int:
+        """
+        Top up every registered reservoir, one pack per combination per pass.
+
+        Returns:
+            Number of packs built
+        """
+        self.problem_service.load_problems()
+        built = 0
+        while True:
+            with self._lock:
+                self._check_catalog()
+                version = self._catalog_version
+                pending = [
+                    (key, reservoir) for key, reservoir in self._reservoirs.items()
+                    if len(reservoir) < self.reservoir_size
+                ]
+            if not pending:
+                return built
+
+            progress = False
+            for (target_difficulty, num_problems), reservoir in pending:
+                pack = self.build_pack(target_difficulty, num_problems)
+                if pack is None:
+                    continue
+                with self._lock:
+                    if version != self.problem_service.catalog_version:
+                        return built
+                    reservoir.append(pack)
+                built += 1
+                progress = True
+            if not progress:
+                return built
+
+    def warm(self, db: Session) -> List[PackKey]:
+        """
+        Register the combinations of the most common user ratings.
+
+        Returns:
+            Registered (target_difficulty, num_problems) keys
+        """
+        self.problem_service.load_problems()
+        ratings = (
+            db.query(User.rating)
+            .group_by(User.rating)
+            .order_by(func.count(User.id).desc())
+            .limit(self.max_keys)
+            .all()
+        )
+        # Default contest target: rating + 10
+        keys = [(row.rating + 10, DEFAULT_NUM_PROBLEMS) for row in ratings]
+        with self._lock:
+            for key in reversed(keys):
+                self._reservoir(key)
+        return keys
+
+    def ready_packs(self) -> int:
+        """Packs ready to serve, over all combinations."""
+        with self._lock:
+            return sum(len(reservoir) for reservoir in self._reservoirs.values())
+
+    def _request_refill(self) -> None:
+        """Wake the background generator (safe from any thread)."""
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _refill_loop(self, session_factory) -> None:
+        """Register common combinations, then keep the reservoirs topped up."""
+        try:
+            await asyncio.to_thread(self._warm_with_session, session_factory)
+        except Exception as e:
+            print(f"Contest pack warm-up failed: {e}")
+
+        while True:
+            self._wakeup.clear()
+            try:
+                built = await asyncio.to_thread(self.refill)
+                if built:
+                    print(f"Contest packs: built {built}")
+            except Exception as e:
+                print(f"Contest pack refill failed: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), CONTEST_PACK_REFILL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def _warm_with_session(self, session_factory) -> List[PackKey]:
+        db = session_factory()
+        try:
+            return self.warm(db)
+        finally:
+            db.close()
+
+    def start(self, session_factory) -> None:
+        """
+        Start generating packs in the background.
+
+        Must be called from a running event loop (the app lifespan).
+        """
+        if self.enabled and self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._task = self._loop.create_task(self._refill_loop(session_factory))
+
+    async def stop(self) -> None:
+        """Stop generating packs."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._loop = None
+        self._wakeup = None
+
+
+# Singleton instance
+_contest_pack_service: Optional[ContestPackService] = None
+
+
+def get_contest_pack_service() -> ContestPackService:
+    """Get the singleton contest pack service instance."""
+    global _contest_pack_service
+    if _contest_pack_service is None:
+        _contest_pack_service = ContestPackService()
+    return _contest_pack_service
+
+
+REGISTRY.register(Gauge(
+    "contest_packs_ready", "Precomputed contest packs ready to serve (this worker).",
+    callback=lambda: {(): float(get_contest_pack_service().ready_packs())},
+))
@@ -0,0 +1,331 @@
+"""
+Deadline scheduler for contest expiry.
+
+Contests used to end at their time limit only when the user submitted
+afterwards, so abandoned tabs left contests ACTIVE forever (blocking new
+contests and counting as active in /stats). The scheduler keeps a heap of
+active contests by deadline (started_at + time_limit_minutes) and ends the
+expired ones in batches with ContestService.end_contest, as the time limit
+check in submit_problem does.
+
+The heap is rebuilt from the database at startup and every
+CONTEST_EXPIRY_REBUILD_SECONDS (so it also learns about contests started by
+other workers); contests started in this worker are added as they are
+created. The database stays authoritative: due contests are re-read before
+they are ended, so contests that were ended, abandoned or deleted meanwhile
+are simply dropped.
+
+With several workers, only one should sweep at a time. CONTEST_EXPIRY_LOCK
+selects how:
+
+- advisory: a PostgreSQL session advisory lock (pg_try_advisory_lock) is
+  held while sweeping; workers that do not get it keep their due contests
+  and retry later
+- local: an in-process lock only (SQLite, where there is a single process)
+- auto (default): advisory on PostgreSQL, local otherwise
+"""
+
+import asyncio
+import heapq
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from ..instrumentation import REGISTRY, Counter, Gauge
+from ..models import Contest, ContestStatus
+
+CONTEST_EXPIRY_ENABLED = os.getenv("CONTEST_EXPIRY_ENABLED", "true").lower() in ("1", "true", "yes")
+CONTEST_EXPIRY_LOCK = os.getenv("CONTEST_EXPIRY_LOCK", "auto").lower()
+CONTEST_EXPIRY_BATCH = int(os.getenv("CONTEST_EXPIRY_BATCH", "50"))
+CONTEST_EXPIRY_MAX_SLEEP_SECONDS = float(os.getenv("CONTEST_EXPIRY_MAX_SLEEP_SECONDS", "30"))
+CONTEST_EXPIRY_REBUILD_SECONDS = float(os.getenv("CONTEST_EXPIRY_REBUILD_SECONDS", "300"))
+
+# Names accepted by CONTEST_EXPIRY_LOCK
+LOCK_MODES = ("auto", "advisory", "local")
+
+# Advisory lock key shared by all workers (any constant bigint)
+ADVISORY_LOCK_KEY = 0x6D637078  # "mcpx"
+
+# Heap entry: (deadline, contest_id)
+Deadline = Tuple[datetime, int]
+
+EXPIRED = REGISTRY.register(Counter(
+    "contests_expired_total",
+    "Contests ended by the expiry scheduler at their time limit.",
+))
+
+SWEEPS = REGISTRY.register(Counter(
+    "contest_expiry_sweeps_total",
+    "Expiry sweeps with due contests by outcome (done, locked: another worker holds the lock).",
+    ["outcome"],
+))
+
+
+def contest_deadline(started_at: datetime, time_limit_minutes: Optional[int]) -> datetime:
+    """When a contest's time limit runs out."""
+    return started_at + timedelta(minutes=time_limit_minutes or 0)
+
+
+class ContestExpiryScheduler:
+    """Ends active contests when their time limit runs out."""
+
+    def __init__(
+        self,
+        enabled: bool = CONTEST_EXPIRY_ENABLED,
+        lock_mode: str = CONTEST_EXPIRY_LOCK,
+        batch_size: int = CONTEST_EXPIRY_BATCH,
+    ):
+        if lock_mode not in LOCK_MODES:
+            raise ValueError(f"Unknown CONTEST_EXPIRY_LOCK {lock_mode!r} (expected one of {', '.join(LOCK_MODES)})")
+        self.enabled = enabled
+        self.lock_mode = lock_mode
+        self.batch_size = batch_size
+        self._heap: List[Deadline] = []
+        self._lock = threading.Lock()
+        # Serializes sweeps within this process
+        self._sweep_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def schedule(self, contest_id: int, started_at: datetime, time_limit_minutes: Optional[int]) -> None:
+        """
+        Add an active contest (call after committing it).
+
+        Args:
+            contest_id: Contest ID
+            started_at: Contest start (UTC)
+            time_limit_minutes: Contest time limit
+        """
+        if not self.enabled or started_at is None:
+            return
+        deadline = contest_deadline(started_at, time_limit_minutes)
+        with self._lock:
+            earliest = self._heap[0][0] if self._heap else None
+            heapq.heappush(self._heap, (deadline, contest_id))
+        if earliest is None or deadline < earliest:
+            self._request_wakeup()
+
+    def rebuild(self, db: Session) -> int:
+        """
+        Replace the heap with the database's active contests.
+
+        Returns:
+            Number of active contests
+        """
+        rows = db.query(Contest.id, Contest.started_at, Contest.time_limit_minutes).filter(
+            Contest.status == ContestStatus.ACTIVE,
+        ).all()
+        heap = [
+            (contest_deadline(row.started_at, row.time_limit_minutes), row.id)
+            for row in rows
+            if row.started_at is not None
+        ]
+        heapq.heapify(heap)
+        with self._lock:
+            self._heap = heap
+        return len(heap)
+
+    def next_deadline(self) -> Optional[datetime]:
+        """Earliest scheduled deadline, if any."""
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def scheduled(self) -> int:
+        """Contests in the heap (including ones ended since they were added)."""
+        with self._lock:
+            return len(self._heap)
+
+    def _pop_due(self, now: datetime) -> List[Deadline]:
+        """Remove and return up to a batch of entries due at `now`."""
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+                due.append(heapq.heappop(self._heap))
+        return due
+
+    def _push(self, entries: List[Deadline]) -> None:
+        with self._lock:
+            for entry in entries:
+                heapq.heappush(self._heap, entry)
+
+    def expire_due(self, session_factory, now: Optional[datetime] = None) -> Optional[int]:
+        """
+        End every contest whose time limit ran out, a batch at a time.
+
+        Args:
+            session_factory: Callable returning a new Session
+            now: Current UTC time (default: now)
+
+        Returns:
+            Number of contests ended, or None if another worker holds the
+            sweep lock (the due contests are kept for a later sweep)
+        """
+        now = now or datetime.utcnow()
+        with self._lock:
+            if not self._heap or self._heap[0][0] > now:
+                return 0
+
+        with self._sweep_lock:
+            db = session_factory()
+            try:
+                with self._worker_lock(db) as acquired:
+                    if not acquired:
+                        SWEEPS.inc(outcome="locked")
+                        return None
+                    ended = 0
+                    while True:
+                        due = self._pop_due(now)
+                        if not due:
+                            break
+                        try:
+                            ended += self._end_batch(db, [contest_id for _, contest_id in due], now)
+                        except Exception:
+                            # Retry them on the next sweep
+                            db.rollback()
+                            self._push(due)
+                            raise
+                    SWEEPS.inc(outcome="done")
+                    return ended
+            finally:
+                db.close()
+
+    def _end_batch(self, db: Session, contest_ids: List[int], now: datetime) -> int:
+        """End the contests of a batch that are still active and expired."""
+        # Imported here: contest_service schedules new contests with this module
+        from .contest_service import get_contest_service
+
+        contest_service = get_contest_service()
+        contests = db.query(Contest.id, Contest.started_at, Contest.time_limit_minutes).filter(
+            Contest.id.in_(contest_ids),
+            Contest.status == ContestStatus.ACTIVE,
+        ).all()
+
+        ended = 0
+        for contest in contests:
+            deadline = contest_deadline(contest.started_at, contest.time_limit_minutes)
+            if deadline > now:
+                # Scheduled with a stale deadline; keep it at the right one
+                self._push([(deadline, contest.id)])
+                continue
+            try:
+                contest_service.end_contest(db, contest.id, auto_end=True)
+            except ValueError:
+                # Ended or abandoned meanwhile (by its user)
+                db.rollback()
+                continue
+            ended += 1
+            EXPIRED.inc()
+        return ended
+
+    def _advisory(self, db: Session) -> bool:
+        """Whether sweeps take the PostgreSQL advisory lock."""
+        if self.lock_mode == "auto":
+            return db.get_bind().dialect.name == "postgresql"
+        return self.lock_mode == "advisory"
+
+    @contextmanager
+    def _worker_lock(self, db: Session) -> Iterator[bool]:
+        """Hold the cross-worker sweep lock, if the mode uses one; yields whether it was acquired."""
+        if not self._advisory(db):
+            yield True
+            return
+        # On a connection of its own: the session returns its connection to
+        # the pool at every commit, and the lock belongs to the connection
+        with db.get_bind().connect() as conn:
+            acquired = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY}).scalar()
+            conn.commit()
+            try:
+                yield bool(acquired)
+            finally:
+                if acquired:
+                    conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+                    conn.commit()
+
+    def _request_wakeup(self) -> None:
+        """Wake the background loop (safe from any thread)."""
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _expiry_loop(self, session_factory) -> None:
+        """Rebuild the heap, then end contests as their deadlines pass."""
+        rebuilt_at = None
+        while True:
+            self._wakeup.clear()
+            loop_time = self._loop.time()
+            if rebuilt_at is None or loop_time - rebuilt_at >= CONTEST_EXPIRY_REBUILD_SECONDS:
+                try:
+                    await asyncio.to_thread(self._rebuild_with_session, session_factory)
+                    rebuilt_at = loop_time
+                except Exception as e:
+                    print(f"Contest expiry rebuild failed: {e}")
+
+            # After a failure, or while another worker sweeps, wait the full
+            # interval instead of retrying the overdue contests right away
+            back_off = True
+            try:
+                ended = await asyncio.to_thread(self.expire_due, session_factory)
+                if ended:
+                    print(f"Contest expiry: ended {ended} contest(s) at their time limit")
+                back_off = ended is None
+            except Exception as e:
+                print(f"Contest expiry failed: {e}")
+
+            timeout = CONTEST_EXPIRY_MAX_SLEEP_SECONDS
+            deadline = self.next_deadline()
+            if deadline is not None and not back_off:
+                timeout = min(timeout, max((deadline - datetime.utcnow()).total_seconds(), 0.0))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _rebuild_with_session(self, session_factory) -> int:
+        db = session_factory()
+        try:
+            return self.rebuild(db)
+        finally:
+            db.close()
+
+    def start(self, session_factory) -> None:
+        """
+        Start ending expired contests in the background.
+
+        Must be called from a running event loop (the app lifespan).
+        """
+        if self.enabled and self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._task = self._loop.create_task(self._expiry_loop(session_factory))
+
+    async def stop(self) -> None:
+        """Stop ending expired contests."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._loop = None
+        self._wakeup = None
+
+
+# Singleton instance
+_contest_scheduler: Optional[ContestExpiryScheduler] = None
+
+
+def get_contest_scheduler() -> ContestExpiryScheduler:
+    """Get the singleton contest expiry scheduler instance."""
+    global _contest_scheduler
+    if _contest_scheduler is None:
+        _contest_scheduler = ContestExpiryScheduler()
+    return _contest_scheduler
+
+
+REGISTRY.register(Gauge(
+    "contest_expiry_scheduled", "Contests in the expiry heap (this worker).",
+    callback=lambda: {(): float(get_contest_scheduler().scheduled())},
+))
@@ -3,16 +3,45 @@ Contest management service.
 Handles creating contests, tracking submissions, and ending contests.
 """
 
-from typing import List, Dict, Set, Optional, Any
+from collections import Counter
+from dataclasses import dataclass
+from typing import List, Dict, Optional, Any, Tuple
+from sqlalchemy import DateTime, Integer, String, Text, and_, case, cast, exists, func, literal, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
+from datetime import datetime
 
 from ..models import (
-    User, Contest, ContestProblem, ProblemHistory, WeakTopic,
+    Contest, ContestProblem, ProblemHistory,
     ContestStatus, SubmissionStatus
 )
+from .contest_packs import get_contest_pack_service
+from .contest_scheduler import get_contest_scheduler
+from .exclusion_service import get_exclusion_service
+from .invalidation_bus import ATTEMPTS_CHANGED, get_invalidation_bus
 from .problem_service import get_problem_service, Problem
 from .rating_service import get_rating_service
+from .stats_service import CONTESTS, CONTESTS_ACTIVE, get_stats_service
+from .topic_scheduler import topic_need
+from .user_context import get_user_context_service
+
+
+# Dialects with INSERT ... ON CONFLICT and UPDATE ... RETURNING (the atomic
+# submission path); others use the ORM path
+ATOMIC_SUBMIT_DIALECTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+@dataclass
+class SubmissionOutcome:
+    """Result of a problem submission (error is set if it failed, in batches)."""
+
+    contest_id: int
+    problem_id: str
+    user_id: Optional[int]
+    status: Optional[SubmissionStatus]
+    time_taken_seconds: Optional[int] = None
+    attempts: int = 0
+    error: Optional[str] = None
 
 
 class ContestService:
@@ -21,6 +50,10 @@ class ContestService:
     def __init__(self):
         self.problem_service = get_problem_service()
         self.rating_service = get_rating_service()
+        self.exclusion_service = get_exclusion_service()
+        self.pack_service = get_contest_pack_service()
+        self.user_context_service = get_user_context_service()
+        self.contest_scheduler = get_contest_scheduler()
 
     def create_contest(
         self,
@@ -45,8 +78,8 @@ class ContestService:
         Returns:
             Created Contest object
         """
-        # Get user
-        user = db.query(User).filter(User.id == user_id).first()
+        # Get user (rating, weak topics and topic stats, cached)
+        user = self.user_context_service.get(db, user_id)
         if not user:
             raise ValueError(f"User {user_id} not found")
 
@@ -68,20 +101,29 @@ class ContestService:
         # Get user's weak topics
         weak_topics = []
         if include_weak_topics:
-            user_weak_topics = self.rating_service.get_user_weak_topics(db, user_id)
-            weak_topics = [wt.topic for wt in user_weak_topics]
+            weak_topics = list(user.weak_topics)
 
-        # Get already solved problems to exclude
-        excluded_ids = self._get_recent_problem_ids(db, user_id)
+        # Get recently attempted problems to exclude (cached bitset)
+        excluded = self.exclusion_service.get_bitset(db, user_id)
 
-        # Select problems
-        selected = self.problem_service.select_problems_for_contest(
-            target_difficulty=final_target_difficulty,
-            num_problems=num_problems,
-            weak_topics=weak_topics,
-            excluded_problem_ids=excluded_ids,
-            include_weak_topics=include_weak_topics,
+        # Serve from a precomputed pack if one fits, else select live
+        weak_topic_count = self.problem_service.weak_topic_count(num_problems, weak_topics, include_weak_topics)
+        selected = self.pack_service.take(
+            final_target_difficulty, num_problems, weak_topics[:weak_topic_count], excluded,
         )
+        if selected is None:
+            need = None
+            if self.problem_service.topic_scheduler == "weighted":
+                # Weak topics without a weak topic slot get extra weight
+                need = topic_need(user.topic_stats, weak_topics[weak_topic_count:])
+            selected = self.problem_service.select_problems_for_contest(
+                target_difficulty=final_target_difficulty,
+                num_problems=num_problems,
+                weak_topics=weak_topics,
+                include_weak_topics=include_weak_topics,
+                excluded=excluded,
+                topic_need=need,
+            )
 
         if len(selected) < num_problems:
             raise ValueError(
@@ -106,15 +148,10 @@ class ContestService:
 
             # Adjust difficulty for weak topic problems based on their current level
             if item["is_weak_topic_problem"]:
-                weak_topic = db.query(WeakTopic).filter(
-                    WeakTopic.user_id == user_id,
-                    WeakTopic.topic == item["topic"],
-                    WeakTopic.is_active == True,
-                ).first()
-
-                if weak_topic:
+                level = user.weak_topic_levels.get(item["topic"])
+                if level is not None:
                     # Use weak topic's current level
-                    item["target_difficulty"] = weak_topic.current_level
+                    item["target_difficulty"] = level
 
             contest_problem = ContestProblem(
                 contest_id=contest.id,
@@ -129,21 +166,14 @@ class ContestService:
             )
             db.add(contest_problem)
 
+        get_stats_service().increment(db, **{CONTESTS: 1, CONTESTS_ACTIVE: 1})
         db.commit()
         db.refresh(contest)
 
-        return contest
-
-    def _get_recent_problem_ids(self, db: Session, user_id: int, days: int = 30) -> Set[str]:
-        """Get problem IDs the user has attempted recently."""
-        cutoff = datetime.utcnow() - timedelta(days=days)
+        # End it at its time limit even if the user never comes back
+        self.contest_scheduler.schedule(contest.id, contest.started_at, contest.time_limit_minutes)
 
-        history = db.query(ProblemHistory.problem_id).filter(
-            ProblemHistory.user_id == user_id,
-            ProblemHistory.last_attempted_at >= cutoff,
-        ).all()
-
-        return {h.problem_id for h in history}
+        return contest
 
     def get_contest(self, db: Session, contest_id: int) -> Optional[Contest]:
         """Get a contest by ID."""
@@ -186,10 +216,454 @@ class ContestService:
         partial: bool = False,
         time_taken_seconds: Optional[int] = None,
         user_approach: Optional[str] = None,
-    ) -> ContestProblem:
+    ) -> SubmissionOutcome:
         """
         Submit a solution for a problem.
 
+        On PostgreSQL and SQLite this is two statements and a commit: an
+        UPDATE ... RETURNING of the contest problem, which only matches while
+        the contest is active and within its time limit, and an upsert of the
+        problem history. Counters are incremented in SQL, so concurrent
+        submissions of the same problem do not lose updates.
+
+        Args:
+            db: Database session
+            contest_id: Contest ID
+            problem_id: Problem ID
+            solved: Whether the problem was solved
+            partial: Whether the problem was partially solved (counts as failed)
+            time_taken_seconds: Time taken (optional, calculated from start if not provided)
+            user_approach: User's approach/thought process for the problem
+
+        Returns:
+            SubmissionOutcome with the problem's new status and time
+        """
+        dialect = db.get_bind().dialect.name
+        insert = ATOMIC_SUBMIT_DIALECTS.get(dialect)
+        if insert is None:
+            return self._submit_problem_orm(
+                db, contest_id, problem_id, solved, partial, time_taken_seconds, user_approach,
+            )
+
+        now = datetime.utcnow()
+
+        values = {
+            "submitted_at": now,
+            "attempts": ContestProblem.attempts + 1,
+            "time_taken_seconds": self._time_taken(dialect, now, time_taken_seconds),
+            "status": self._submission_status(solved, partial),
+        }
+        # Store user's approach
+        if user_approach:
+            values["user_approach"] = user_approach
+
+        submission = db.execute(
+            update(ContestProblem)
+            .where(
+                ContestProblem.contest_id == contest_id,
+                ContestProblem.problem_id == problem_id,
+                self._contest_open(dialect, contest_id, now),
+            )
+            .values(**values)
+            .returning(ContestProblem.status, ContestProblem.time_taken_seconds, ContestProblem.attempts)
+            .execution_options(synchronize_session=False)
+        ).first()
+
+        if submission is None:
+            db.rollback()
+            self._raise_submission_error(db, contest_id, problem_id)
+
+        # Update problem history (partial counts as not solved)
+        user_id = db.execute(
+            self._problem_history_upsert(
+                insert, contest_id, problem_id, solved, submission.time_taken_seconds, now,
+            )
+        ).scalar_one()
+
+        db.commit()
+        self.exclusion_service.record_attempt(user_id, problem_id)
+        get_invalidation_bus().publish(ATTEMPTS_CHANGED, user_id, local=False)
+
+        return SubmissionOutcome(
+            contest_id=contest_id,
+            problem_id=problem_id,
+            user_id=user_id,
+            status=submission.status,
+            time_taken_seconds=submission.time_taken_seconds,
+            attempts=submission.attempts,
+        )
+
+    def submit_problems(
+        self,
+        db: Session,
+        contest_id: int,
+        submissions: List[Dict[str, Any]],
+    ) -> List[SubmissionOutcome]:
+        """
+        Submit several problems of a contest in one transaction.
+
+        The contest is checked once. On PostgreSQL and SQLite all contest
+        problems are then updated by one UPDATE ... RETURNING (a CASE per
+        column, gated like submit_problem), the problem history of all of
+        them is upserted by one multi-row INSERT ... ON CONFLICT, and the
+        transaction is committed once. A problem submitted twice counts as
+        two attempts; its last submission sets the status.
+
+        Args:
+            db: Database session
+            contest_id: Contest ID
+            submissions: Dicts with submit_problem's arguments (problem_id,
+                solved, partial, time_taken_seconds, user_approach)
+
+        Returns:
+            One SubmissionOutcome per submission, in order. Submissions
+            that failed have `error` set instead of raising.
+        """
+        dialect = db.get_bind().dialect.name
+        insert = ATOMIC_SUBMIT_DIALECTS.get(dialect)
+        if insert is None:
+            return [self._submit_or_error(db, contest_id, item) for item in submissions]
+        if not submissions:
+            return []
+
+        now = datetime.utcnow()
+
+        # Check the contest once for the whole batch
+        contest, error = self._check_contest(db, contest_id, now)
+        if error:
+            return [self._failed_submission(contest_id, item["problem_id"], error) for item in submissions]
+        user_id = contest.user_id
+
+        # Last submission of each problem, and how many there were
+        latest = {item["problem_id"]: item for item in submissions}
+        counts = Counter(item["problem_id"] for item in submissions)
+
+        def per_problem(values: Dict[str, Any], else_):
+            return case(
+                *[(ContestProblem.problem_id == problem_id, value) for problem_id, value in values.items()],
+                else_=else_,
+            )
+
+        status_type = ContestProblem.status.type
+        values = {
+            "submitted_at": now,
+            "attempts": ContestProblem.attempts + per_problem(
+                {problem_id: literal(count, Integer) for problem_id, count in counts.items()}, 0,
+            ),
+            "time_taken_seconds": per_problem(
+                {
+                    problem_id: self._time_taken(dialect, now, item.get("time_taken_seconds"))
+                    for problem_id, item in latest.items()
+                },
+                ContestProblem.time_taken_seconds,
+            ),
+            "status": per_problem(
+                {
+                    problem_id: literal(self._submission_status(item["solved"], item.get("partial", False)), status_type)
+                    for problem_id, item in latest.items()
+                },
+                ContestProblem.status,
+            ),
+        }
+        # Store users' approaches (the last one given per problem)
+        approaches = {item["problem_id"]: item["user_approach"] for item in submissions if item.get("user_approach")}
+        if approaches:
+            values["user_approach"] = per_problem(
+                {problem_id: literal(approach, Text) for problem_id, approach in approaches.items()},
+                ContestProblem.user_approach,
+            )
+
+        updated = {
+            row.problem_id: row
+            for row in db.execute(
+                update(ContestProblem)
+                .where(
+                    ContestProblem.contest_id == contest_id,
+                    ContestProblem.problem_id.in_(list(latest)),
+                    self._contest_open(dialect, contest_id, now),
+                )
+                .values(**values)
+                .returning(
+                    ContestProblem.problem_id,
+                    ContestProblem.status,
+                    ContestProblem.time_taken_seconds,
+                    ContestProblem.attempts,
+                    ContestProblem.started_at,
+                )
+                .execution_options(synchronize_session=False)
+            )
+        }
+
+        if not updated:
+            # Nothing matched: the contest closed since it was checked, or
+            # none of the problems are in it (reported per item below)
+            db.rollback()
+            _, error = self._check_contest(db, contest_id, datetime.utcnow())
+            if error:
+                return [self._failed_submission(contest_id, item["problem_id"], error) for item in submissions]
+
+        # Problem history totals of the batch
+        history = {}
+        for item in submissions:
+            problem_id = item["problem_id"]
+            if problem_id not in updated:
+                continue
+            row = history.setdefault(problem_id, {
+                "user_id": user_id,
+                "problem_id": problem_id,
+                "last_attempted_at": now,
+                "times_attempted": 0,
+                "times_solved": 0,
+                "best_time_seconds": None,
+            })
+            row["times_attempted"] += 1
+            # Partial counts as not solved
+            if item["solved"]:
+                row["times_solved"] += 1
+                time_taken = self._item_time_taken(item, updated[problem_id], now)
+                if time_taken and (row["best_time_seconds"] is None or time_taken < row["best_time_seconds"]):
+                    row["best_time_seconds"] = time_taken
+
+        if history:
+            db.execute(self._problem_history_bulk_upsert(insert, list(history.values())))
+            db.commit()
+            for problem_id in history:
+                self.exclusion_service.record_attempt(user_id, problem_id)
+            get_invalidation_bus().publish(ATTEMPTS_CHANGED, user_id, local=False)
+
+        outcomes = []
+        remaining = Counter(counts)
+        for item in submissions:
+            problem_id = item["problem_id"]
+            row = updated.get(problem_id)
+            if row is None:
+                outcomes.append(self._failed_submission(
+                    contest_id, problem_id, f"Problem {problem_id} not found in contest {contest_id}",
+                ))
+                continue
+            remaining[problem_id] -= 1
+            outcomes.append(SubmissionOutcome(
+                contest_id=contest_id,
+                problem_id=problem_id,
+                user_id=user_id,
+                status=self._submission_status(item["solved"], item.get("partial", False)),
+                time_taken_seconds=self._item_time_taken(item, row, now),
+                attempts=row.attempts - remaining[problem_id],
+            ))
+        return outcomes
+
+    def _submit_or_error(self, db: Session, contest_id: int, item: Dict[str, Any]) -> SubmissionOutcome:
+        """Submit one problem with the ORM path, reporting a failure instead of raising."""
+        try:
+            return self._submit_problem_orm(
+                db,
+                contest_id,
+                item["problem_id"],
+                item["solved"],
+                item.get("partial", False),
+                item.get("time_taken_seconds"),
+                item.get("user_approach"),
+            )
+        except ValueError as e:
+            return self._failed_submission(contest_id, item["problem_id"], str(e))
+
+    @staticmethod
+    def _item_time_taken(item: Dict[str, Any], row, now: datetime) -> Optional[int]:
+        """Time taken of one batch submission, given the problem's updated row."""
+        if item.get("time_taken_seconds") is not None:
+            return item["time_taken_seconds"]
+        if row.started_at is not None:
+            return int((now - row.started_at).total_seconds())
+        return row.time_taken_seconds
+
+    @staticmethod
+    def _failed_submission(contest_id: int, problem_id: str, error: str) -> SubmissionOutcome:
+        return SubmissionOutcome(
+            contest_id=contest_id, problem_id=problem_id, user_id=None, status=None, error=error,
+        )
+
+    @staticmethod
+    def _submission_status(solved: bool, partial: bool) -> SubmissionStatus:
+        if solved:
+            return SubmissionStatus.SOLVED
+        if partial:
+            return SubmissionStatus.PARTIAL
+        return SubmissionStatus.FAILED
+
+    def _time_taken(self, dialect: str, now: datetime, time_taken_seconds: Optional[int]):
+        """SQL expression for a submission's time taken (from the problem's start if not provided)."""
+        if time_taken_seconds is not None:
+            return literal(time_taken_seconds, Integer)
+        return case(
+            (
+                ContestProblem.started_at.isnot(None),
+                self._whole_seconds(dialect, self._elapsed_seconds(dialect, ContestProblem.started_at, now)),
+            ),
+            else_=ContestProblem.time_taken_seconds,
+        )
+
+    def _contest_open(self, dialect: str, contest_id: int, now: datetime):
+        """EXISTS condition: the contest is active and within its time limit."""
+        return exists().where(
+            Contest.id == contest_id,
+            Contest.status == ContestStatus.ACTIVE,
+            self._elapsed_seconds(dialect, Contest.started_at, now) <= Contest.time_limit_minutes * 60,
+        )
+
+    @staticmethod
+    def _elapsed_seconds(dialect: str, since, now: datetime):
+        """SQL expression for the seconds from a timestamp column to `now`."""
+        if dialect == "postgresql":
+            return func.extract("epoch", literal(now, DateTime) - since)
+        # SQLite stores timestamps as text; julianday() parses them (in days)
+        return func.round((func.julianday(literal(now, DateTime)) - func.julianday(since)) * 86400, 3)
+
+    @staticmethod
+    def _whole_seconds(dialect: str, seconds):
+        """Truncate a seconds expression to an integer (like int() on the elapsed time)."""
+        if dialect == "postgresql":
+            return cast(func.floor(seconds), Integer)
+        return cast(seconds, Integer)
+
+    @staticmethod
+    def _problem_history_upsert(
+        insert,
+        contest_id: int,
+        problem_id: str,
+        solved: bool,
+        time_seconds: Optional[int],
+        now: datetime,
+    ):
+        """
+        INSERT ... ON CONFLICT DO UPDATE of the contest user's problem history.
+
+        The user ID is selected from the contest in the same statement and
+        returned.
+        """
+        stmt = insert(ProblemHistory).from_select(
+            ["user_id", "problem_id", "last_attempted_at", "times_attempted", "times_solved", "best_time_seconds"],
+            # Typed, so PostgreSQL does not read the constants as text
+            select(
+                Contest.user_id,
+                cast(literal(problem_id), String),
+                literal(now, DateTime),
+                literal(1, Integer),
+                literal(1 if solved else 0, Integer),
+                cast(literal(time_seconds if solved else None, Integer), Integer),
+            ).where(Contest.id == contest_id),
+        )
+
+        set_ = {
+            "times_attempted": ProblemHistory.times_attempted + 1,
+            "last_attempted_at": stmt.excluded.last_attempted_at,
+        }
+        if solved:
+            set_["times_solved"] = ProblemHistory.times_solved + 1
+            if time_seconds:
+                set_["best_time_seconds"] = case(
+                    (
+                        or_(
+                            ProblemHistory.best_time_seconds.is_(None),
+                            ProblemHistory.best_time_seconds > time_seconds,
+                        ),
+                        time_seconds,
+                    ),
+                    else_=ProblemHistory.best_time_seconds,
+                )
+
+        return stmt.on_conflict_do_update(
+            index_elements=[ProblemHistory.user_id, ProblemHistory.problem_id],
+            set_=set_,
+        ).returning(ProblemHistory.user_id)
+
+    @staticmethod
+    def _problem_history_bulk_upsert(insert, rows: List[Dict[str, Any]]):
+        """Multi-row INSERT ... ON CONFLICT DO UPDATE of problem history (rows hold the batch's totals)."""
+        stmt = insert(ProblemHistory).values(rows)
+        excluded = stmt.excluded
+        return stmt.on_conflict_do_update(
+            index_elements=[ProblemHistory.user_id, ProblemHistory.problem_id],
+            set_={
+                "times_attempted": ProblemHistory.times_attempted + excluded.times_attempted,
+                "times_solved": ProblemHistory.times_solved + excluded.times_solved,
+                "last_attempted_at": excluded.last_attempted_at,
+                "best_time_seconds": case(
+                    (
+                        and_(
+                            excluded.best_time_seconds.isnot(None),
+                            or_(
+                                ProblemHistory.best_time_seconds.is_(None),
+                                excluded.best_time_seconds < ProblemHistory.best_time_seconds,
+                            ),
+                        ),
+                        excluded.best_time_seconds,
+                    ),
+                    else_=ProblemHistory.best_time_seconds,
+                ),
+            },
+        )
+
+    def _check_contest(self, db: Session, contest_id: int, now: datetime) -> Tuple[Any, Optional[str]]:
+        """
+        Check that a contest accepts submissions.
+
+        A contest past its time limit is ended (automatically) here.
+
+        Returns:
+            (contest row with user_id, None) if it is open, else
+            (row or None, why submissions are rejected)
+        """
+        contest = db.query(
+            Contest.user_id, Contest.status, Contest.started_at, Contest.time_limit_minutes,
+        ).filter(Contest.id == contest_id).first()
+        if not contest:
+            return None, f"Contest {contest_id} not found"
+        if contest.status != ContestStatus.ACTIVE:
+            return contest, f"Contest {contest_id} is not active"
+        if (now - contest.started_at).total_seconds() > contest.time_limit_minutes * 60:
+            try:
+                self.end_contest(db, contest_id, auto_end=True)
+            except ValueError:
+                # Ended by someone else meanwhile
+                pass
+            return contest, "Contest time limit exceeded"
+        return contest, None
+
+    def _raise_submission_error(self, db: Session, contest_id: int, problem_id: str) -> None:
+        """Raise the reason a submission did not match (ending the contest if time is up)."""
+        contest = db.query(Contest).filter(Contest.id == contest_id).first()
+        if not contest:
+            raise ValueError(f"Contest {contest_id} not found")
+
+        if contest.status != ContestStatus.ACTIVE:
+            raise ValueError(f"Contest {contest_id} is not active")
+
+        contest_problem = db.query(ContestProblem.id).filter(
+            ContestProblem.contest_id == contest_id,
+            ContestProblem.problem_id == problem_id,
+        ).first()
+        if not contest_problem:
+            raise ValueError(f"Problem {problem_id} not found in contest {contest_id}")
+
+        # The contest is active and has the problem, so the time limit passed
+        self.end_contest(db, contest_id, auto_end=True)
+        raise ValueError("Contest time limit exceeded")
+
+    def _submit_problem_orm(
+        self,
+        db: Session,
+        contest_id: int,
+        problem_id: str,
+        solved: bool,
+        partial: bool = False,
+        time_taken_seconds: Optional[int] = None,
+        user_approach: Optional[str] = None,
+    ) -> SubmissionOutcome:
+        """
+        Submit a solution for a problem by loading and updating ORM objects.
+
+        Used on databases without the atomic path (see submit_problem).
+
         Args:
             db: Database session
             contest_id: Contest ID
@@ -200,7 +674,7 @@ class ContestService:
             user_approach: User's approach/thought process for the problem
 
         Returns:
-            Updated ContestProblem
+            SubmissionOutcome with the problem's new status and time
         """
         # Get contest and verify it's active
         contest = db.query(Contest).filter(Contest.id == contest_id).first()
@@ -260,9 +734,18 @@ class ContestService:
         )
 
         db.commit()
+        self.exclusion_service.record_attempt(contest.user_id, problem_id)
+        get_invalidation_bus().publish(ATTEMPTS_CHANGED, contest.user_id, local=False)
         db.refresh(contest_problem)
 
-        return contest_problem
+        return SubmissionOutcome(
+            contest_id=contest_id,
+            problem_id=problem_id,
+            user_id=contest.user_id,
+            status=contest_problem.status,
+            time_taken_seconds=contest_problem.time_taken_seconds,
+            attempts=contest_problem.attempts,
+        )
 
     def _update_problem_history(
         self,
@@ -335,22 +818,33 @@ class ContestService:
         Returns:
             Contest result dictionary
         """
-        contest = db.query(Contest).filter(Contest.id == contest_id).first()
-        if not contest:
-            raise ValueError(f"Contest {contest_id} not found")
-
-        if contest.status != ContestStatus.ACTIVE:
+        # Claim the contest: only one caller (user, submission past the time
+        # limit, expiry scheduler) gets to end it and apply its ratings
+        now = datetime.utcnow()
+        claimed = db.execute(
+            update(Contest)
+            .where(Contest.id == contest_id, Contest.status == ContestStatus.ACTIVE)
+            .values(status=ContestStatus.COMPLETED, ended_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not claimed:
+            db.rollback()
+            if not db.query(Contest.id).filter(Contest.id == contest_id).first():
+                raise ValueError(f"Contest {contest_id} not found")
             raise ValueError(f"Contest {contest_id} is not active")
 
+        contest = db.query(Contest).filter(Contest.id == contest_id).first()
+
         # Mark pending/skipped problems as failed
         # Note: PARTIAL problems are treated as failed for rating purposes
         for problem in contest.problems:
             if problem.status in [SubmissionStatus.PENDING, SubmissionStatus.SKIPPED]:
                 problem.status = SubmissionStatus.FAILED
 
-        # Update contest status
+        # Update contest status (already set in the database by the claim;
+        # also set on the object, which may have been loaded before it)
         contest.status = ContestStatus.COMPLETED
-        contest.ended_at = datetime.utcnow()
+        contest.ended_at = now
 
         # Calculate total time
         total_time = sum(
@@ -360,6 +854,7 @@ class ContestService:
         )
         contest.total_time_seconds = total_time
 
+        get_stats_service().contest_status_changed(db, ContestStatus.ACTIVE, ContestStatus.COMPLETED)
         db.commit()
 
         # Calculate ratings
@@ -387,16 +882,25 @@ class ContestService:
 
     def abandon_contest(self, db: Session, contest_id: int) -> Contest:
         """Abandon a contest without rating changes."""
-        contest = db.query(Contest).filter(Contest.id == contest_id).first()
-        if not contest:
-            raise ValueError(f"Contest {contest_id} not found")
-
-        if contest.status != ContestStatus.ACTIVE:
+        # Claim the contest, as end_contest does
+        now = datetime.utcnow()
+        claimed = db.execute(
+            update(Contest)
+            .where(Contest.id == contest_id, Contest.status == ContestStatus.ACTIVE)
+            .values(status=ContestStatus.ABANDONED, ended_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not claimed:
+            db.rollback()
+            if not db.query(Contest.id).filter(Contest.id == contest_id).first():
+                raise ValueError(f"Contest {contest_id} not found")
             raise ValueError(f"Contest {contest_id} is not active")
 
+        contest = db.query(Contest).filter(Contest.id == contest_id).first()
         contest.status = ContestStatus.ABANDONED
-        contest.ended_at = datetime.utcnow()
+        contest.ended_at = now
 
+        get_stats_service().contest_status_changed(db, ContestStatus.ACTIVE, ContestStatus.ABANDONED)
         db.commit()
         db.refresh(contest)
 
@@ -0,0 +1,346 @@
+"""
+Asynchronous editorial prefetcher.
+
+When a contest is created, its Codeforces problems are handed to this
+service in the background. It resolves each contest's editorial URL,
+downloads and extracts the editorial, and stores the result in the shared
+editorial store, so reflections have an editorial ready when the user gets
+to them.
+
+Contests are fetched concurrently. Requests to the same host are limited to
+EDITORIAL_PREFETCH_PER_HOST at a time and spaced at least
+EDITORIAL_PREFETCH_MIN_INTERVAL seconds apart. The site is read from
+CODEFORCES_BASE_URL, so tests can point the prefetcher at a local fixture
+server.
+"""
+
+import asyncio
+import os
+import re
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+import httpx
+
+from ..database import SessionLocal
+from .editorial_store import get_editorial_store
+from .token_budget import extract_problem_section
+
+CODEFORCES_BASE_URL = os.getenv("CODEFORCES_BASE_URL", "https://codeforces.com")
+CODEFORCES_COOKIES = os.getenv("CODEFORCES_COOKIES", "")
+
+# Off by default, so development, test and benchmark runs make no outbound
+# requests; deployments turn it on
+PREFETCH_ENABLED = os.getenv("EDITORIAL_PREFETCH_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# Politeness limits per host
+PER_HOST_CONCURRENCY = int(os.getenv("EDITORIAL_PREFETCH_PER_HOST", "2"))
+MIN_REQUEST_INTERVAL = float(os.getenv("EDITORIAL_PREFETCH_MIN_INTERVAL", "1.0"))
+
+REQUEST_TIMEOUT = 15.0
+
+# Contests whose editorial could not be fetched are not retried for this long
+FAILURE_RETRY_SECONDS = 3600
+
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64; rv:146.0) Gecko/20100101 Firefox/146.0"
+
+# Codeforces IDs and page parsing below are also used by the scripts in
+# scripts/ (prefetch_editorials.py, fetch_codeforces_editorial.py)
+
+# Catalog IDs of Codeforces problems, e.g. cf-2191-B or cf-1850-E2
+CODEFORCES_ID = re.compile(r"^cf-(\d+)-([A-Za-z]\d?)$")
+
+# Editorial links on a contest page
+_BLOG_LINK = re.compile(r"/blog/entry/\d+")
+_TUTORIAL_LABEL = re.compile(r"tutorial|editorial|разбор", re.IGNORECASE)
+
+# Page elements that hold the editorial text, in order of preference
+_CONTENT_SELECTORS = [
+    ("div", {"class": "ttypography"}),
+    ("div", {"class": "content"}),
+    ("div", {"class": "topic-text"}),
+    ("div", {"id": "pageContent"}),
+    ("article", {}),
+]
+
+
+def parse_codeforces_id(problem_id: str) -> Optional[Tuple[int, str]]:
+    """Split a Codeforces catalog ID into (contest_id, problem_letter), or None."""
+    match = CODEFORCES_ID.match(problem_id)
+    if not match:
+        return None
+    return int(match.group(1)), match.group(2).upper()
+
+
+def find_editorial_link(html: str, page_url: str) -> Optional[str]:
+    """
+    Find the editorial link on a contest page.
+
+    Links labelled "Tutorial" or "Editorial" are preferred over other blog
+    entries (announcements).
+    """
+    from bs4 import BeautifulSoup  # Imported on first use to keep app startup fast
+
+    soup = BeautifulSoup(html, "html.parser")
+    links = soup.find_all("a", href=_BLOG_LINK)
+    if not links:
+        return None
+
+    labelled = [link for link in links if _TUTORIAL_LABEL.search(link.get_text(" ", strip=True))]
+    return urljoin(page_url, (labelled or links)[0]["href"])
+
+
+def extract_editorial_text(html: str) -> Optional[str]:
+    """Extract the editorial text from an editorial page."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    for tag, attrs in _CONTENT_SELECTORS:
+        content = soup.find(tag, attrs)
+        if content:
+            text = content.get_text(separator="\n", strip=True)
+            return text or None
+    return None
+
+
+class _HostLimiter:
+    """Concurrency and request spacing for one host."""
+
+    def __init__(self, concurrency: int, min_interval: float):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.min_interval = min_interval
+        self._lock = asyncio.Lock()
+        self._next_slot = 0.0
+
+    async def wait_turn(self) -> None:
+        """Wait until this host may receive the next request."""
+        async with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_slot)
+            self._next_slot = start + self.min_interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+class EditorialPrefetcher:
+    """Service that warms the editorial store for newly selected problems."""
+
+    def __init__(
+        self,
+        base_url: str = CODEFORCES_BASE_URL,
+        per_host_concurrency: int = PER_HOST_CONCURRENCY,
+        min_interval: float = MIN_REQUEST_INTERVAL,
+        cookies: str = CODEFORCES_COOKIES,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.per_host_concurrency = per_host_concurrency
+        self.min_interval = min_interval
+        self.cookies = cookies
+
+        self._limiters: Dict[str, _HostLimiter] = {}
+        self._limiter_loop: Optional[asyncio.AbstractEventLoop] = None
+        # Contest ID -> task fetching its editorial (shared by overlapping prefetches)
+        self._in_flight: Dict[int, asyncio.Task] = {}
+        # Contest ID -> time of the last failed fetch (kept for FAILURE_RETRY_SECONDS)
+        self._failures: Dict[int, float] = {}
+
+    def _limiter(self, url: str) -> _HostLimiter:
+        """Get the limiter for a URL's host (limiters belong to the running loop)."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._limiter_loop:
+            self._limiters = {}
+            self._in_flight = {}
+            self._limiter_loop = loop
+
+        host = urlparse(url).netloc
+        if host not in self._limiters:
+            self._limiters[host] = _HostLimiter(self.per_host_concurrency, self.min_interval)
+        return self._limiters[host]
+
+    def _create_client(self) -> httpx.AsyncClient:
+        """Create an HTTP client with browser-like headers and the configured cookies."""
+        cookies = {}
+        for item in self.cookies.split(";"):
+            if "=" in item:
+                key, value = item.split("=", 1)
+                cookies[key.strip()] = value.strip()
+
+        return httpx.AsyncClient(
+            timeout=REQUEST_TIMEOUT,
+            follow_redirects=True,
+            cookies=cookies,
+            headers={
+                "User-Agent": USER_AGENT,
+                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+                "Accept-Language": "en-US,en;q=0.5",
+            },
+        )
+
+    async def _get(self, client: httpx.AsyncClient, url: str) -> Optional[str]:
+        """GET a page within the host's politeness limits. Returns None on failure."""
+        limiter = self._limiter(url)
+        async with limiter.semaphore:
+            await limiter.wait_turn()
+            try:
+                response = await client.get(url)
+            except httpx.HTTPError as e:
+                print(f"Editorial prefetch: request to {url} failed: {e}")
+                return None
+
+        if response.status_code == 403:
+            print(f"Editorial prefetch: blocked at {url} (check CODEFORCES_COOKIES)")
+            return None
+        if response.status_code != 200:
+            print(f"Editorial prefetch: {url} returned {response.status_code}")
+            return None
+        return response.text
+
+    async def fetch_contest_editorial(
+        self, client: httpx.AsyncClient, contest_id: int
+    ) -> Optional[Tuple[str, str]]:
+        """
+        Resolve and download the editorial of a contest.
+
+        Concurrent calls for the same contest share one fetch.
+
+        Returns:
+            (editorial_url, editorial_text) or None if it could not be fetched
+        """
+        task = self._in_flight.get(contest_id)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_contest_editorial(client, contest_id))
+            self._in_flight[contest_id] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(contest_id, None))
+        return await asyncio.shield(task)
+
+    async def _fetch_contest_editorial(
+        self, client: httpx.AsyncClient, contest_id: int
+    ) -> Optional[Tuple[str, str]]:
+        contest_url = f"{self.base_url}/contest/{contest_id}"
+        contest_page = await self._get(client, contest_url)
+        if contest_page is None:
+            return None
+
+        # Parsing pages takes long enough to stall the event loop
+        editorial_url = await asyncio.to_thread(find_editorial_link, contest_page, contest_url)
+        if editorial_url is None:
+            return None
+
+        editorial_page = await self._get(client, editorial_url)
+        if editorial_page is None:
+            return None
+
+        text = await asyncio.to_thread(extract_editorial_text, editorial_page)
+        return (editorial_url, text) if text else None
+
+    def _pending_problems(self, problem_ids: Iterable[str]) -> Dict[int, List[Tuple[str, str]]]:
+        """
+        Group the problems that still need an editorial by contest.
+
+        Skips non-Codeforces problems, problems that already have a fetched
+        editorial and contests that failed recently.
+        """
+        store = get_editorial_store()
+        now = time.time()
+        contests: Dict[int, List[Tuple[str, str]]] = defaultdict(list)
+
+        db = SessionLocal()
+        try:
+            for problem_id in dict.fromkeys(problem_ids):
+                parsed = parse_codeforces_id(problem_id)
+                if parsed is None:
+                    continue
+                contest_id, letter = parsed
+                if now - self._failures.get(contest_id, 0) < FAILURE_RETRY_SECONDS:
+                    continue
+                if store.has_problem(db, problem_id, include_user=False):
+                    continue
+                contests[contest_id].append((problem_id, letter))
+        finally:
+            db.close()
+
+        return contests
+
+    def _store_editorials(self, editorials: List[Tuple[str, str, str]]) -> None:
+        """Save (problem_id, editorial_url, text) entries in one transaction."""
+        store = get_editorial_store()
+        db = SessionLocal()
+        try:
+            for problem_id, editorial_url, text in editorials:
+                store.put(db, text, problem_id=problem_id, source_url=editorial_url, source="codeforces")
+            db.commit()
+        finally:
+            db.close()
+
+    async def prefetch_problems(self, problem_ids: List[str]) -> int:
+        """
+        Fetch and store editorials for a list of catalog problems.
+
+        Args:
+            problem_ids: Catalog problem IDs (non-Codeforces IDs are ignored)
+
+        Returns:
+            Number of problems whose editorial was stored
+        """
+        contests = await asyncio.to_thread(self._pending_problems, problem_ids)
+        if not contests:
+            return 0
+
+        async with self._create_client() as client:
+            results = await asyncio.gather(
+                *(self.fetch_contest_editorial(client, contest_id) for contest_id in contests),
+                return_exceptions=True,
+            )
+
+        editorials = []
+        for (contest_id, problems), result in zip(contests.items(), results):
+            if isinstance(result, Exception) or result is None:
+                if isinstance(result, Exception):
+                    print(f"Editorial prefetch: contest {contest_id} failed: {result}")
+                self._record_failure(contest_id)
+                continue
+
+            self._failures.pop(contest_id, None)
+            editorial_url, text = result
+            for problem_id, letter in problems:
+                section = extract_problem_section(text, letter)
+                editorials.append((problem_id, editorial_url, section or text))
+
+        if editorials:
+            await asyncio.to_thread(self._store_editorials, editorials)
+            print(f"Editorial prefetch: stored {len(editorials)} editorial(s) from {len(contests)} contest(s)")
+        return len(editorials)
+
+    def _record_failure(self, contest_id: int) -> None:
+        """Remember a failed contest, dropping failures old enough to retry."""
+        now = time.time()
+        expired = [
+            other for other, failed_at in self._failures.items()
+            if now - failed_at >= FAILURE_RETRY_SECONDS
+        ]
+        for other in expired:
+            del self._failures[other]
+        self._failures[contest_id] = now
+
+    async def prefetch_for_contest(self, problem_ids: List[str]) -> None:
+        """Background task entry point: prefetch and never raise."""
+        if not PREFETCH_ENABLED:
+            return
+        try:
+            await self.prefetch_problems(problem_ids)
+        except Exception as e:
+            print(f"Editorial prefetch failed: {e}")
+
+
+# Singleton instance
+_editorial_prefetcher: Optional[EditorialPrefetcher] = None
+
+
+def get_editorial_prefetcher() -> EditorialPrefetcher:
+    """Get the singleton editorial prefetcher instance."""
+    global _editorial_prefetcher
+    if _editorial_prefetcher is None:
+        _editorial_prefetcher = EditorialPrefetcher()
+    return _editorial_prefetcher
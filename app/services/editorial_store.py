@@ -0,0 +1,184 @@
+"""
+Shared editorial store.
+
+Editorials are stored once per distinct content (SHA-256 of the normalized
+text), zlib-compressed, and mapped to catalog problems by problem_id.
+Reflections reference stored editorials by id instead of copying the text
+into every row.
+
+Only fetched editorials are shared between users. Pasted ones are stored
+(and deduplicated) without a problem mapping, and mappings from pasted
+editorials (written by earlier versions) are ignored when looking one up.
+"""
+
+import hashlib
+import zlib
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models import Editorial, ProblemEditorial
+
+# Source label for editorials pasted by users
+USER_SOURCE = "user"
+
+
+def normalize_editorial(text: str) -> str:
+    """Normalize editorial text so trivially different copies hash the same."""
+    lines = [line.rstrip() for line in text.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
+    return "\n".join(lines).strip()
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 hex digest of normalized editorial text."""
+    return hashlib.sha256(normalize_editorial(text).encode("utf-8")).hexdigest()
+
+
+def compress_text(text: str) -> bytes:
+    """Compress editorial text for storage."""
+    return zlib.compress(text.encode("utf-8"), 9)
+
+
+def decompress_text(data: bytes) -> str:
+    """Decompress stored editorial text."""
+    return zlib.decompress(bytes(data)).decode("utf-8")
+
+
+class EditorialStore:
+    """Service for storing and looking up shared editorials."""
+
+    # Decompressed editorials kept in memory (content is immutable per id)
+    CACHE_SIZE = 256
+
+    def __init__(self):
+        self._cache: "OrderedDict[int, str]" = OrderedDict()
+        self._lock = Lock()
+
+    def put(
+        self,
+        db: Session,
+        text: str,
+        problem_id: Optional[str] = None,
+        source_url: Optional[str] = None,
+        source: str = USER_SOURCE,
+    ) -> Editorial:
+        """
+        Store editorial text, reusing an existing row with the same content.
+
+        If a problem_id is given, the problem is mapped to this editorial.
+        User-pasted editorials never replace a prefetched mapping; prefetched
+        ones do replace user-pasted ones.
+
+        Args:
+            db: Database session
+            text: Editorial text
+            problem_id: Catalog problem ID the editorial belongs to (optional)
+            source_url: URL the editorial came from (optional)
+            source: "user" or the name of the site it was fetched from
+
+        Returns:
+            The stored Editorial (the caller commits)
+        """
+        normalized = normalize_editorial(text)
+        if not normalized:
+            raise ValueError("Editorial text is empty")
+
+        digest = content_hash(normalized)
+        editorial = db.query(Editorial).filter(Editorial.content_hash == digest).first()
+
+        if editorial is None:
+            editorial = Editorial(
+                content_hash=digest,
+                content=compress_text(normalized),
+                content_length=len(normalized),
+                source_url=source_url,
+            )
+            try:
+                with db.begin_nested():
+                    db.add(editorial)
+            except IntegrityError:
+                # Stored concurrently by another request
+                editorial = db.query(Editorial).filter(Editorial.content_hash == digest).one()
+
+        if problem_id:
+            self._map_problem(db, problem_id, editorial, source)
+
+        return editorial
+
+    def _map_problem(self, db: Session, problem_id: str, editorial: Editorial, source: str) -> None:
+        """Point a problem at an editorial, respecting source priority."""
+        mapping = db.query(ProblemEditorial).filter(ProblemEditorial.problem_id == problem_id).first()
+
+        if mapping is None:
+            db.add(ProblemEditorial(problem_id=problem_id, editorial_id=editorial.id, source=source))
+            return
+
+        if source == USER_SOURCE and mapping.source != USER_SOURCE:
+            return
+
+        mapping.editorial_id = editorial.id
+        mapping.source = source
+
+    def get_text(self, db: Session, editorial_id: Optional[int]) -> Optional[str]:
+        """Return the text of a stored editorial (cached after the first read)."""
+        if editorial_id is None:
+            return None
+
+        with self._lock:
+            if editorial_id in self._cache:
+                self._cache.move_to_end(editorial_id)
+                return self._cache[editorial_id]
+
+        row = db.query(Editorial.content).filter(Editorial.id == editorial_id).first()
+        if row is None:
+            return None
+
+        text = decompress_text(row.content)
+        with self._lock:
+            self._cache[editorial_id] = text
+            while len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return text
+
+    def get_for_problem(self, db: Session, problem_id: str) -> Optional[Tuple[int, Optional[str]]]:
+        """
+        Look up the fetched editorial mapped to a catalog problem.
+
+        User-pasted editorials are never returned: they belong to the user
+        who pasted them.
+
+        Returns:
+            (editorial_id, source_url) or None if the problem has no editorial
+        """
+        row = (
+            db.query(Editorial.id, Editorial.source_url)
+            .join(ProblemEditorial, ProblemEditorial.editorial_id == Editorial.id)
+            .filter(
+                ProblemEditorial.problem_id == problem_id,
+                ProblemEditorial.source != USER_SOURCE,
+            )
+            .first()
+        )
+        return (row.id, row.source_url) if row else None
+
+    def has_problem(self, db: Session, problem_id: str, include_user: bool = True) -> bool:
+        """Check whether a problem already has an editorial."""
+        query = db.query(ProblemEditorial.id).filter(ProblemEditorial.problem_id == problem_id)
+        if not include_user:
+            query = query.filter(ProblemEditorial.source != USER_SOURCE)
+        return query.first() is not None
+
+
+# Singleton instance
+_editorial_store: Optional[EditorialStore] = None
+
+
+def get_editorial_store() -> EditorialStore:
+    """Get the singleton editorial store instance."""
+    global _editorial_store
+    if _editorial_store is None:
+        _editorial_store = EditorialStore()
+    return _editorial_store
@@ -0,0 +1,144 @@
+"""
+Per-user exclusion bitsets.
+
+Problems a user attempted in the last EXCLUSION_WINDOW_DAYS days are not
+offered to them again. Instead of loading those problem IDs as a set of
+strings for every contest, each user's recent attempts are kept as a bitset
+over catalog numbers (one bit per problem, 2.5 KB for 20,000 problems) in a
+bounded LRU cache. Selection filters candidates with bitwise operations on
+it.
+
+Submissions set their bit in the cached bitset, and other workers drop
+theirs (ATTEMPTS_CHANGED on the invalidation bus). Entries are reloaded
+after EXCLUSION_CACHE_TTL_SECONDS, which picks up attempts that aged out of
+the window.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from ..models import ProblemHistory
+from .invalidation_bus import ATTEMPTS_CHANGED, USER_CHANGED, get_invalidation_bus
+from .problem_service import get_problem_service
+
+# Attempts within this many days are excluded from new contests
+EXCLUSION_WINDOW_DAYS = 30
+
+EXCLUSION_CACHE_USERS = int(os.getenv("EXCLUSION_CACHE_USERS", "10000"))
+EXCLUSION_CACHE_TTL_SECONDS = float(os.getenv("EXCLUSION_CACHE_TTL_SECONDS", "300"))
+
+
+@dataclass
+class _Entry:
+    bitset: int
+    catalog_version: int
+    loaded_at: float
+
+
+class ExclusionService:
+    """Service for users' recently attempted problems, as bitsets."""
+
+    def __init__(
+        self,
+        max_users: int = EXCLUSION_CACHE_USERS,
+        ttl_seconds: float = EXCLUSION_CACHE_TTL_SECONDS,
+    ):
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self.problem_service = get_problem_service()
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._lock = Lock()
+        # Bumped by every change, so a load that raced with one isn't cached
+        self._generation = 0
+
+    def get_bitset(self, db: Session, user_id: int) -> int:
+        """
+        Get the bitset of problems the user attempted recently.
+
+        Args:
+            db: Database session
+            user_id: User ID
+
+        Returns:
+            Bitset over catalog numbers (bit i set = problem i excluded)
+        """
+        self.problem_service.load_problems()
+        catalog_version = self.problem_service.catalog_version
+
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if (
+                entry is not None
+                and entry.catalog_version == catalog_version
+                and time.monotonic() - entry.loaded_at < self.ttl_seconds
+            ):
+                self._entries.move_to_end(user_id)
+                return entry.bitset
+            generation = self._generation
+
+        bitset = self.problem_service.exclusion_bitset(self.recent_problem_ids(db, user_id))
+
+        with self._lock:
+            if self._generation == generation:
+                self._entries[user_id] = _Entry(bitset, catalog_version, time.monotonic())
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_users:
+                    self._entries.popitem(last=False)
+        return bitset
+
+    def recent_problem_ids(self, db: Session, user_id: int) -> List[str]:
+        """Get problem IDs the user has attempted recently (from the database)."""
+        cutoff = datetime.utcnow() - timedelta(days=EXCLUSION_WINDOW_DAYS)
+
+        history = db.query(ProblemHistory.problem_id).filter(
+            ProblemHistory.user_id == user_id,
+            ProblemHistory.last_attempted_at >= cutoff,
+        ).all()
+
+        return [h.problem_id for h in history]
+
+    def record_attempt(self, user_id: int, problem_id: str) -> None:
+        """Add an attempted problem to the user's cached bitset (call after commit)."""
+        number = self.problem_service.problem_number(problem_id)
+
+        with self._lock:
+            self._generation += 1
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return
+            if number is None or entry.catalog_version != self.problem_service.catalog_version:
+                del self._entries[user_id]
+                return
+            # Every copy of a repeated ID, as exclusion_bitset does
+            entry.bitset |= self.problem_service.problem_bits(number)
+
+    def invalidate(self, user_id: Optional[int] = None) -> None:
+        """Drop a user's cached bitset (or all of them)."""
+        with self._lock:
+            self._generation += 1
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+
+# Singleton instance
+_exclusion_service: Optional[ExclusionService] = None
+
+
+def get_exclusion_service() -> ExclusionService:
+    """Get the singleton exclusion service instance."""
+    global _exclusion_service
+    if _exclusion_service is None:
+        _exclusion_service = ExclusionService()
+        bus = get_invalidation_bus()
+        bus.subscribe(ATTEMPTS_CHANGED, _exclusion_service.invalidate)
+        bus.subscribe(USER_CHANGED, _exclusion_service.invalidate)
+    return _exclusion_service
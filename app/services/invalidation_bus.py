@@ -0,0 +1,426 @@
+"""
+Cross-worker cache invalidation.
+
+The in-process caches (user contexts, exclusion bitsets, stats counters)
+are per worker. When one worker changes a user, the other workers keep
+serving their cached copy until its TTL runs out. The invalidation bus
+carries "this changed" messages between workers so each one drops its
+entries right away:
+
+- Caches subscribe to a topic with a callback that drops entries
+  (callback(key), where key None means everything).
+- Code that changes data publishes the topic and key after committing.
+  Subscribers in the same worker run immediately; other workers run theirs
+  when the message arrives.
+
+Backends (INVALIDATION_BUS):
+- `postgres`: PostgreSQL LISTEN/NOTIFY on a dedicated connection (the
+  default on PostgreSQL). On Neon, point INVALIDATION_BUS_URL at the direct
+  (non-pooled) endpoint, since the pooler does not support LISTEN.
+- `file`: an append-only file that workers on the same machine tail (for
+  SQLite with several workers).
+- `memory`: this process only (the default on SQLite).
+
+A worker that may have missed messages (reconnecting to PostgreSQL, the
+file being rotated) drops everything, so caches are never left stale.
+"""
+
+import json
+import os
+import queue
+import select
+import threading
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows; the file bus needs it
+    fcntl = None
+
+from ..database import DATABASE_SSLMODE, DATABASE_URL
+from ..instrumentation import REGISTRY, Counter
+
+INVALIDATION_BUS = os.getenv("INVALIDATION_BUS", "auto")
+INVALIDATION_BUS_URL = os.getenv("INVALIDATION_BUS_URL")
+INVALIDATION_BUS_FILE = os.getenv("INVALIDATION_BUS_FILE", "./mastercp-invalidation.log")
+INVALIDATION_BUS_POLL_SECONDS = float(os.getenv("INVALIDATION_BUS_POLL_SECONDS", "0.5"))
+
+# Names accepted by INVALIDATION_BUS
+BACKENDS = ("auto", "memory", "file", "postgres")
+
+# Topics (keys are user IDs; None = all users)
+USER_CHANGED = "user"          # Rating, weak topics or topic stats changed, or user deleted
+ATTEMPTS_CHANGED = "attempts"  # New problem attempts (exclusion bitsets)
+STATS_CHANGED = "stats"        # System counters corrected
+
+# PostgreSQL NOTIFY channel
+CHANNEL = "mastercp_invalidation"
+
+# The file is rotated once it grows past this size
+FILE_MAX_BYTES = 1_000_000
+
+# Seconds to wait before reconnecting a lost PostgreSQL listener
+RECONNECT_SECONDS = 5.0
+
+# Messages queued for PostgreSQL while it is unreachable (more are dropped;
+# the caches' TTLs still bound how stale other workers get)
+OUTBOX_SIZE = 10000
+
+MESSAGES = REGISTRY.register(Counter(
+    "invalidation_messages_total",
+    "Cache invalidation messages by topic and direction (published by this worker, received from others).",
+    ["topic", "direction"],
+))
+
+Callback = Callable[[Any], None]
+
+
+class InvalidationBus:
+    """
+    In-process invalidation bus (the `memory` backend).
+
+    Buses created with the same `hub` deliver to each other, which stands in
+    for several workers within one process.
+    """
+
+    backend = "memory"
+
+    def __init__(self, hub: Optional[List["InvalidationBus"]] = None):
+        self.origin = uuid.uuid4().hex
+        self._subscribers: Dict[str, List[Callback]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self._hub = hub if hub is not None else []
+        self._hub.append(self)
+
+    def subscribe(self, topic: str, callback: Callback) -> None:
+        """
+        Call `callback(key)` whenever `topic` is published (here or in another worker).
+
+        Callbacks run in the publishing thread or in the bus listener
+        thread, so they must be quick and thread-safe.
+        """
+        with self._lock:
+            self._subscribers[topic].append(callback)
+
+    def publish(self, topic: str, key: Any = None, local: bool = True) -> None:
+        """
+        Announce a change (call after committing it).
+
+        Args:
+            topic: What changed (USER_CHANGED, ...)
+            key: Which entry changed (JSON-serializable, None = everything)
+            local: Also run this worker's subscribers (False if the caller
+                already updated its own caches)
+        """
+        if local:
+            self._deliver(topic, key)
+        MESSAGES.inc(topic=topic, direction="published")
+        self._send(json.dumps({"origin": self.origin, "topic": topic, "key": key}))
+
+    def start(self) -> None:
+        """Start receiving messages from other workers."""
+
+    def stop(self) -> None:
+        """Stop receiving messages."""
+
+    def _send(self, payload: str) -> None:
+        for bus in list(self._hub):
+            if bus is not self:
+                bus._receive(payload)
+
+    def _receive(self, payload: str) -> None:
+        """Handle a message from the backend (ignoring this worker's own)."""
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            print(f"Invalidation bus: ignoring malformed message {payload[:100]!r}")
+            return
+        if message.get("origin") == self.origin:
+            return
+        MESSAGES.inc(topic=message.get("topic", ""), direction="received")
+        self._deliver(message.get("topic"), message.get("key"))
+
+    def _deliver(self, topic: str, key: Any) -> None:
+        with self._lock:
+            callbacks = list(self._subscribers.get(topic, ()))
+        for callback in callbacks:
+            try:
+                callback(key)
+            except Exception as e:
+                print(f"Invalidation bus: {topic} subscriber failed: {e}")
+
+    def _reset(self) -> None:
+        """Drop everything in every subscribed cache (messages may have been missed)."""
+        with self._lock:
+            topics = list(self._subscribers)
+        for topic in topics:
+            self._deliver(topic, None)
+
+
+class FileInvalidationBus(InvalidationBus):
+    """
+    Invalidation bus over an append-only file (workers on one machine).
+
+    Each message is one JSON line, appended with a single write. Workers
+    tail the file every INVALIDATION_BUS_POLL_SECONDS. A publisher that finds
+    the file larger than FILE_MAX_BYTES renames it away and starts a new
+    one; readers notice the new file and drop everything.
+
+    Publishers append and rotate holding an exclusive flock on a sidecar
+    lock file (path + ".lock"), which also holds a rotation counter. Readers
+    hold a shared lock while they read, so a rotation never happens in the
+    middle of a read, and they detect rotations by the counter changing
+    (inode numbers can be reused).
+    """
+
+    backend = "file"
+
+    def __init__(self, path: str = INVALIDATION_BUS_FILE, poll_seconds: float = INVALIDATION_BUS_POLL_SECONDS):
+        if fcntl is None:
+            raise RuntimeError("The file invalidation bus needs fcntl (not available on this platform)")
+        super().__init__()
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.poll_seconds = poll_seconds
+        self._rotations = 0
+        self._position = 0
+        self._partial = b""
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @contextmanager
+    def _locked(self, operation: int) -> Iterator[int]:
+        """Hold the bus lock (fcntl.LOCK_EX or LOCK_SH); yields the lock file's descriptor."""
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, operation)
+            yield fd
+        finally:
+            os.close(fd)  # Releases the lock
+
+    @staticmethod
+    def _read_rotations(fd: int) -> int:
+        data = os.pread(fd, 32, 0)
+        return int(data) if data.strip() else 0
+
+    def _send(self, payload: str) -> None:
+        with self._locked(fcntl.LOCK_EX) as lock_fd:
+            try:
+                rotate = os.path.getsize(self.path) > FILE_MAX_BYTES
+            except FileNotFoundError:
+                rotate = False
+            if rotate:
+                os.replace(self.path, self.path + ".old")
+                rotations = str(self._read_rotations(lock_fd) + 1).encode()
+                os.ftruncate(lock_fd, 0)
+                os.pwrite(lock_fd, rotations, 0)
+
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, payload.encode() + b"\n")
+            finally:
+                os.close(fd)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        # Only messages published from now on matter
+        with self._locked(fcntl.LOCK_SH) as lock_fd:
+            self._rotations = self._read_rotations(lock_fd)
+            try:
+                self._position = os.path.getsize(self.path)
+            except FileNotFoundError:
+                self._position = 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="invalidation-bus", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Invalidation bus: reading {self.path} failed: {e}")
+
+    def poll(self) -> None:
+        """Read and deliver new messages."""
+        with self._locked(fcntl.LOCK_SH) as lock_fd:
+            rotations = self._read_rotations(lock_fd)
+            try:
+                size = os.path.getsize(self.path)
+            except FileNotFoundError:
+                size = 0
+
+            if rotations != self._rotations or size < self._position:
+                # Rotated (or truncated): unread messages of the old file are lost
+                self._reset()
+                self._rotations, self._position, self._partial = rotations, 0, b""
+            if size == self._position:
+                return
+
+            with open(self.path, "rb") as f:
+                f.seek(self._position)
+                data = self._partial + f.read()
+                self._position = f.tell()
+        lines = data.split(b"\n")
+        # A line without its newline is still being written
+        self._partial = lines.pop()
+        for line in lines:
+            if line:
+                self._receive(line.decode())
+
+
+class PostgresInvalidationBus(InvalidationBus):
+    """
+    Invalidation bus over PostgreSQL LISTEN/NOTIFY.
+
+    One dedicated connection (outside the SQLAlchemy pool) listens on
+    CHANNEL. Published messages are queued and sent with pg_notify on the
+    same connection by the listener thread, so requests do not wait for a
+    round trip.
+    """
+
+    backend = "postgres"
+
+    def __init__(self, url: Optional[str] = None, sslmode: str = DATABASE_SSLMODE):
+        super().__init__()
+        self.url = url or INVALIDATION_BUS_URL or DATABASE_URL
+        self.sslmode = sslmode
+        self._outbox: "queue.Queue[str]" = queue.Queue(maxsize=OUTBOX_SIZE)
+        self._wakeup_read, self._wakeup_write = os.pipe()
+        os.set_blocking(self._wakeup_write, False)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _send(self, payload: str) -> None:
+        try:
+            self._outbox.put_nowait(payload)
+        except queue.Full:
+            return
+        self._wake()
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="invalidation-bus", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._wake()
+            self._thread.join()
+            self._thread = None
+
+    def _wake(self) -> None:
+        try:
+            os.write(self._wakeup_write, b"\0")
+        except BlockingIOError:
+            pass
+
+    def _connect(self):
+        import psycopg2
+        from sqlalchemy.engine import make_url
+
+        # libpq does not know SQLAlchemy driver names (postgresql+psycopg2)
+        dsn = make_url(self.url).set(drivername="postgresql").render_as_string(hide_password=False)
+        connection = psycopg2.connect(dsn, sslmode=self.sslmode)
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+        return connection
+
+    def _run(self) -> None:
+        connected_before = False
+        while not self._stop.is_set():
+            connection = None
+            try:
+                connection = self._connect()
+                if connected_before:
+                    # Messages sent while disconnected were missed
+                    self._reset()
+                connected_before = True
+                self._listen(connection)
+            except Exception as e:
+                print(f"Invalidation bus: PostgreSQL listener failed: {e}")
+                self._stop.wait(RECONNECT_SECONDS)
+            finally:
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+
+    def _listen(self, connection) -> None:
+        """Send queued messages and deliver notifications until stopped or disconnected."""
+        while not self._stop.is_set():
+            self._flush(connection)
+            readable, _, _ = select.select([connection, self._wakeup_read], [], [], RECONNECT_SECONDS)
+            if self._wakeup_read in readable:
+                os.read(self._wakeup_read, 4096)
+            connection.poll()
+            while connection.notifies:
+                self._receive(connection.notifies.pop(0).payload)
+
+    def _flush(self, connection) -> None:
+        """Send the queued messages."""
+        with connection.cursor() as cursor:
+            while True:
+                try:
+                    payload = self._outbox.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    cursor.execute("SELECT pg_notify(%s, %s)", (CHANNEL, payload))
+                except Exception:
+                    # Resend after reconnecting
+                    try:
+                        self._outbox.put_nowait(payload)
+                    except queue.Full:
+                        pass
+                    raise
+
+
+def create_invalidation_bus(backend: Optional[str] = None) -> InvalidationBus:
+    """
+    Create an invalidation bus.
+
+    Args:
+        backend: "memory", "file", "postgres" or "auto" (postgres on
+            PostgreSQL, else memory; default: INVALIDATION_BUS)
+    """
+    backend = backend or INVALIDATION_BUS
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown invalidation bus '{backend}' (expected one of {BACKENDS})")
+    if backend == "auto":
+        backend = "postgres" if "postgres" in DATABASE_URL else "memory"
+
+    if backend == "postgres":
+        return PostgresInvalidationBus()
+    if backend == "file":
+        return FileInvalidationBus()
+    return InvalidationBus()
+
+
+# Singleton instance
+_invalidation_bus: Optional[InvalidationBus] = None
+_invalidation_bus_lock = threading.Lock()
+
+
+def get_invalidation_bus() -> InvalidationBus:
+    """Get the singleton invalidation bus instance."""
+    global _invalidation_bus
+    if _invalidation_bus is None:
+        with _invalidation_bus_lock:
+            if _invalidation_bus is None:
+                _invalidation_bus = create_invalidation_bus()
+    return _invalidation_bus
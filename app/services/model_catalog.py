@@ -0,0 +1,296 @@
+"""
+Gemini model catalog.
+
+Keeps the list of Gemini models available to each API key, sorted by
+preference. The list is refreshed at startup and then periodically in the
+background. It is persisted to a JSON file (MODEL_CATALOG_FILE), so all
+workers on a host share one copy and a restarted worker has models right
+away.
+
+Reflection requests never wait for model discovery. They get the cached
+list, even if it is past its TTL (a refresh is scheduled in that case), or
+PREFERRED_GEMINI_MODELS if nothing has been discovered yet.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional
+
+import httpx
+
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+
+# Preferred Gemini models in order of preference (best first)
+PREFERRED_GEMINI_MODELS = [
+    "gemini-2.5-flash-preview-05-20",
+    "gemini-2.5-pro-preview-05-06",
+    "gemini-2.0-flash",
+    "gemini-2.0-flash-lite",
+    "gemini-1.5-pro",
+    "gemini-1.5-flash",
+    "gemini-1.5-flash-8b",
+    "gemini-pro",
+]
+
+MODEL_CATALOG_FILE = os.getenv(
+    "MODEL_CATALOG_FILE",
+    str(Path(__file__).resolve().parents[2] / ".model_catalog.json"),
+)
+
+# Model lists older than this are refreshed on next use
+MODEL_CATALOG_TTL_SECONDS = int(os.getenv("MODEL_CATALOG_TTL_SECONDS", "21600"))
+
+# How often the background task checks for lists to refresh
+MODEL_CATALOG_REFRESH_SECONDS = int(os.getenv("MODEL_CATALOG_REFRESH_SECONDS", "1800"))
+
+LIST_MODELS_TIMEOUT = 30.0
+
+
+def key_fingerprint(api_key: str) -> str:
+    """Identify an API key in the catalog file without storing the key."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+def sort_by_preference(models: List[str]) -> List[str]:
+    """Sort model names by PREFERRED_GEMINI_MODELS, keeping others after them."""
+    preferred = [model for model in PREFERRED_GEMINI_MODELS if model in models]
+    return preferred + [model for model in models if model not in preferred]
+
+
+async def fetch_gemini_models(api_key: str) -> Optional[List[str]]:
+    """
+    List the Gemini models that support generateContent for an API key.
+
+    Returns:
+        Model names sorted by preference, or None if the listing failed
+    """
+    try:
+        async with httpx.AsyncClient(timeout=LIST_MODELS_TIMEOUT) as client:
+            response = await client.get(f"{GEMINI_BASE_URL}/models", params={"key": api_key})
+    except httpx.HTTPError as e:
+        print(f"Error listing Gemini models: {e}")
+        return None
+
+    if response.status_code != 200:
+        print(f"Failed to list Gemini models: {response.status_code} - {response.text}")
+        return None
+
+    available_models = [
+        model.get("name", "").replace("models/", "")
+        for model in response.json().get("models", [])
+        if "generateContent" in model.get("supportedGenerationMethods", [])
+    ]
+    print(f"Available Gemini models: {available_models}")
+    return sort_by_preference(available_models)
+
+
+class ModelCatalog:
+    """File-backed cache of available Gemini models per API key."""
+
+    def __init__(
+        self,
+        path: str = MODEL_CATALOG_FILE,
+        ttl_seconds: int = MODEL_CATALOG_TTL_SECONDS,
+        refresh_seconds: int = MODEL_CATALOG_REFRESH_SECONDS,
+        fetch=fetch_gemini_models,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.refresh_seconds = refresh_seconds
+        self._fetch = fetch
+
+        # fingerprint -> {"models": [...], "fetched_at": unix time}
+        self._entries: Dict[str, Dict] = {}
+        self._file_mtime: Optional[float] = None
+        self._lock = Lock()
+
+        self._api_keys: List[str] = []
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    # ------------------------------------------------------------------ #
+    # Lookups (never block on the network)
+    # ------------------------------------------------------------------ #
+
+    def get_models(self, api_key: str) -> List[str]:
+        """
+        Return the models for an API key, sorted by preference.
+
+        Schedules a background refresh if the list is missing or past its
+        TTL, and returns the cached list (or the preferred defaults) at once.
+        """
+        if not api_key:
+            return []
+
+        self._reload_if_changed()
+        fingerprint = key_fingerprint(api_key)
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+
+        if entry is None or self._is_stale(entry, self.ttl_seconds):
+            self._schedule_refresh(api_key)
+
+        if entry and entry["models"]:
+            return list(entry["models"])
+        return list(PREFERRED_GEMINI_MODELS)
+
+    def _is_stale(self, entry: Dict, max_age: float) -> bool:
+        return time.time() - entry.get("fetched_at", 0) >= max_age
+
+    def _schedule_refresh(self, api_key: str) -> None:
+        """Start a refresh for a key in the background, if none is running."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        fingerprint = key_fingerprint(api_key)
+        task = self._refreshing.get(fingerprint)
+        if task is not None and not task.done():
+            return
+        self._refreshing[fingerprint] = loop.create_task(self.refresh(api_key))
+
+    # ------------------------------------------------------------------ #
+    # Refresh
+    # ------------------------------------------------------------------ #
+
+    async def refresh(self, api_key: str, max_age: float = 0) -> Optional[List[str]]:
+        """
+        Fetch the model list for a key and persist it.
+
+        Args:
+            api_key: Gemini API key
+            max_age: Skip the fetch if the stored list is younger than this
+                (another worker may have refreshed it)
+
+        Returns:
+            The current model list, or None if the fetch failed and nothing is cached
+        """
+        fingerprint = key_fingerprint(api_key)
+        self._reload_if_changed()
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+        if entry and max_age and not self._is_stale(entry, max_age):
+            return entry["models"]
+
+        models = await self._fetch(api_key)
+        if not models:
+            # Keep serving the previous list
+            return entry["models"] if entry else None
+
+        with self._lock:
+            self._entries[fingerprint] = {"models": models, "fetched_at": time.time()}
+        await asyncio.to_thread(self._save)
+        print(f"Gemini model catalog refreshed ({len(models)} models)")
+        return models
+
+    async def refresh_all(self, max_age: float = 0) -> None:
+        """Refresh the model lists of all configured keys."""
+        await asyncio.gather(
+            *(self.refresh(api_key, max_age=max_age) for api_key in self._api_keys),
+            return_exceptions=True,
+        )
+
+    async def _refresh_loop(self) -> None:
+        """Refresh at startup, then whenever lists pass half their TTL."""
+        await self.refresh_all(max_age=self.ttl_seconds / 2)
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await self.refresh_all(max_age=self.ttl_seconds / 2)
+            except Exception as e:
+                print(f"Gemini model catalog refresh failed: {e}")
+
+    def start(self, api_keys: List[str]) -> None:
+        """
+        Load the persisted catalog and start background refreshing.
+
+        Must be called from a running event loop (the app lifespan).
+        """
+        self._api_keys = [key for key in api_keys if key]
+        self._reload_if_changed()
+        if self._api_keys and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        """Stop background refreshing."""
+        tasks = [task for task in [self._task, *self._refreshing.values()] if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._refreshing = {}
+
+    # ------------------------------------------------------------------ #
+    # Persistence
+    # ------------------------------------------------------------------ #
+
+    def _reload_if_changed(self) -> None:
+        """Reload the catalog file if another worker has rewritten it."""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return
+        if mtime == self._file_mtime:
+            return
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        with self._lock:
+            self._merge(stored)
+            self._file_mtime = mtime
+
+    def _merge(self, stored: Dict[str, Dict]) -> None:
+        """Merge entries from the file, keeping the newer copy of each."""
+        for fingerprint, entry in stored.items():
+            current = self._entries.get(fingerprint)
+            if current is None or entry.get("fetched_at", 0) > current.get("fetched_at", 0):
+                self._entries[fingerprint] = entry
+
+    def _save(self) -> None:
+        """Write the catalog atomically (write a temp file, then rename)."""
+        self._reload_if_changed()
+        with self._lock:
+            data = json.dumps(self._entries, indent=2)
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        temp_path = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".model_catalog.", suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(temp_path, self.path)
+            temp_path = None
+            self._file_mtime = os.stat(self.path).st_mtime
+        except OSError as e:
+            print(f"Could not save Gemini model catalog to {self.path}: {e}")
+        finally:
+            # Left behind only if the write or rename failed
+            if temp_path is not None:
+                try:
+                    os.unlink(temp_path)
+                except FileNotFoundError:
+                    pass
+
+
+# Singleton instance
+_model_catalog: Optional[ModelCatalog] = None
+
+
+def get_model_catalog() -> ModelCatalog:
+    """Get the singleton model catalog instance."""
+    global _model_catalog
+    if _model_catalog is None:
+        _model_catalog = ModelCatalog()
+    return _model_catalog
@@ -3,16 +3,24 @@ OpenRouter API service for AI-powered reflections.
 Uses Gemini API as primary (with model discovery), Groq as backup, and OpenRouter free models as last fallback.
 """
 
-import json
 import os
-import re
-from typing import List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 
 import httpx
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+from ..instrumentation import timed_llm_call
+from .model_catalog import GEMINI_BASE_URL, get_model_catalog
+from .reflection_parser import IncrementalJSONParser, ReflectionParser
+from .token_budget import (
+    EDITORIAL_SHARE,
+    PROMPT_TOKEN_BUDGET,
+    USER_APPROACH_SHARE,
+    choose_max_tokens,
+    compact_editorial,
+    compact_user_approach,
+    estimate_tokens,
+    problem_letter_from_url,
+)
 
 # API Keys
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -21,25 +29,12 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 OPENROUTER_API_KEY = os.getenv("API_KEY")
 
 # API URLs
-GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
 GROQ_BASE_URL = "https://api.groq.com/openai/v1"
 OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 
 # Groq backup model
 GROQ_MODEL = "llama-3.3-70b-versatile"
 
-# Preferred Gemini models in order of preference (best first)
-PREFERRED_GEMINI_MODELS = [
-    "gemini-2.5-flash-preview-05-20",
-    "gemini-2.5-pro-preview-05-06",
-    "gemini-2.0-flash",
-    "gemini-2.0-flash-lite",
-    "gemini-1.5-pro",
-    "gemini-1.5-flash",
-    "gemini-1.5-flash-8b",
-    "gemini-pro",
-]
-
 # OpenRouter fallback models (free, max 3 allowed)
 OPENROUTER_FALLBACK_MODELS: List[str] = [
     "liquid/lfm-2.5-1.2b-thinking:free",  # Free thinking model
@@ -47,66 +42,54 @@ OPENROUTER_FALLBACK_MODELS: List[str] = [
     "meta-llama/llama-3.2-3b-instruct:free",  # Free Llama model
 ]
 
-# Cache for available Gemini models (keyed by API key to support fallback)
-_gemini_models_cache: dict = {}
+# Output token limit for a single reflection
+MAX_OUTPUT_TOKENS = 2000
 
+# Output token limit for a batched (multi-problem) reflection request
+BATCH_MAX_OUTPUT_TOKENS = 8192
 
-async def _list_gemini_models(api_key: str) -> List[str]:
-    """List available Gemini models and return them sorted by preference."""
-    global _gemini_models_cache
+# Output tokens requested per problem in a batched request
+BATCH_TOKENS_PER_PROBLEM = 900
 
-    # Use cache if available for this key
-    cache_key = api_key[:8] if api_key else ""  # Use first 8 chars as cache key
-    if cache_key in _gemini_models_cache:
-        return _gemini_models_cache[cache_key]
+# Reflection fields every parsed response must provide
+REFLECTION_FIELDS = ["pivot_sentence", "tips", "what_to_improve", "master_approach"]
 
-    if not api_key:
-        return []
+NO_API_KEYS_ERROR = "No API keys configured. Please set GEMINI_API_KEY, GROQ_API_KEY, or API_KEY (OpenRouter) in .env"
 
-    try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                f"{GEMINI_BASE_URL}/models",
-                params={"key": api_key},
-            )
 
-            if response.status_code != 200:
-                print(
-                    f"Failed to list Gemini models: {response.status_code} - {response.text}"
-                )
-                return []
+def gemini_api_keys() -> List[str]:
+    """Configured Gemini API keys, primary first."""
+    return [key for key in (GEMINI_API_KEY, SECOND_GEMINI_KEY) if key]
 
-            data = response.json()
-            models = data.get("models", [])
 
-            # Extract model names that support generateContent
-            available_models = []
-            for model in models:
-                model_name = model.get("name", "").replace("models/", "")
-                supported_methods = model.get("supportedGenerationMethods", [])
-                if "generateContent" in supported_methods:
-                    available_models.append(model_name)
+async def _list_gemini_models(api_key: str) -> List[str]:
+    """Return available Gemini models sorted by preference (from the model catalog, never blocks)."""
+    return get_model_catalog().get_models(api_key)
 
-            print(f"Available Gemini models: {available_models}")
 
-            # Sort by preference
-            sorted_models = []
-            for preferred in PREFERRED_GEMINI_MODELS:
-                if preferred in available_models:
-                    sorted_models.append(preferred)
+def _format_time_taken(time_taken_seconds: Optional[int]) -> str:
+    """Format a solve time for prompts."""
+    if not time_taken_seconds:
+        return "Not recorded"
+    mins = time_taken_seconds // 60
+    secs = time_taken_seconds % 60
+    return f"{mins} minutes and {secs} seconds"
 
-            # Add any other models not in our preference list
-            for model in available_models:
-                if model not in sorted_models:
-                    sorted_models.append(model)
 
-            _gemini_models_cache[cache_key] = sorted_models
-            print(f"Sorted Gemini models by preference: {sorted_models}")
-            return sorted_models
+def _format_outcome(solved: bool, partial: bool) -> str:
+    """Format a problem outcome for prompts."""
+    return "SOLVED" if solved else ("PARTIAL" if partial else "UNSOLVED")
 
-    except Exception as e:
-        print(f"Error listing Gemini models: {e}")
-        return []
+
+def _format_editorial_section(
+    editorial_text: Optional[str], editorial_url: Optional[str]
+) -> str:
+    """Format the editorial part of a prompt (empty if there is no editorial)."""
+    if editorial_text:
+        return f"\n\n## Editorial/Solution Provided:\n{editorial_text}"
+    if editorial_url:
+        return f"\n\n## Editorial URL: {editorial_url}\n(Please consider the typical solution approach for this type of problem)"
+    return ""
 
 
 def _build_prompt(
@@ -124,18 +107,10 @@ def _build_prompt(
 ) -> str:
     """Build the reflection prompt."""
     # Format time
-    time_str = "Not recorded"
-    if time_taken_seconds:
-        mins = time_taken_seconds // 60
-        secs = time_taken_seconds % 60
-        time_str = f"{mins} minutes and {secs} seconds"
+    time_str = _format_time_taken(time_taken_seconds)
 
     # Build the prompt
-    editorial_section = ""
-    if editorial_text:
-        editorial_section = f"\n\n## Editorial/Solution Provided:\n{editorial_text}"
-    elif editorial_url:
-        editorial_section = f"\n\n## Editorial URL: {editorial_url}\n(Please consider the typical solution approach for this type of problem)"
+    editorial_section = _format_editorial_section(editorial_text, editorial_url)
 
     # Build user approach section
     approach_section = ""
@@ -143,7 +118,7 @@ def _build_prompt(
         approach_section = f"\n\n## User's Approach During Contest:\n{user_approach}"
 
     # Determine outcome
-    outcome = "SOLVED" if solved else ("PARTIAL" if partial else "UNSOLVED")
+    outcome = _format_outcome(solved, partial)
 
     prompt = f"""Analyze this competitive programming attempt using Pólya's heuristics.
 
@@ -200,206 +175,71 @@ def _build_full_response_markdown(reflection_data: dict) -> str:
     return "\n\n---\n\n".join(sections)
 
 
-def _sanitize_json_string(content: str) -> str:
-    """
-    Sanitize a JSON string by escaping unescaped control characters.
-    This handles cases where the AI returns JSON with literal newlines/tabs inside string values.
-    """
-    # First, let's try to fix control characters inside JSON string values
-    # This regex finds strings and escapes control characters within them
-
-    def escape_control_chars_in_string(match):
-        """Escape control characters inside a matched JSON string."""
-        s = match.group(0)
-        # The string includes the quotes, so we process the content between them
-        if len(s) < 2:
-            return s
-        quote = s[0]
-        inner = s[1:-1]
-        # Replace unescaped control characters
-        inner = inner.replace("\n", "\\n")
-        inner = inner.replace("\r", "\\r")
-        inner = inner.replace("\t", "\\t")
-        # Handle other control characters (ASCII 0-31 except those already handled)
-        inner = re.sub(
-            r"[\x00-\x08\x0b\x0c\x0e-\x1f]",
-            lambda m: f"\\u{ord(m.group(0)):04x}",
-            inner,
-        )
-        return quote + inner + quote
-
-    # Match JSON strings (handling escaped quotes within)
-    # This pattern matches strings that start with " and end with unescaped "
-    json_string_pattern = r'"(?:[^"\\]|\\.)*"'
-
-    try:
-        sanitized = re.sub(
-            json_string_pattern,
-            escape_control_chars_in_string,
-            content,
-            flags=re.DOTALL,
-        )
-        return sanitized
-    except Exception:
-        # If regex fails, do a simple replacement
-        return content
+def _reflection_result(reflection_data: dict, model_used: str) -> dict:
+    """Build the result dict for successfully parsed reflection data."""
+    return {
+        "pivot_sentence": _to_markdown(reflection_data.get("pivot_sentence")),
+        "tips": _to_markdown(reflection_data.get("tips")),
+        "what_to_improve": _to_markdown(reflection_data.get("what_to_improve")),
+        "master_approach": _to_markdown(reflection_data.get("master_approach")),
+        "model_used": model_used,
+        "full_response": _build_full_response_markdown(reflection_data),
+        "error": None,
+    }
 
 
 def _parse_response(content: str, model_used: str) -> dict:
     """Parse the AI response and return structured data in Markdown format."""
-    # Clean up the response (remove markdown code blocks if present)
-    content = content.strip()
-    if content.startswith("```json"):
-        content = content[7:]
-    if content.startswith("```"):
-        content = content[3:]
-    if content.endswith("```"):
-        content = content[:-3]
-    content = content.strip()
-
-    # Sanitize JSON to handle control characters
-    sanitized_content = _sanitize_json_string(content)
-
+    # Single tolerant pass: handles code fences, raw control characters,
+    # trailing commas and truncated output
+    parser = ReflectionParser()
+    parser.feed(content)
     try:
-        reflection_data = json.loads(sanitized_content)
-
-        # Convert each field to markdown
-        pivot_sentence = _to_markdown(reflection_data.get("pivot_sentence"))
-        tips = _to_markdown(reflection_data.get("tips"))
-        what_to_improve = _to_markdown(reflection_data.get("what_to_improve"))
-        master_approach = _to_markdown(reflection_data.get("master_approach"))
-
-        # Build full response as markdown
-        full_response_md = _build_full_response_markdown(reflection_data)
+        parser.finish()
+        reflection_data = parser.fields()
+        parse_error = None if reflection_data else "no reflection fields found"
+    except ValueError as e:
+        reflection_data = {}
+        parse_error = str(e)
+
+    if reflection_data and not parser.truncated:
+        return _reflection_result(reflection_data, model_used)
+
+    if reflection_data:
+        # Response was cut off; keep what was decoded but mark it as partial
+        full_response_md = "## 📝 AI Reflection (Extracted)\n\n*Note: Response was partially parsed.*\n\n"
+        for section_name, section_content in reflection_data.items():
+            full_response_md += f"### {section_name.replace('_', ' ').title()}\n\n{_to_markdown(section_content)}\n\n"
 
         return {
-            "pivot_sentence": pivot_sentence,
-            "tips": tips,
-            "what_to_improve": what_to_improve,
-            "master_approach": master_approach,
+            "error": None,  # Don't show error if we extracted content
+            "pivot_sentence": _to_markdown(reflection_data.get("pivot_sentence")) or None,
+            "tips": _to_markdown(reflection_data.get("tips")) or None,
+            "what_to_improve": _to_markdown(reflection_data.get("what_to_improve")) or None,
+            "master_approach": _to_markdown(reflection_data.get("master_approach")) or None,
             "model_used": model_used,
             "full_response": full_response_md,
-            "error": None,
         }
-    except json.JSONDecodeError as e:
-        # Try a more aggressive cleanup approach
-        try:
-            # Remove all control characters and try again
-            aggressive_clean = re.sub(r"[\x00-\x1f\x7f]", " ", content)
-            aggressive_clean = _sanitize_json_string(aggressive_clean)
-            reflection_data = json.loads(aggressive_clean)
-
-            # If we get here, parsing succeeded with aggressive cleanup
-            pivot_sentence = _to_markdown(reflection_data.get("pivot_sentence"))
-            tips = _to_markdown(reflection_data.get("tips"))
-            what_to_improve = _to_markdown(reflection_data.get("what_to_improve"))
-            master_approach = _to_markdown(reflection_data.get("master_approach"))
-            full_response_md = _build_full_response_markdown(reflection_data)
-
-            return {
-                "pivot_sentence": pivot_sentence,
-                "tips": tips,
-                "what_to_improve": what_to_improve,
-                "master_approach": master_approach,
-                "model_used": model_used,
-                "full_response": full_response_md,
-                "error": None,
-            }
-        except json.JSONDecodeError:
-            pass  # Fall through to raw content handling
-
-        # If JSON parsing still fails, treat the raw content as markdown
-        # Try to extract useful content from the raw response
-        raw_content = content if content else "No response received."
-
-        # Try to extract structured content even from malformed JSON
-        extracted_sections = _extract_sections_from_raw(raw_content)
-
-        if extracted_sections:
-            # Build markdown from extracted sections
-            full_response_md = "## 📝 AI Reflection (Extracted)\n\n*Note: Response was partially parsed.*\n\n"
-            for section_name, section_content in extracted_sections.items():
-                full_response_md += f"### {section_name.replace('_', ' ').title()}\n\n{section_content}\n\n"
-
-            return {
-                "error": None,  # Don't show error if we extracted content
-                "pivot_sentence": extracted_sections.get("pivot_sentence"),
-                "tips": extracted_sections.get("tips"),
-                "what_to_improve": extracted_sections.get("what_to_improve"),
-                "master_approach": extracted_sections.get("master_approach"),
-                "model_used": model_used,
-                "full_response": full_response_md,
-            }
-
-        # Build a markdown response from raw content
-        full_response_md = f"## ⚠️ Raw AI Response\n\n*Note: The AI response could not be parsed as structured data.*\n\n{raw_content}"
 
-        return {
-            "error": f"Failed to parse AI response: {str(e)}",
-            "pivot_sentence": raw_content[:500] if raw_content else None,
-            "tips": None,
-            "what_to_improve": None,
-            "master_approach": None,
-            "model_used": model_used,
-            "full_response": full_response_md,
-        }
+    # Nothing structured could be decoded; treat the raw content as markdown
+    raw_content = content.strip() if content else "No response received."
+    full_response_md = f"## ⚠️ Raw AI Response\n\n*Note: The AI response could not be parsed as structured data.*\n\n{raw_content}"
+
+    return {
+        "error": f"Failed to parse AI response: {parse_error}",
+        "pivot_sentence": raw_content[:500] if raw_content else None,
+        "tips": None,
+        "what_to_improve": None,
+        "master_approach": None,
+        "model_used": model_used,
+        "full_response": full_response_md,
+    }
 
 
-def _extract_sections_from_raw(content: str) -> dict:
-    """
-    Try to extract sections from malformed JSON by looking for key patterns.
-    Returns a dict with extracted sections, or empty dict if extraction fails.
-    """
-    sections = {}
-
-    # Patterns to look for (key followed by colon and quoted content)
-    keys = ["pivot_sentence", "tips", "what_to_improve", "master_approach"]
-
-    for key in keys:
-        # Try to find the key and extract content after it
-        # Pattern: "key": "content" or "key": [ or "key": {
-        pattern = rf'"{key}"\s*:\s*"([^"]*(?:\\.[^"]*)*)"'
-        match = re.search(pattern, content, re.DOTALL | re.IGNORECASE)
-        if match:
-            value = match.group(1)
-            # Unescape common escapes
-            value = value.replace("\\n", "\n").replace("\\t", "\t").replace('\\"', '"')
-            sections[key] = value.strip()
-        else:
-            # Try to find array or longer content
-            # Look for key and capture everything until the next key or end
-            start_pattern = rf'"{key}"\s*:\s*'
-            start_match = re.search(start_pattern, content, re.IGNORECASE)
-            if start_match:
-                start_idx = start_match.end()
-                # Find the end (next key or closing brace)
-                remaining = content[start_idx:]
-                # Try to find a reasonable end point
-                end_patterns = [
-                    r',\s*"(?:pivot_sentence|tips|what_to_improve|master_approach)"',
-                    r"\}\s*$",
-                ]
-                end_idx = len(remaining)
-                for ep in end_patterns:
-                    end_match = re.search(ep, remaining)
-                    if end_match and end_match.start() < end_idx:
-                        end_idx = end_match.start()
-
-                extracted = remaining[:end_idx].strip()
-                # Clean up the extracted content
-                extracted = extracted.strip('"').strip(",").strip()
-                if extracted:
-                    extracted = (
-                        extracted.replace("\\n", "\n")
-                        .replace("\\t", "\t")
-                        .replace('\\"', '"')
-                    )
-                    sections[key] = extracted
-
-    return sections
-
-
-async def _call_gemini(prompt: str, model: str, api_key: str) -> dict:
+@timed_llm_call("gemini")
+async def _call_gemini(
+    prompt: str, model: str, api_key: str, max_tokens: int = MAX_OUTPUT_TOKENS
+) -> dict:
     """Call Gemini API with a specific model and API key."""
     if not api_key:
         return {"error": "Gemini API key not configured", "content": None}
@@ -414,7 +254,7 @@ async def _call_gemini(prompt: str, model: str, api_key: str) -> dict:
                     "contents": [{"parts": [{"text": prompt}]}],
                     "generationConfig": {
                         "temperature": 0.7,
-                        "maxOutputTokens": 2000,
+                        "maxOutputTokens": max_tokens,
                     },
                     "systemInstruction": {
                         "parts": [
@@ -466,7 +306,9 @@ async def _call_gemini(prompt: str, model: str, api_key: str) -> dict:
         return {"error": f"Gemini ({model}) error: {str(e)}", "content": None}
 
 
-async def _call_gemini_with_fallback(prompt: str) -> dict:
+async def _call_gemini_with_fallback(
+    prompt: str, max_tokens: int = MAX_OUTPUT_TOKENS
+) -> dict:
     """Try multiple Gemini models in order of preference, with fallback to SECOND_GEMINI_KEY."""
     # Build list of API keys to try
     api_keys_to_try = []
@@ -493,7 +335,7 @@ async def _call_gemini_with_fallback(prompt: str) -> dict:
 
         for model in available_models:
             print(f"Trying Gemini model: {model} ({key_name} key)")
-            result = await _call_gemini(prompt, model, api_key)
+            result = await _call_gemini(prompt, model, api_key, max_tokens)
 
             if result.get("content"):
                 print(f"Successfully used Gemini model: {model} ({key_name} key)")
@@ -509,7 +351,8 @@ async def _call_gemini_with_fallback(prompt: str) -> dict:
     }
 
 
-async def _call_groq(prompt: str) -> dict:
+@timed_llm_call("groq")
+async def _call_groq(prompt: str, max_tokens: int = MAX_OUTPUT_TOKENS) -> dict:
     """Call Groq API as backup."""
     if not GROQ_API_KEY:
         return {"error": "Groq API key not configured", "content": None}
@@ -532,7 +375,7 @@ async def _call_groq(prompt: str) -> dict:
                         {"role": "user", "content": prompt},
                     ],
                     "temperature": 0.7,
-                    "max_tokens": 2000,
+                    "max_tokens": max_tokens,
                 },
             )
 
@@ -552,7 +395,10 @@ async def _call_groq(prompt: str) -> dict:
         return {"error": f"Groq error: {str(e)}", "content": None}
 
 
-async def _call_openrouter_fallback(prompt: str) -> dict:
+@timed_llm_call("openrouter")
+async def _call_openrouter_fallback(
+    prompt: str, max_tokens: int = MAX_OUTPUT_TOKENS
+) -> dict:
     """Call OpenRouter API as last fallback with free models."""
     if not OPENROUTER_API_KEY:
         return {"error": "OpenRouter API key not configured", "content": None}
@@ -578,7 +424,7 @@ async def _call_openrouter_fallback(prompt: str) -> dict:
                         {"role": "user", "content": prompt},
                     ],
                     "temperature": 0.7,
-                    "max_tokens": 2000,
+                    "max_tokens": max_tokens,
                 },
             )
 
@@ -599,6 +445,118 @@ async def _call_openrouter_fallback(prompt: str) -> dict:
         return {"error": f"OpenRouter error: {str(e)}", "content": None}
 
 
+def _prompt_too_long_error(provider: str, prompt: str) -> str:
+    """Error message for a prompt that does not fit a provider's context."""
+    return f"Prompt too long for {provider} (~{estimate_tokens(prompt, provider)} tokens)"
+
+
+async def _call_providers(prompt: str, max_tokens: int = MAX_OUTPUT_TOKENS) -> dict:
+    """
+    Send a prompt through the provider chain.
+    Tries Gemini first (with model discovery), then Groq, then OpenRouter free models.
+
+    max_tokens is an upper bound; each provider gets a budget that fits its
+    context window and the latency SLO (see token_budget.choose_max_tokens).
+
+    Returns:
+        dict with keys: content, model, error (content is None if every provider failed)
+    """
+    # Try Gemini first (primary)
+    gemini_tokens = choose_max_tokens("gemini", prompt, max_tokens)
+    if GEMINI_API_KEY and gemini_tokens:
+        print(f"Attempting Gemini API (primary, max_tokens={gemini_tokens})...")
+        gemini_result = await _call_gemini_with_fallback(prompt, gemini_tokens)
+        if gemini_result.get("content"):
+            return gemini_result
+        gemini_error = gemini_result.get("error", "Unknown Gemini error")
+        print(f"Gemini failed: {gemini_error}")
+    elif GEMINI_API_KEY:
+        gemini_error = _prompt_too_long_error("Gemini", prompt)
+    else:
+        gemini_error = "Gemini API key not configured"
+
+    # Try Groq as backup
+    groq_tokens = choose_max_tokens("groq", prompt, max_tokens)
+    if GROQ_API_KEY and groq_tokens:
+        print(f"Attempting Groq API (backup, max_tokens={groq_tokens})...")
+        groq_result = await _call_groq(prompt, groq_tokens)
+        if groq_result.get("content"):
+            return groq_result
+        groq_error = groq_result.get("error", "Unknown Groq error")
+        print(f"Groq failed: {groq_error}")
+    elif GROQ_API_KEY:
+        groq_error = _prompt_too_long_error("Groq", prompt)
+    else:
+        groq_error = "Groq API key not configured"
+
+    # Fallback to OpenRouter free models
+    openrouter_tokens = choose_max_tokens("openrouter", prompt, max_tokens)
+    if OPENROUTER_API_KEY and openrouter_tokens:
+        print(f"Attempting OpenRouter API (last fallback, max_tokens={openrouter_tokens})...")
+        openrouter_result = await _call_openrouter_fallback(prompt, openrouter_tokens)
+        if openrouter_result.get("content"):
+            return openrouter_result
+        openrouter_error = openrouter_result.get("error", "Unknown OpenRouter error")
+    elif OPENROUTER_API_KEY:
+        openrouter_error = _prompt_too_long_error("OpenRouter", prompt)
+    else:
+        openrouter_error = "OpenRouter API key not configured"
+
+    # All failed
+    return {
+        "error": f"All providers failed. Gemini: {gemini_error}. Groq: {groq_error}. OpenRouter: {openrouter_error}",
+        "content": None,
+        "model": None,
+    }
+
+
+def _error_result(error: str) -> dict:
+    """Build a reflection result for a failed generation."""
+    return {
+        "error": error,
+        "pivot_sentence": None,
+        "tips": None,
+        "what_to_improve": None,
+        "master_approach": None,
+        "model_used": None,
+    }
+
+
+def _compact_inputs(
+    editorial_text: Optional[str],
+    user_approach: Optional[str],
+    problem_url: Optional[str],
+    token_budget: int,
+) -> tuple:
+    """
+    Fit the editorial and user approach into a prompt token budget.
+
+    Long editorials are deduplicated, narrowed to the problem's own section
+    (letter taken from the URL), stripped of code and trimmed.
+
+    Returns:
+        (editorial_text, user_approach)
+    """
+    editorial_budget = int(token_budget * EDITORIAL_SHARE)
+    approach_budget = int(token_budget * USER_APPROACH_SHARE)
+
+    compacted_editorial = compact_editorial(
+        editorial_text, editorial_budget, problem_letter_from_url(problem_url)
+    )
+    if compacted_editorial is not editorial_text:
+        print(
+            f"Compacted editorial: ~{estimate_tokens(editorial_text)} -> "
+            f"~{estimate_tokens(compacted_editorial)} tokens"
+        )
+
+    return compacted_editorial, compact_user_approach(user_approach, approach_budget)
+
+
+def _no_api_keys_configured() -> bool:
+    """Check whether no provider API key is configured."""
+    return not GEMINI_API_KEY and not GROQ_API_KEY and not OPENROUTER_API_KEY
+
+
 async def generate_reflection(
     problem_name: str,
     problem_url: str,
@@ -620,15 +578,13 @@ async def generate_reflection(
         dict with keys: pivot_sentence, tips, what_to_improve, master_approach, model_used, error
     """
     # Check if at least one API key is configured
-    if not GEMINI_API_KEY and not GROQ_API_KEY and not OPENROUTER_API_KEY:
-        return {
-            "error": "No API keys configured. Please set GEMINI_API_KEY, GROQ_API_KEY, or API_KEY (OpenRouter) in .env",
-            "pivot_sentence": None,
-            "tips": None,
-            "what_to_improve": None,
-            "master_approach": None,
-            "model_used": None,
-        }
+    if _no_api_keys_configured():
+        return _error_result(NO_API_KEYS_ERROR)
+
+    # Keep long editorials and notes within the prompt budget
+    editorial_text, user_approach = _compact_inputs(
+        editorial_text, user_approach, problem_url, PROMPT_TOKEN_BUDGET
+    )
 
     # Build the prompt
     prompt = _build_prompt(
@@ -645,46 +601,164 @@ async def generate_reflection(
         user_rating=user_rating,
     )
 
-    # Try Gemini first (primary)
-    if GEMINI_API_KEY:
-        print("Attempting Gemini API (primary)...")
-        gemini_result = await _call_gemini_with_fallback(prompt)
-        if gemini_result.get("content"):
-            return _parse_response(gemini_result["content"], gemini_result["model"])
-        gemini_error = gemini_result.get("error", "Unknown Gemini error")
-        print(f"Gemini failed: {gemini_error}")
-    else:
-        gemini_error = "Gemini API key not configured"
+    result = await _call_providers(prompt)
+    if result.get("content"):
+        return _parse_response(result["content"], result["model"])
 
-    # Try Groq as backup
-    if GROQ_API_KEY:
-        print("Attempting Groq API (backup)...")
-        groq_result = await _call_groq(prompt)
-        if groq_result.get("content"):
-            return _parse_response(groq_result["content"], groq_result["model"])
-        groq_error = groq_result.get("error", "Unknown Groq error")
-        print(f"Groq failed: {groq_error}")
-    else:
-        groq_error = "Groq API key not configured"
+    return _error_result(result["error"])
 
-    # Fallback to OpenRouter free models
-    if OPENROUTER_API_KEY:
-        print("Attempting OpenRouter API (last fallback)...")
-        openrouter_result = await _call_openrouter_fallback(prompt)
-        if openrouter_result.get("content"):
-            return _parse_response(
-                openrouter_result["content"], openrouter_result["model"]
-            )
-        openrouter_error = openrouter_result.get("error", "Unknown OpenRouter error")
-    else:
-        openrouter_error = "OpenRouter API key not configured"
 
-    # All failed
-    return {
-        "error": f"All providers failed. Gemini: {gemini_error}. Groq: {groq_error}. OpenRouter: {openrouter_error}",
-        "pivot_sentence": None,
-        "tips": None,
-        "what_to_improve": None,
-        "master_approach": None,
-        "model_used": None,
-    }
+def _build_batch_prompt(problems: List[Dict[str, Any]], user_rating: int) -> str:
+    """
+    Build one reflection prompt covering several problems.
+
+    The shared instructions and Pólya heuristics appear once; each problem
+    contributes only its own details.
+
+    Args:
+        problems: Problem dicts with an "id" plus the keyword arguments of
+            generate_reflection (problem_name, topic, difficulty, solved, ...)
+        user_rating: User's rating at contest start
+
+    Returns:
+        Prompt asking for a JSON array with one reflection per problem id
+    """
+    # The prompt budget is shared by all problems
+    per_problem_budget = max(PROMPT_TOKEN_BUDGET // len(problems), 500)
+
+    problem_sections = []
+    for problem in problems:
+        editorial_text, user_approach = _compact_inputs(
+            problem.get("editorial_text"),
+            problem.get("user_approach"),
+            problem.get("problem_url"),
+            per_problem_budget,
+        )
+        section = (
+            f"### Problem id={problem['id']}\n"
+            f"**Problem**: {problem['problem_name']} | "
+            f"{problem['topic'].replace('_', ' ').title()} | "
+            f"Difficulty: {problem['difficulty']}/100\n"
+            f"**Result**: {_format_outcome(problem['solved'], problem.get('partial', False))} | "
+            f"Time: {_format_time_taken(problem.get('time_taken_seconds'))}"
+        )
+        if user_approach:
+            section += f"\n**User's Approach During Contest**:\n{user_approach}"
+        section += _format_editorial_section(editorial_text, problem.get("editorial_url"))
+        problem_sections.append(section)
+
+    problems_text = "\n\n".join(problem_sections)
+    ids = ", ".join(str(problem["id"]) for problem in problems)
+
+    return f"""Analyze these {len(problems)} competitive programming attempts from one contest using Pólya's heuristics.
+
+**User Rating**: {user_rating}/100
+
+**Pólya Heuristics to Consider**: Understanding, Edge Cases, Invariants/Monovariants, Reformulation, Working Backward, Simpler Related Problem, Symmetry, Constraints Analysis, Greedy/DP Structure, Key Insight, Future Heuristic.
+
+{problems_text}
+
+Respond with ONLY a valid JSON array (no markdown) containing exactly one object per problem, for ids {ids}. All strings on ONE LINE, use \\n for breaks, escape special chars. Keep each field concise.
+
+[
+    {{
+        "id": <problem id>,
+        "pivot_sentence": "Key Pólya insight that unlocks this problem - frame as reusable heuristic.",
+        "tips": "3-5 tips referencing Pólya heuristics (e.g. 'Constraints: N≤10^5 suggests O(n log n)'). Use \\n between tips.",
+        "what_to_improve": "Which heuristics were missed? If the user's approach is given, how did it diverge from the editorial? Use \\n for breaks.",
+        "master_approach": "Expert approach via Pólya: (1) Restate problem (2) Which heuristics & why (3) Key steps (4) Patterns to remember. Use \\n for breaks."
+    }}
+]"""
+
+
+def _iter_batch_items(content: str) -> Iterator[dict]:
+    """
+    Yield the complete JSON objects of a batched response.
+
+    A response that was cut off midway still yields every object that was
+    closed before the cut; the truncated object is skipped.
+    """
+    parser = IncrementalJSONParser()
+    parser.feed(content)
+    try:
+        items = parser.finish()
+    except ValueError:
+        return
+
+    if isinstance(items, dict):
+        # Some models wrap the array in an object
+        items = next((v for v in items.values() if isinstance(v, list)), [items])
+
+    for item in items:
+        if isinstance(item, dict) and parser.is_complete(item):
+            yield item
+
+
+def _is_valid_reflection(result: dict) -> bool:
+    """Check that a parsed reflection has no error and every field filled in."""
+    return not result.get("error") and all(result.get(field) for field in REFLECTION_FIELDS)
+
+
+async def generate_reflections_batch(
+    problems: List[Dict[str, Any]],
+    user_rating: int = 20,
+) -> Dict[Any, dict]:
+    """
+    Generate reflections for several problems with a single provider call.
+
+    All problems are packed into one prompt and the response is split per
+    problem id. Each complete item is converted like a single response;
+    problems whose item is missing, truncated or invalid fall back to an
+    individual generate_reflection call.
+
+    Args:
+        problems: Problem dicts with a unique "id" plus the keyword arguments
+            of generate_reflection (problem_name, problem_url, topic, ...)
+        user_rating: User's rating at contest start
+
+    Returns:
+        dict mapping problem id to a result shaped like generate_reflection's
+    """
+    if not problems:
+        return {}
+
+    if _no_api_keys_configured():
+        return {problem["id"]: _error_result(NO_API_KEYS_ERROR) for problem in problems}
+
+    if len(problems) == 1:
+        problem = problems[0]
+        kwargs = {key: value for key, value in problem.items() if key != "id"}
+        return {problem["id"]: await generate_reflection(user_rating=user_rating, **kwargs)}
+
+    prompt = _build_batch_prompt(problems, user_rating)
+    response = await _call_providers(
+        prompt, max_tokens=min(BATCH_MAX_OUTPUT_TOKENS, BATCH_TOKENS_PER_PROBLEM * len(problems))
+    )
+
+    if not response.get("content"):
+        # Every provider failed; retrying per problem would fail the same way
+        return {problem["id"]: _error_result(response["error"]) for problem in problems}
+
+    ids_by_key = {str(problem["id"]): problem["id"] for problem in problems}
+    results: Dict[Any, dict] = {}
+
+    for item in _iter_batch_items(response["content"]):
+        problem_id = ids_by_key.get(str(item.get("id")))
+        if problem_id is None or problem_id in results:
+            continue
+
+        parsed = _reflection_result(item, response["model"])
+        if _is_valid_reflection(parsed):
+            results[problem_id] = parsed
+
+    missing = [problem for problem in problems if problem["id"] not in results]
+    print(
+        f"Batched reflection: {len(results)}/{len(problems)} problems parsed"
+        + (f", falling back for {len(missing)}" if missing else "")
+    )
+
+    for problem in missing:
+        kwargs = {key: value for key, value in problem.items() if key != "id"}
+        results[problem["id"]] = await generate_reflection(user_rating=user_rating, **kwargs)
+
+    return results
@@ -1,14 +1,20 @@
 """
 Problem selection service.
-Handles loading problems from standardized_problems.json and selecting appropriate problems for contests.
+Handles loading problems from the standardized catalog and selecting appropriate problems for contests.
 """
 
-import json
 import os
 import random
-from typing import List, Dict, Any, Optional, Set
+import threading
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Set, Tuple
 from dataclasses import dataclass
 from functools import lru_cache
+from itertools import chain
+
+from ..catalog_io import find_catalog_file, iter_catalog
+from .selection_engine import ENGINES, NumpySelectionEngine, numpy_available
+from .shared_catalog import CatalogIndex, attach_shared_catalog, build_catalog
+from .topic_scheduler import SCHEDULERS, WeightedTopicScheduler
 
 
 @dataclass
@@ -32,6 +38,9 @@ class ProblemService:
     # Difficulty tolerance when selecting problems
     DIFFICULTY_TOLERANCE = 5
 
+    # Random probes for a free problem before listing a window's free problems
+    FREE_PROBES = 4
+
     # Topics to use for distribution (based on pattern_id or primary skills)
     CORE_TOPICS = [
         "dp_general", "dp_knapsack", "dp_lis", "dp_bitmask", "dp_trees",
@@ -45,88 +54,204 @@ class ProblemService:
         "tech_implementation", "tech_brute",
     ]
 
-    def __init__(self, problems_file: str = None):
-        """Initialize the problem service."""
+    # Decoded problems kept per process (the catalog itself stays packed)
+    PROBLEM_CACHE_SIZE = 4096
+
+    def __init__(
+        self,
+        problems_file: str = None,
+        shared_name: str = None,
+        selection_engine: str = None,
+        topic_scheduler: str = None,
+    ):
+        """
+        Initialize the problem service.
+
+        Args:
+            problems_file: Catalog file (default: PROBLEMS_FILE or output/)
+            shared_name: Shared memory catalog to attach instead of loading
+                the file (default: CATALOG_SHM_NAME)
+            selection_engine: "python" or "numpy" (default:
+                PROBLEM_SELECTION_ENGINE, else "python")
+            topic_scheduler: "weighted" or "shuffle" (default:
+                TOPIC_SCHEDULER, else "weighted")
+        """
         if problems_file is None:
-            # Default path relative to this file
+            problems_file = os.getenv("PROBLEMS_FILE")
+        if problems_file is None:
+            # Default path relative to this file (prefers the compressed JSON Lines catalog)
             base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-            problems_file = os.path.join(base_dir, "output", "standardized_problems.json")
+            problems_file = find_catalog_file(os.path.join(base_dir, "output"))
+        if shared_name is None:
+            shared_name = os.getenv("CATALOG_SHM_NAME")
+        if selection_engine is None:
+            selection_engine = os.getenv("PROBLEM_SELECTION_ENGINE", "python")
+        if selection_engine not in ENGINES:
+            raise ValueError(f"Unknown selection engine '{selection_engine}' (expected one of {ENGINES})")
+        if selection_engine == "numpy" and not numpy_available():
+            print("Warning: numpy is not installed, using the python selection engine")
+            selection_engine = "python"
+        if topic_scheduler is None:
+            topic_scheduler = os.getenv("TOPIC_SCHEDULER", "weighted")
+        if topic_scheduler not in SCHEDULERS:
+            raise ValueError(f"Unknown topic scheduler '{topic_scheduler}' (expected one of {SCHEDULERS})")
 
         self.problems_file = problems_file
-        self._problems: List[Problem] = []
-        self._problems_by_id: Dict[str, Problem] = {}
-        self._problems_by_topic: Dict[str, List[Problem]] = {}
-        self._problems_by_difficulty: Dict[int, List[Problem]] = {}
+        self.shared_name = shared_name
+        self.selection_engine = selection_engine
+        self.topic_scheduler = topic_scheduler
+        self._catalog: Optional[CatalogIndex] = None
+        self._numpy_engine: Optional[NumpySelectionEngine] = None
+        self._weighted_scheduler: Optional[WeightedTopicScheduler] = None
+        # Bumped whenever the catalog (and so the problem numbering) changes
+        self.catalog_version = 0
+        self._problem_at = lru_cache(maxsize=self.PROBLEM_CACHE_SIZE)(self._decode_problem)
         self._loaded = False
+        self._load_lock = threading.Lock()
 
     def load_problems(self) -> None:
-        """Load problems from JSON file."""
+        """
+        Load problems from the catalog file, one record at a time.
+
+        If a shared catalog is configured (CATALOG_SHM_NAME), it is attached
+        instead, falling back to the file if the segment does not exist.
+
+        Safe to call from several threads: the catalog is loaded once, and
+        callers arriving while it loads (e.g. requests during the background
+        load at startup) wait for it to finish.
+        """
         if self._loaded:
             return
 
-        if not os.path.exists(self.problems_file):
-            raise FileNotFoundError(f"Problems file not found: {self.problems_file}")
-
-        with open(self.problems_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-
-        problems_data = data.get("problems", [])
-
-        for p in problems_data:
-            problem = Problem(
-                id=p.get("id", ""),
-                name=p.get("name", "Unknown"),
-                url=p.get("url", ""),
-                source=p.get("source", ""),
-                difficulty=p.get("internal_rating", 50),
-                primary_skills=p.get("primary_skills", []),
-                secondary_skills=p.get("secondary_skills", []),
-                pattern_id=p.get("pattern_id"),
-                tags=p.get("tags", []),
-                extra=p.get("extra", {}),
-            )
-
-            if not problem.id or not problem.url:
+        with self._load_lock:
+            if self._loaded:
+                return
+
+            if self.shared_name:
+                try:
+                    self._set_catalog(attach_shared_catalog(self.shared_name))
+                    return
+                except FileNotFoundError:
+                    print(f"Warning: shared catalog '{self.shared_name}' not found, loading the file instead")
+
+            if not os.path.exists(self.problems_file):
+                raise FileNotFoundError(f"Problems file not found: {self.problems_file}")
+
+            self.load_records(iter_catalog(self.problems_file))
+
+    def load_records(self, records: Iterable[Dict[str, Any]]) -> None:
+        """Build the problem index from an iterable of catalog records."""
+        self._set_catalog(CatalogIndex(build_catalog(self.iter_catalog_entries(records))))
+
+    def iter_catalog_entries(self, records: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Convert catalog records into entries for build_catalog (skipping invalid ones)."""
+        for p in records:
+            entry = {
+                "id": p.get("id", ""),
+                "name": p.get("name", "Unknown"),
+                "url": p.get("url", ""),
+                "source": p.get("source", ""),
+                "difficulty": p.get("internal_rating", 50),
+                "primary_skills": p.get("primary_skills", []),
+                "secondary_skills": p.get("secondary_skills", []),
+                "pattern_id": p.get("pattern_id"),
+                "tags": p.get("tags", []),
+                "extra": p.get("extra", {}),
+            }
+
+            if not entry["id"] or not entry["url"]:
                 continue
 
-            self._problems.append(problem)
-            self._problems_by_id[problem.id] = problem
-
-            # Index by topic (use pattern_id or first primary skill)
-            topic = self._get_topic(problem)
-            if topic not in self._problems_by_topic:
-                self._problems_by_topic[topic] = []
-            self._problems_by_topic[topic].append(problem)
-
-            # Index by difficulty (bucketed by 5)
-            bucket = (problem.difficulty // 5) * 5
-            if bucket not in self._problems_by_difficulty:
-                self._problems_by_difficulty[bucket] = []
-            self._problems_by_difficulty[bucket].append(problem)
-
+            # Indexed by topic (pattern_id or first primary skill) and difficulty
+            entry["topic"] = self._topic_for(entry["pattern_id"], entry["primary_skills"])
+            yield entry
+
+    def _set_catalog(self, catalog: CatalogIndex) -> None:
+        """Switch to a loaded catalog index."""
+        self._catalog = catalog
+        self._numpy_engine = None
+        self._weighted_scheduler = None
+        self.catalog_version += 1
+        self._problem_at.cache_clear()
         self._loaded = True
-        print(f"Loaded {len(self._problems)} problems")
-        print(f"Topics: {len(self._problems_by_topic)}")
+        where = f"shared memory '{self.shared_name}'" if catalog.shared else "memory"
+        print(f"Loaded {len(catalog)} problems ({catalog.nbytes / 1e6:.1f} MB in {where})")
+        print(f"Topics: {len(catalog.topics)}")
+
+    def _decode_problem(self, number: int) -> Problem:
+        """Build the Problem for a catalog number (cached in _problem_at)."""
+        record = self._catalog.record(number)
+        return Problem(
+            id=record["id"],
+            name=record["name"],
+            url=record["url"],
+            source=record["source"],
+            difficulty=record["difficulty"],
+            primary_skills=record["primary_skills"],
+            secondary_skills=record["secondary_skills"],
+            pattern_id=record["pattern_id"],
+            tags=record["tags"],
+            extra=record["extra"],
+        )
+
+    def problem_count(self) -> int:
+        """Number of problems in the catalog (0 until it is loaded)."""
+        return len(self._catalog) if self._loaded else 0
+
+    def iter_problems(self) -> Iterator[Problem]:
+        """Iterate over all problems (decoded one at a time, not cached)."""
+        self.load_problems()
+        for number in range(len(self._catalog)):
+            yield self._decode_problem(number)
 
     def _get_topic(self, problem: Problem) -> str:
         """Get the primary topic for a problem."""
-        if problem.pattern_id:
-            return problem.pattern_id
-        if problem.primary_skills:
+        return self._topic_for(problem.pattern_id, problem.primary_skills)
+
+    @staticmethod
+    def _topic_for(pattern_id: Optional[str], primary_skills: List[str]) -> str:
+        """Topic from a pattern ID, else the first primary skill."""
+        if pattern_id:
+            return pattern_id
+        if primary_skills:
             # Convert skill to topic-like format
-            skill = problem.primary_skills[0].lower().replace(" ", "_")
+            skill = primary_skills[0].lower().replace(" ", "_")
             return f"skill_{skill}"
         return "general"
 
     def get_problem(self, problem_id: str) -> Optional[Problem]:
         """Get a problem by ID."""
+        number = self.problem_number(problem_id)
+        return self._problem_at(number) if number is not None else None
+
+    def problem_number(self, problem_id: str) -> Optional[int]:
+        """Get the catalog number (dense index) of a problem, or None."""
         self.load_problems()
-        return self._problems_by_id.get(problem_id)
+        return self._catalog.index_of(problem_id)
 
     def get_available_topics(self) -> List[str]:
         """Get list of available topics."""
         self.load_problems()
-        return list(self._problems_by_topic.keys())
+        return list(self._catalog.topics)
+
+    def exclusion_bitset(self, problem_ids: Iterable[str]) -> int:
+        """
+        Bitset over catalog numbers of the given problem IDs.
+
+        IDs that are not in the catalog are ignored (they can't be selected);
+        an ID the catalog repeats sets the bit of every copy.
+        """
+        self.load_problems()
+        return self._catalog.bitset(chain.from_iterable(
+            self._catalog.numbers_of(problem_id) for problem_id in problem_ids
+        ))
+
+    def problem_bits(self, number: int) -> int:
+        """Bits of a problem and of any other catalog entry with the same ID."""
+        bits = 0
+        for other in self._catalog.numbers_of(self._catalog.problem_id(number)):
+            bits |= 1 << other
+        return bits
 
     def select_problems_for_contest(
         self,
@@ -135,62 +260,203 @@ class ProblemService:
         weak_topics: List[str] = None,
         excluded_problem_ids: Set[str] = None,
         include_weak_topics: bool = True,
+        excluded: Optional[int] = None,
+        topic_need: Optional[Dict[str, float]] = None,
     ) -> List[Dict[str, Any]]:
         """
         Select problems for a contest with topic distribution.
 
+        Runs on the configured selection engine: the Python code below, or
+        the vectorized NumPy engine (see selection_engine). The Python engine
+        picks the topics of regular problems with the configured topic
+        scheduler (see topic_scheduler).
+
         Args:
             target_difficulty: Target difficulty (user rating + 10)
             num_problems: Number of problems to select
             weak_topics: List of user's weak topics
             excluded_problem_ids: Problems to exclude (already solved)
             include_weak_topics: Whether to include weak topic problems
+            excluded: Problems to exclude as a bitset (see exclusion_bitset),
+                used instead of excluded_problem_ids
+            topic_need: Topic -> need weight for the weighted scheduler
+                (see topic_scheduler.topic_need; default 1.0 for all)
 
         Returns:
             List of problem dicts with topic and is_weak_topic_problem flags
         """
         self.load_problems()
 
-        if excluded_problem_ids is None:
-            excluded_problem_ids = set()
+        if excluded is None:
+            excluded = self.exclusion_bitset(excluded_problem_ids or ())
         if weak_topics is None:
             weak_topics = []
 
-        selected = []
-        used_topics = set()
-        used_problem_ids = set(excluded_problem_ids)
+        weak_topic_count = self.weak_topic_count(num_problems, weak_topics, include_weak_topics)
+
+        if self.selection_engine == "numpy":
+            if self._numpy_engine is None:
+                self._numpy_engine = NumpySelectionEngine(self._catalog)
+            # Same difficulty windows as below
+            picks = self._numpy_engine.select(
+                target_difficulty=target_difficulty,
+                num_problems=num_problems,
+                weak_topics=weak_topics[:weak_topic_count],
+                excluded=excluded,
+                tolerance=self.DIFFICULTY_TOLERANCE,
+                weak_difficulty=target_difficulty - 10,
+                weak_tolerance=self.DIFFICULTY_TOLERANCE + 5,
+            )
+            return [
+                {
+                    "problem": self._problem_at(number),
+                    "topic": topic,
+                    "is_weak_topic_problem": is_weak,
+                    "target_difficulty": difficulty,
+                }
+                for number, topic, is_weak, difficulty in picks
+            ]
+
+        # First, select weak topic problems (at lower difficulty)
+        selected, used = self.select_weak_topic_problems(
+            target_difficulty, weak_topics[:weak_topic_count], excluded,
+        )
+        used_topics = {item["topic"] for item in selected}
 
-        # Determine how many weak topic problems to include
-        weak_topic_count = 0
+        # Fill remaining slots with distributed topics
+        if self.topic_scheduler == "weighted":
+            used = self._select_scheduled_topics(selected, used, used_topics, target_difficulty, num_problems, topic_need)
+        else:
+            used = self._select_shuffled_topics(selected, used, used_topics, target_difficulty, num_problems)
+
+        # If still not enough, relax constraints
+        if len(selected) < num_problems:
+            remaining_needed = num_problems - len(selected)
+            fallback = self._select_fallback_problems(
+                difficulty=target_difficulty,
+                count=remaining_needed,
+                excluded=used,
+            )
+            for number in fallback:
+                selected.append({
+                    "problem": self._problem_at(number),
+                    "topic": self._catalog.topics[self._catalog.topic[number]],
+                    "is_weak_topic_problem": False,
+                    "target_difficulty": target_difficulty,
+                })
+
+        return selected
+
+    @staticmethod
+    def weak_topic_count(num_problems: int, weak_topics: List[str], include_weak_topics: bool = True) -> int:
+        """How many of a contest's problems come from weak topics."""
         if include_weak_topics and weak_topics:
-            weak_topic_count = min(len(weak_topics), max(1, num_problems // 3))
+            return min(len(weak_topics), max(1, num_problems // 3))
+        return 0
 
-        # First, select weak topic problems (at lower difficulty)
-        for i, weak_topic in enumerate(weak_topics[:weak_topic_count]):
+    def select_weak_topic_problems(
+        self,
+        target_difficulty: int,
+        weak_topics: List[str],
+        excluded: int,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Select one problem for each weak topic (where one is available).
+
+        Args:
+            target_difficulty: Contest target difficulty
+            weak_topics: Weak topics to select for, in order
+            excluded: Problems to exclude, as a bitset
+
+        Returns:
+            Selected problem dicts, and `excluded` with them added
+        """
+        self.load_problems()
+        selected = []
+        used = excluded
+
+        for weak_topic in weak_topics:
             # Weak topic problems are at current level, not target
             # This will be adjusted by the calling code based on WeakTopic.current_level
-            problem = self._select_problem_for_topic(
+            number = self._select_problem_for_topic(
                 topic=weak_topic,
                 difficulty=target_difficulty - 10,  # Lower difficulty for weak topics
                 tolerance=self.DIFFICULTY_TOLERANCE + 5,  # More tolerance
-                excluded=used_problem_ids,
+                excluded=used,
             )
 
-            if problem:
+            if number is not None:
                 selected.append({
-                    "problem": problem,
+                    "problem": self._problem_at(number),
                     "topic": weak_topic,
                     "is_weak_topic_problem": True,
                     "target_difficulty": target_difficulty - 10,
                 })
-                used_problem_ids.add(problem.id)
-                used_topics.add(weak_topic)
+                used |= self.problem_bits(number)
 
-        # Fill remaining slots with distributed topics
+        return selected, used
+
+    def _select_scheduled_topics(
+        self,
+        selected: List[Dict[str, Any]],
+        used: int,
+        used_topics: Set[str],
+        target_difficulty: int,
+        num_problems: int,
+        topic_need: Optional[Dict[str, float]],
+    ) -> int:
+        """
+        Fill contest slots with topics from the weighted scheduler.
+
+        Appends to `selected` and returns the updated `used` bitset.
+        """
+        if self._weighted_scheduler is None:
+            self._weighted_scheduler = WeightedTopicScheduler(self._catalog)
+
+        topics = self._weighted_scheduler.schedule(
+            count=num_problems - len(selected),
+            target_difficulty=target_difficulty,
+            tolerance=self.DIFFICULTY_TOLERANCE,
+            excluded=used,
+            skip_topics=used_topics,
+            need=topic_need,
+        )
+        for topic in topics:
+            number = self._select_problem_for_topic(
+                topic=topic,
+                difficulty=target_difficulty,
+                tolerance=self.DIFFICULTY_TOLERANCE,
+                excluded=used,
+            )
+            if number is not None:
+                selected.append({
+                    "problem": self._problem_at(number),
+                    "topic": topic,
+                    "is_weak_topic_problem": False,
+                    "target_difficulty": target_difficulty,
+                })
+                used |= self.problem_bits(number)
+                used_topics.add(topic)
+
+        return used
+
+    def _select_shuffled_topics(
+        self,
+        selected: List[Dict[str, Any]],
+        used: int,
+        used_topics: Set[str],
+        target_difficulty: int,
+        num_problems: int,
+    ) -> int:
+        """
+        Fill contest slots by cycling through shuffled topics (TOPIC_SCHEDULER=shuffle).
+
+        Appends to `selected` and returns the updated `used` bitset.
+        """
         remaining = num_problems - len(selected)
 
         # Get topics to distribute (excluding already used weak topics)
-        available_topics = [t for t in self._problems_by_topic.keys() if t not in used_topics]
+        available_topics = [t for t in self._catalog.topics if t not in used_topics]
         random.shuffle(available_topics)
 
         # Select problems from different topics
@@ -206,72 +472,80 @@ class ProblemService:
                 topic_index = 0
                 # If we've cycled through all topics, allow repeats
                 if attempts > len(available_topics):
-                    available_topics = list(self._problems_by_topic.keys())
+                    available_topics = list(self._catalog.topics)
                     random.shuffle(available_topics)
 
             topic = available_topics[topic_index]
             topic_index += 1
 
-            problem = self._select_problem_for_topic(
+            number = self._select_problem_for_topic(
                 topic=topic,
                 difficulty=target_difficulty,
                 tolerance=self.DIFFICULTY_TOLERANCE,
-                excluded=used_problem_ids,
+                excluded=used,
             )
 
-            if problem:
+            if number is not None:
                 selected.append({
-                    "problem": problem,
+                    "problem": self._problem_at(number),
                     "topic": topic,
                     "is_weak_topic_problem": False,
                     "target_difficulty": target_difficulty,
                 })
-                used_problem_ids.add(problem.id)
+                used |= self.problem_bits(number)
                 used_topics.add(topic)
 
-        # If still not enough, relax constraints
-        if len(selected) < num_problems:
-            remaining_needed = num_problems - len(selected)
-            fallback = self._select_fallback_problems(
-                difficulty=target_difficulty,
-                count=remaining_needed,
-                excluded=used_problem_ids,
-            )
-            for problem in fallback:
-                selected.append({
-                    "problem": problem,
-                    "topic": self._get_topic(problem),
-                    "is_weak_topic_problem": False,
-                    "target_difficulty": target_difficulty,
-                })
-
-        return selected
+        return used
 
     def _select_problem_for_topic(
         self,
         topic: str,
         difficulty: int,
         tolerance: int,
-        excluded: Set[str],
-    ) -> Optional[Problem]:
-        """Select a single problem for a specific topic and difficulty."""
-        if topic not in self._problems_by_topic:
+        excluded: int,
+    ) -> Optional[int]:
+        """
+        Select a single problem for a specific topic and difficulty.
+
+        The topic's problems within the difficulty window are a contiguous
+        range of catalog numbers, so the free ones come from one mask of the
+        `excluded` bitset.
+
+        Returns:
+            Catalog number of the problem, or None
+        """
+        topic_number = self._catalog.topic_number(topic)
+        if topic_number is None:
             return None
 
-        candidates = [
-            p for p in self._problems_by_topic[topic]
-            if p.id not in excluded
-            and abs(p.difficulty - difficulty) <= tolerance
-        ]
+        window = self._catalog.topic_window(topic_number, difficulty - tolerance, difficulty + tolerance)
+        number = self._random_free(window, excluded)
 
-        if not candidates:
+        if number is None:
             # Try with more tolerance
-            candidates = [
-                p for p in self._problems_by_topic[topic]
-                if p.id not in excluded
-                and abs(p.difficulty - difficulty) <= tolerance * 2
-            ]
+            window = self._catalog.topic_window(topic_number, difficulty - tolerance * 2, difficulty + tolerance * 2)
+            number = self._random_free(window, excluded)
+
+        return number
+
+    def _random_free(self, window: range, excluded: int) -> Optional[int]:
+        """
+        Uniformly random catalog number of a window that is not in `excluded`.
 
+        Windows are mostly free, so a few random probes usually find one
+        without listing the whole window (large topics have thousands).
+
+        Returns:
+            Catalog number, or None if the whole window is excluded
+        """
+        if not window:
+            return None
+        for _ in range(self.FREE_PROBES):
+            number = random.choice(window)
+            if not excluded >> number & 1:
+                return number
+
+        candidates = self._catalog.free_in_range(window.start, window.stop, excluded)
         if candidates:
             return random.choice(candidates)
         return None
@@ -280,14 +554,14 @@ class ProblemService:
         self,
         difficulty: int,
         count: int,
-        excluded: Set[str],
-    ) -> List[Problem]:
-        """Select problems without topic constraint (fallback)."""
-        candidates = [
-            p for p in self._problems
-            if p.id not in excluded
-            and abs(p.difficulty - difficulty) <= self.DIFFICULTY_TOLERANCE * 3
-        ]
+        excluded: int,
+    ) -> List[int]:
+        """Select problems without topic constraint (fallback). Returns catalog numbers."""
+        tolerance = self.DIFFICULTY_TOLERANCE * 3
+        candidates = self._catalog.free_numbers(
+            self._catalog.difficulty_window(difficulty - tolerance, difficulty + tolerance),
+            excluded,
+        )
 
         if len(candidates) <= count:
             return candidates
@@ -304,18 +578,16 @@ class ProblemService:
         """Get problems for a specific topic within difficulty range."""
         self.load_problems()
 
-        if topic not in self._problems_by_topic:
+        topic_number = self._catalog.topic_number(topic)
+        if topic_number is None:
             return []
 
-        candidates = [
-            p for p in self._problems_by_topic[topic]
-            if min_difficulty <= p.difficulty <= max_difficulty
-        ]
+        candidates = list(self._catalog.topic_window(topic_number, min_difficulty, max_difficulty))
 
-        if len(candidates) <= limit:
-            return candidates
+        if len(candidates) > limit:
+            candidates = random.sample(candidates, limit)
 
-        return random.sample(candidates, limit)
+        return [self._problem_at(number) for number in candidates]
 
 
 # Singleton instance
@@ -11,6 +11,7 @@ from ..models import (
     User, UserTopicRating, WeakTopic, Contest, ContestProblem,
     ContestStatus, SubmissionStatus
 )
+from .invalidation_bus import USER_CHANGED, get_invalidation_bus
 
 
 class RatingService:
@@ -106,6 +107,7 @@ class RatingService:
         contest.problems_solved = len(solved_problems)
 
         db.commit()
+        get_invalidation_bus().publish(USER_CHANGED, user.id)
 
         return result
 
@@ -261,6 +263,7 @@ class RatingService:
             topic_rating.problems_solved += 1
 
         db.commit()
+        get_invalidation_bus().publish(USER_CHANGED, user_id)
         return topic_rating
 
 
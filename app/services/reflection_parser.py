@@ -0,0 +1,422 @@
+"""
+Incremental, error-tolerant JSON parser for AI reflection responses.
+
+Model output is "almost JSON" more often than not. This parser reads it in a
+single pass and can be fed one chunk at a time while a response streams in.
+It tolerates:
+
+- markdown code fences and any prose before or after the JSON value
+- raw control characters (newlines, tabs) inside strings
+- unescaped quotes inside strings, when the quote is clearly not a terminator
+- trailing or doubled commas, and missing commas between lines or strings
+- bare words (true/false/null, numbers, unquoted text)
+- truncated output: open strings, objects and arrays are closed as they are
+
+Use partial() to look at the fields decoded so far while streaming, and
+finish() once the response is complete.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+# Characters that end a bare word (number, literal or unquoted text)
+_BARE_WORD_END = re.compile(r"[\s,:\]\}]")
+
+# Characters that need attention inside a string
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+# Characters that can follow a closing quote
+_AFTER_STRING = set(",:}]")
+
+_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+
+# Parser states
+_BEFORE_VALUE = "before_value"  # looking for the start of the top-level value
+_IN_CONTAINER = "in_container"  # between tokens inside an object or array
+_IN_STRING = "in_string"
+_IN_BARE_WORD = "in_bare_word"
+_DONE = "done"
+
+
+class _Frame:
+    """An open object or array."""
+
+    __slots__ = ("value", "key", "expect")
+
+    def __init__(self, value):
+        self.value = value
+        # For objects: the key waiting for its value
+        self.key: Optional[str] = None
+        # What comes next: "key", "colon", "value" or "comma" ("pending" while
+        # an array element is a string that is still being read)
+        self.expect = "key" if isinstance(value, dict) else "value"
+
+
+class IncrementalJSONParser:
+    """
+    Streaming JSON parser that repairs common model output mistakes.
+
+    Feed text with feed(), read the value decoded so far with partial(), and
+    call finish() at the end to close anything still open.
+    """
+
+    def __init__(self):
+        self._state = _BEFORE_VALUE
+        self._stack: List[_Frame] = []
+        self._root: Any = None
+        self._has_root = False
+
+        # String in progress
+        self._chars: List[str] = []
+        self._is_key = False
+        self._escape: Optional[str] = None  # None, "\\" or a partial "\\uXXXX"
+        self._quote_pending = False  # a quote was seen; is it the end?
+        self._pending_space = ""  # whitespace read after a pending quote
+
+        # Bare word in progress
+        self._word: List[str] = []
+
+        self._closed_ids = set()
+        self.truncated = False
+
+    # ------------------------------------------------------------------ #
+    # Public API
+    # ------------------------------------------------------------------ #
+
+    def feed(self, chunk: str) -> None:
+        """Consume the next chunk of the response."""
+        position = 0
+        length = len(chunk)
+
+        while position < length and self._state != _DONE:
+            if self._state == _IN_STRING:
+                position = self._read_string(chunk, position)
+            elif self._state == _IN_BARE_WORD:
+                position = self._read_bare_word(chunk, position)
+            elif self._state == _BEFORE_VALUE:
+                position = self._skip_to_value(chunk, position)
+            else:
+                position = self._read_structure(chunk, position)
+
+    def partial(self) -> Any:
+        """
+        Return the value decoded so far.
+
+        A string that is still being read is included with its current
+        contents. The returned structure is live and keeps changing as more
+        text is fed, so copy it if you need a snapshot.
+        """
+        if self._state == _IN_STRING and not self._is_key:
+            self._store(self._decode_chars(), provisional=True)
+        return self._root
+
+    def finish(self) -> Any:
+        """
+        Close anything still open and return the decoded value.
+
+        Raises:
+            ValueError: If the input contained no JSON object or array
+        """
+        if self._state == _IN_STRING:
+            if not self._quote_pending:
+                self.truncated = True
+            self._end_string()
+        elif self._state == _IN_BARE_WORD:
+            self._end_bare_word()
+
+        if self._stack:
+            self.truncated = True
+            self._stack.clear()
+
+        self._state = _DONE
+
+        if not self._has_root:
+            raise ValueError("No JSON object or array found in response")
+        return self._root
+
+    def is_complete(self, value: Any) -> bool:
+        """Check whether an object or array was closed by its own bracket (not truncated)."""
+        return id(value) in self._closed_ids
+
+    # ------------------------------------------------------------------ #
+    # Structure
+    # ------------------------------------------------------------------ #
+
+    def _skip_to_value(self, chunk: str, position: int) -> int:
+        """Skip prose and code fences up to the first object or array."""
+        starts = [i for i in (chunk.find("{", position), chunk.find("[", position)) if i >= 0]
+        if not starts:
+            return len(chunk)
+
+        start = min(starts)
+        self._open(chunk[start])
+        return start + 1
+
+    def _read_structure(self, chunk: str, position: int) -> int:
+        """Read one structural character inside an object or array."""
+        char = chunk[position]
+        frame = self._stack[-1]
+
+        if char in " \t\r\n":
+            return position + 1
+
+        if char in "}]":
+            self._close()
+            return position + 1
+
+        if char == ",":
+            # Repeated commas are ignored, so are commas in unexpected places
+            frame.expect = "key" if isinstance(frame.value, dict) else "value"
+            return position + 1
+
+        if char == ":":
+            if frame.expect == "colon":
+                frame.expect = "value"
+            return position + 1
+
+        if isinstance(frame.value, dict) and frame.expect in ("key", "comma"):
+            # A key (also after a missing comma)
+            if char == '"':
+                self._start_string(is_key=True)
+                return position + 1
+            self._start_bare_word(is_key=True)
+            return position
+
+        if isinstance(frame.value, dict) and frame.expect == "colon":
+            # Missing colon: treat whatever follows as the value
+            frame.expect = "value"
+
+        # A value (also after a missing comma in an array)
+        if char == '"':
+            self._start_string(is_key=False)
+            return position + 1
+        if char in "{[":
+            self._open(char)
+            return position + 1
+
+        self._start_bare_word(is_key=False)
+        return position
+
+    def _open(self, char: str) -> None:
+        """Open an object or array."""
+        container = {} if char == "{" else []
+        self._store(container)
+        self._stack.append(_Frame(container))
+        self._state = _IN_CONTAINER
+
+    def _close(self) -> None:
+        """Close the innermost open container."""
+        frame = self._stack.pop()
+        self._closed_ids.add(id(frame.value))
+        self._state = _IN_CONTAINER if self._stack else _DONE
+
+    def _store(self, value: Any, provisional: bool = False) -> None:
+        """
+        Attach a value to the current container (or make it the root).
+
+        Provisional values (strings still being read) are written in place so
+        a later store for the same slot overwrites them.
+        """
+        if not self._stack:
+            if not self._has_root or provisional:
+                self._root = value
+                self._has_root = True
+            return
+
+        frame = self._stack[-1]
+        if isinstance(frame.value, dict):
+            key = frame.key if frame.key is not None else ""
+            frame.value[key] = value
+            if not provisional:
+                frame.key = None
+                frame.expect = "comma"
+        else:
+            if frame.expect == "pending":
+                frame.value[-1] = value
+            else:
+                frame.value.append(value)
+            frame.expect = "pending" if provisional else "comma"
+
+    def _store_key(self, key: str) -> None:
+        """Record an object key."""
+        frame = self._stack[-1]
+        frame.key = key
+        frame.expect = "colon"
+
+    # ------------------------------------------------------------------ #
+    # Strings
+    # ------------------------------------------------------------------ #
+
+    def _start_string(self, is_key: bool) -> None:
+        self._state = _IN_STRING
+        self._is_key = is_key
+        self._chars = []
+        self._escape = None
+        self._quote_pending = False
+        self._pending_space = ""
+
+    def _read_string(self, chunk: str, position: int) -> int:
+        """Read string content up to the next quote or backslash."""
+        if self._quote_pending:
+            return self._resolve_quote(chunk, position)
+
+        if self._escape is not None:
+            return self._read_escape(chunk, position)
+
+        match = _STRING_SPECIAL.search(chunk, position)
+        if match is None:
+            self._chars.append(chunk[position:])
+            return len(chunk)
+
+        index = match.start()
+        if index > position:
+            self._chars.append(chunk[position:index])
+
+        if chunk[index] == "\\":
+            self._escape = "\\"
+        else:
+            self._quote_pending = True
+        return index + 1
+
+    def _resolve_quote(self, chunk: str, position: int) -> int:
+        """
+        Decide whether a quote ended the string.
+
+        A quote followed by , : } ] (after optional whitespace) ends the
+        string. So does a quote followed by whitespace and another quote,
+        which is a missing comma between two members or array elements
+        ("a" "b"). Anything else (including "") means the quote was part of
+        the text.
+        """
+        length = len(chunk)
+        while position < length and chunk[position] in " \t\r\n":
+            self._pending_space += chunk[position]
+            position += 1
+        if position >= length:
+            return position
+
+        char = chunk[position]
+        ends_string = char in _AFTER_STRING or (char == '"' and bool(self._pending_space))
+
+        if ends_string:
+            self._quote_pending = False
+            self._pending_space = ""
+            self._end_string()
+            return position
+
+        # The quote was literal text
+        self._chars.append('"' + self._pending_space)
+        self._quote_pending = False
+        self._pending_space = ""
+        return position
+
+    def _read_escape(self, chunk: str, position: int) -> int:
+        """Read (part of) an escape sequence."""
+        if self._escape == "\\":
+            char = chunk[position]
+            if char == "u":
+                self._escape = "\\u"
+                return position + 1
+            # Unknown escapes keep their backslash
+            self._chars.append(_ESCAPES.get(char, "\\" + char))
+            self._escape = None
+            return position + 1
+
+        needed = 6 - len(self._escape)
+        self._escape += chunk[position:position + needed]
+        position += min(needed, len(chunk) - position)
+
+        if len(self._escape) == 6:
+            digits = self._escape[2:]
+            try:
+                self._chars.append(chr(int(digits, 16)))
+            except ValueError:
+                self._chars.append(self._escape)
+            self._escape = None
+        return position
+
+    def _decode_chars(self) -> str:
+        """Join the string read so far, combining any surrogate pairs."""
+        # An escape sequence that is still incomplete is left out
+        text = "".join(self._chars)
+        if any("\ud800" <= c <= "\udfff" for c in text):
+            text = text.encode("utf-16", "surrogatepass").decode("utf-16", "replace")
+        return text
+
+    def _end_string(self) -> None:
+        """Finish the current string and attach it."""
+        text = self._decode_chars()
+        self._chars = []
+        self._escape = None
+        self._state = _IN_CONTAINER
+
+        if self._is_key:
+            self._store_key(text)
+        else:
+            self._store(text)
+
+    # ------------------------------------------------------------------ #
+    # Bare words
+    # ------------------------------------------------------------------ #
+
+    def _start_bare_word(self, is_key: bool) -> None:
+        self._state = _IN_BARE_WORD
+        self._is_key = is_key
+        self._word = []
+
+    def _read_bare_word(self, chunk: str, position: int) -> int:
+        match = _BARE_WORD_END.search(chunk, position)
+        if match is None:
+            self._word.append(chunk[position:])
+            return len(chunk)
+
+        self._word.append(chunk[position:match.start()])
+        self._end_bare_word()
+        return match.start()
+
+    def _end_bare_word(self) -> None:
+        word = "".join(self._word).strip()
+        self._word = []
+        self._state = _IN_CONTAINER
+
+        if self._is_key:
+            self._store_key(word.strip("'"))
+            return
+
+        try:
+            value = json.loads(word)
+        except ValueError:
+            value = word.strip("'")
+        self._store(value)
+
+
+def parse_tolerant(text: str) -> Any:
+    """Parse a complete response with IncrementalJSONParser."""
+    parser = IncrementalJSONParser()
+    parser.feed(text)
+    return parser.finish()
+
+
+class ReflectionParser(IncrementalJSONParser):
+    """Incremental parser that exposes the reflection fields as they arrive."""
+
+    FIELDS = ["pivot_sentence", "tips", "what_to_improve", "master_approach"]
+
+    def fields(self) -> Dict[str, Any]:
+        """Return the reflection fields decoded so far (possibly partial)."""
+        value = self.partial()
+        if isinstance(value, list):
+            value = next((item for item in value if isinstance(item, dict)), None)
+        if not isinstance(value, dict):
+            return {}
+        return {key: value[key] for key in self.FIELDS if key in value}
@@ -0,0 +1,255 @@
+"""
+Vectorized contest problem selection (optional, needs NumPy).
+
+The default ("python") engine in ProblemService picks a contest one topic at
+a time. This engine views the packed catalog's difficulty and topic arrays
+as NumPy arrays and draws many topics per array operation:
+
+1. Windows for all topics at once: the catalog is sorted by (topic,
+   difficulty), so one searchsorted over that combined key finds every
+   topic's difficulty window.
+2. Eligibility for a batch of topics at once: the window members are
+   gathered into one array and tested against the exclusion bitset. Topics
+   with nothing left in the window get twice the tolerance instead.
+3. One weighted draw per topic: the candidates' weights (which favor
+   difficulties close to the target) are summed cumulatively, and one
+   searchsorted of a random point in each topic's span picks its problem.
+
+A contest takes weak topics first (at their own window), then random
+distinct topics, then a weighted draw over all topics if it is still short.
+
+Select it with PROBLEM_SELECTION_ENGINE=numpy. Without NumPy installed the
+service falls back to the Python engine.
+"""
+
+import random
+from typing import List, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency, see numpy_available()
+    np = None
+
+from .shared_catalog import CatalogIndex
+
+# Names accepted by PROBLEM_SELECTION_ENGINE
+ENGINES = ("python", "numpy")
+
+# Passes over the topics before falling back to any topic (the Python engine
+# cycles through the topics until it has made 10 attempts per slot)
+MAX_ROUNDS = 10
+
+# Topics drawn per batch, as a multiple of the problems still needed (spare
+# topics cover those whose window turns out to be fully excluded)
+BATCH_FACTOR = 2
+
+# (catalog number, topic, is_weak_topic_problem, target_difficulty)
+Pick = Tuple[int, str, bool, int]
+
+
+def numpy_available() -> bool:
+    """Whether NumPy is installed (needed by the numpy engine)."""
+    return np is not None
+
+
+class NumpySelectionEngine:
+    """Selects contest problems from a packed catalog with NumPy."""
+
+    def __init__(self, catalog: CatalogIndex):
+        """
+        Args:
+            catalog: Loaded catalog index (difficulty and topic are viewed,
+                not copied; the combined sort key takes 8 bytes per problem)
+        """
+        if np is None:
+            raise RuntimeError(
+                "The numpy selection engine requires the 'numpy' package "
+                "(pip install numpy)"
+            )
+        self.catalog = catalog
+        self.count = len(catalog)
+        self.difficulty = np.frombuffer(catalog.difficulty, dtype=np.int32)
+        self.topic = np.frombuffer(catalog.topic, dtype=np.int32)
+        self.topic_numbers = np.arange(len(catalog.topics))
+        self._sort_key = self._window_key(self.topic, self.difficulty)
+
+    @staticmethod
+    def _window_key(topic, difficulty) -> "np.ndarray":
+        """(topic, difficulty) as one int64, ordered like the catalog."""
+        return (np.asarray(topic, dtype=np.int64) << 32) + (np.asarray(difficulty, dtype=np.int64) + (1 << 31))
+
+    def select(
+        self,
+        target_difficulty: int,
+        num_problems: int,
+        weak_topics: List[str],
+        excluded: int,
+        tolerance: int,
+        weak_difficulty: int,
+        weak_tolerance: int,
+    ) -> List[Pick]:
+        """
+        Draw the problems of one contest.
+
+        Args:
+            target_difficulty: Target difficulty of regular problems
+            num_problems: Number of problems to select
+            weak_topics: Weak topics to include (one problem each, in order)
+            excluded: Problems to exclude, as a bitset over catalog numbers
+            tolerance: Difficulty tolerance of regular problems
+            weak_difficulty: Target difficulty of weak topic problems
+            weak_tolerance: Difficulty tolerance of weak topic problems
+
+        Returns:
+            Picks in contest order (weak topics, distributed topics, fallback)
+        """
+        if self.count == 0:
+            return []
+
+        # Seeded from `random`, so random.seed() makes both engines repeatable
+        rng = np.random.default_rng(random.getrandbits(64))
+        # Writable copy of the bitset; picked problems are added to it
+        used = np.frombuffer(bytearray(excluded.to_bytes((self.count + 7) // 8, "little")), dtype=np.uint8)
+        picks: List[Pick] = []
+
+        # Weak topics: one draw each, at their own window
+        weak = [(topic, self.catalog.topic_number(topic)) for topic in weak_topics]
+        weak = [(topic, number) for topic, number in weak if number is not None]
+        used_topics = np.array([number for _, number in weak], dtype=np.int64)
+        if weak:
+            best = self._draw(used_topics, weak_difficulty, weak_tolerance, used, rng)
+            for (topic, _), number in zip(weak, best):
+                if number >= 0 and self._take(number, used):
+                    picks.append((int(number), topic, True, weak_difficulty))
+
+        # Distributed topics: each pass tries every topic once, in random
+        # order and in batches; the first pass skips the weak topics
+        for round_number in range(MAX_ROUNDS):
+            if len(picks) >= num_problems:
+                break
+            topics = self.topic_numbers
+            if round_number == 0 and used_topics.size:
+                topics = np.setdiff1d(topics, used_topics)
+            topics = rng.permutation(topics)
+
+            found = False
+            position = 0
+            while len(picks) < num_problems and position < topics.size:
+                batch = topics[position:position + (num_problems - len(picks)) * BATCH_FACTOR]
+                position += batch.size
+                best = self._draw(batch, target_difficulty, tolerance, used, rng)
+                for topic_number, number in zip(batch, best):
+                    if len(picks) >= num_problems:
+                        break
+                    if number >= 0 and self._take(number, used):
+                        picks.append((int(number), self.catalog.topics[topic_number], False, target_difficulty))
+                        found = True
+            if not found:
+                break
+
+        # Fallback: any topic, within three times the tolerance
+        if len(picks) < num_problems:
+            picks.extend(
+                (number, self.catalog.topics[self.topic[number]], False, target_difficulty)
+                for number in self._draw_any(
+                    num_problems - len(picks), target_difficulty, tolerance * 3, used, rng,
+                )
+            )
+
+        return picks
+
+    def _draw(
+        self,
+        topics: "np.ndarray",
+        target: int,
+        tolerance: int,
+        used: "np.ndarray",
+        rng: "np.random.Generator",
+    ) -> "np.ndarray":
+        """
+        One weighted random problem per topic.
+
+        Candidates are unused problems within `tolerance` of `target`, or
+        within twice the tolerance for topics that have none.
+
+        Returns:
+            Problem number per topic (-1 where a topic has no candidate)
+        """
+        # Windows of all the topics (twice the tolerance), gathered into one array
+        low = np.searchsorted(self._sort_key, self._window_key(topics, target - tolerance * 2), "left")
+        high = np.searchsorted(self._sort_key, self._window_key(topics, target + tolerance * 2), "right")
+        sizes = high - low
+        owner = np.repeat(np.arange(topics.size), sizes)
+        numbers = np.arange(owner.size) + np.repeat(low - (np.cumsum(sizes) - sizes), sizes)
+
+        free = ~self._is_set(used, numbers)
+        distance = np.abs(self.difficulty[numbers] - target)
+        near = free & (distance <= tolerance)
+        has_near = np.bincount(owner[near], minlength=topics.size) > 0
+        eligible = near | (free & ~has_near[owner])
+        numbers, owner, distance = numbers[eligible], owner[eligible], distance[eligible]
+
+        best = np.full(topics.size, -1, dtype=np.int64)
+        if numbers.size == 0:
+            return best
+
+        # Inverse CDF per topic: the candidates stay grouped by topic, so one
+        # random point in each topic's span of the cumulative weights picks it
+        cumulative = np.cumsum(self._weights(tolerance, tolerance * 2)[distance])
+        counts = np.bincount(owner, minlength=topics.size)
+        present = counts > 0
+        ends = np.cumsum(counts)[present]
+        starts = ends - counts[present]
+        before = np.where(starts > 0, cumulative[starts - 1], 0.0)
+        points = before + rng.random(starts.size) * (cumulative[ends - 1] - before)
+        chosen = np.searchsorted(cumulative, points, "right")
+        best[present] = numbers[np.clip(chosen, starts, ends - 1)]
+        return best
+
+    def _draw_any(
+        self,
+        count: int,
+        target: int,
+        tolerance: int,
+        used: "np.ndarray",
+        rng: "np.random.Generator",
+    ) -> List[int]:
+        """Up to `count` weighted random unused problems of any topic within `tolerance`."""
+        numbers = np.frombuffer(self.catalog.difficulty_window(target - tolerance, target + tolerance), dtype=np.int32)
+        numbers = numbers[~self._is_set(used, numbers)]
+        if numbers.size == 0:
+            return []
+
+        weights = self._weights(tolerance, tolerance)[np.abs(self.difficulty[numbers] - target)]
+        drawn = rng.choice(numbers.size, size=min(count, numbers.size), replace=False, p=weights / weights.sum())
+        return [int(number) for number in numbers[drawn] if self._take(number, used)]
+
+    @staticmethod
+    def _weights(tolerance: int, max_distance: int) -> "np.ndarray":
+        """
+        Sampling weight by distance from the target difficulty (0..max_distance).
+
+        Falls off as a Gaussian with scale `tolerance`, so closer problems
+        are favored but every candidate can be drawn.
+        """
+        scaled = np.arange(max_distance + 1) / max(tolerance, 1)
+        return np.exp(-0.5 * scaled * scaled)
+
+    @staticmethod
+    def _is_set(bits: "np.ndarray", numbers: "np.ndarray") -> "np.ndarray":
+        """Whether each problem's bit is set in a bitset (as little-endian bytes)."""
+        return (bits[numbers >> 3] >> (numbers & 7) & 1).astype(bool)
+
+    def _take(self, number: int, used: "np.ndarray") -> bool:
+        """
+        Mark a problem as picked, with any other catalog entry of the same ID.
+
+        Returns:
+            False if it was already taken (as a copy of an earlier pick)
+        """
+        number = int(number)
+        if used[number >> 3] >> (number & 7) & 1:
+            return False
+        for other in self.catalog.numbers_of(self.catalog.problem_id(number)):
+            used[other >> 3] |= 1 << (other & 7)
+        return True
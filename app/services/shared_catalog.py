@@ -0,0 +1,323 @@
+"""
+Compact, shareable problem catalog index.
+
+The catalog is packed into one flat buffer of numeric arrays and a string
+pool, instead of one Python object per problem:
+
+    difficulty[i]      int32, difficulty of problem i
+    topic[i]           int32, topic number of problem i
+    topic_start[t]     int32, problems of topic t are i in [topic_start[t], topic_start[t + 1])
+    by_difficulty[k]   int32, problem numbers sorted by difficulty
+    by_id[k]           int32, problem numbers sorted by ID
+    string_offsets     uint32, start of each string field in the pool
+    pool               UTF-8 bytes: id, name, url, source and a marshal blob
+                       (pattern_id, skills, tags, extra) per problem
+
+Problems are numbered densely (0..n-1) in (topic, difficulty) order, so each
+topic is a contiguous range sorted by difficulty and a difficulty window is
+two binary searches. Sets of problems (e.g. a user's recent attempts) are
+bitsets over these numbers: Python ints with bit i set for problem i. Only
+the problems a request actually returns are decoded into Python objects.
+
+The buffer can live in private memory or in a multiprocessing shared memory
+segment. With several workers, one process builds the segment
+(create_shared_catalog) and every worker maps it read-only
+(attach_shared_catalog), so extra workers add almost no catalog memory.
+The blobs use marshal, which is fast but specific to the Python version:
+build and read the buffer with the same interpreter (as all workers are).
+"""
+
+import json
+import marshal
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, chain
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+MAGIC = b"MCPCAT\x00\x01"
+
+# Header: magic, then the length of the JSON section table that follows
+_HEADER = struct.Struct("<8sQ")
+
+# Sections are aligned so the numeric views never straddle a word boundary
+_ALIGNMENT = 8
+
+# String fields stored per problem, in pool order
+STRING_FIELDS = ("id", "name", "url", "source")
+
+# Fields stored together as one marshal blob per problem
+DETAIL_FIELDS = ("pattern_id", "primary_skills", "secondary_skills", "tags", "extra")
+
+_FIELDS_PER_PROBLEM = len(STRING_FIELDS) + 1
+
+# Set bit positions of every byte value (for set_bits)
+_BYTE_BITS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+
+def build_catalog(problems: Iterable[Dict[str, Any]]) -> bytearray:
+    """
+    Pack problems into a catalog buffer.
+
+    Args:
+        problems: Dicts with "topic", "difficulty", the STRING_FIELDS and the
+            DETAIL_FIELDS of each problem
+
+    Returns:
+        The packed catalog, readable with CatalogIndex
+    """
+    # Encode each problem's strings up front, so only compact tuples are
+    # kept and sorted. Stable sort: equal (topic, difficulty) keep file order.
+    entries = []
+    for p in problems:
+        fields = [(p[field] or "").encode("utf-8") for field in STRING_FIELDS]
+        fields.append(marshal.dumps(tuple(p[field] for field in DETAIL_FIELDS)))
+        entries.append((p["topic"], p["difficulty"], p["id"], fields))
+    entries.sort(key=lambda entry: (entry[0], entry[1]))
+
+    count = len(entries)
+    topics = sorted({entry[0] for entry in entries})
+    topic_numbers = {topic: number for number, topic in enumerate(topics)}
+
+    difficulty = array("i", [entry[1] for entry in entries])
+    topic = array("i", [topic_numbers[entry[0]] for entry in entries])
+    topic_start = array("i", [0] * (len(topics) + 1))
+    for number in topic:
+        topic_start[number + 1] += 1
+    ids = [entry[2] for entry in entries]
+
+    chunks = list(chain.from_iterable(entry[3] for entry in entries))
+    string_offsets = array("Q", [0])
+    string_offsets.extend(accumulate(map(len, chunks)))
+    pool = b"".join(chunks)
+    del chunks, entries
+
+    if len(pool) > 0xFFFFFFFF:
+        raise ValueError("Catalog string pool exceeds 4 GB")
+    string_offsets = array("I", string_offsets)
+
+    for number in range(len(topics)):
+        topic_start[number + 1] += topic_start[number]
+
+    by_difficulty = array("i", sorted(range(count), key=difficulty.__getitem__))
+    by_id = array("i", sorted(range(count), key=ids.__getitem__))
+
+    sections = [
+        ("difficulty", difficulty),
+        ("topic", topic),
+        ("topic_start", topic_start),
+        ("by_difficulty", by_difficulty),
+        ("by_id", by_id),
+        ("string_offsets", string_offsets),
+        ("pool", pool),
+    ]
+
+    # Lay the sections out after the header and section table
+    table: Dict[str, Any] = {"count": count, "topics": topics, "sections": {}}
+    offset = 0
+    for name, data in sections:
+        nbytes = len(data) * (data.itemsize if isinstance(data, array) else 1)
+        typecode = data.typecode if isinstance(data, array) else "B"
+        table["sections"][name] = [offset, nbytes, typecode]
+        offset = _align(offset + nbytes)
+
+    table_bytes = json.dumps(table).encode("utf-8")
+    data_start = _align(_HEADER.size + len(table_bytes))
+
+    buffer = bytearray(data_start + offset)
+    _HEADER.pack_into(buffer, 0, MAGIC, len(table_bytes))
+    buffer[_HEADER.size:_HEADER.size + len(table_bytes)] = table_bytes
+    for name, data in sections:
+        start, nbytes, _ = table["sections"][name]
+        buffer[data_start + start:data_start + start + nbytes] = bytes(data)
+    return buffer
+
+
+def set_bits(mask: int, offset: int = 0) -> List[int]:
+    """Positions of the set bits of `mask` (plus offset), in increasing order."""
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+    return [
+        offset + (i << 3) + bit
+        for i, byte in enumerate(data) if byte
+        for bit in _BYTE_BITS[byte]
+    ]
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+class CatalogIndex:
+    """Read-only view over a packed catalog buffer."""
+
+    def __init__(self, buffer, shm: Optional[SharedMemory] = None):
+        """
+        Args:
+            buffer: Packed catalog (bytes, bytearray or memoryview)
+            shm: Shared memory segment backing the buffer, closed by close()
+        """
+        self._shm = shm
+        self._view = memoryview(buffer).toreadonly()
+
+        magic, table_length = _HEADER.unpack_from(self._view, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a packed problem catalog")
+        table = json.loads(bytes(self._view[_HEADER.size:_HEADER.size + table_length]))
+        data_start = _align(_HEADER.size + table_length)
+
+        self._sections: Dict[str, memoryview] = {}
+        for name, (offset, nbytes, typecode) in table["sections"].items():
+            section = self._view[data_start + offset:data_start + offset + nbytes]
+            self._sections[name] = section if typecode == "B" else section.cast(typecode)
+
+        self.count: int = table["count"]
+        self.topics: List[str] = table["topics"]
+        self._topic_numbers = {topic: number for number, topic in enumerate(self.topics)}
+
+        self.difficulty: Sequence[int] = self._sections["difficulty"]
+        self.topic: Sequence[int] = self._sections["topic"]
+        self._topic_start = self._sections["topic_start"]
+        self._by_difficulty = self._sections["by_difficulty"]
+        self._by_id = self._sections["by_id"]
+        self._string_offsets = self._sections["string_offsets"]
+        self._pool = self._sections["pool"]
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the packed catalog."""
+        return self._view.nbytes
+
+    @property
+    def shared(self) -> bool:
+        """Whether the catalog is mapped from shared memory."""
+        return self._shm is not None
+
+    def topic_number(self, topic: str) -> Optional[int]:
+        """Number of a topic, or None if no problem has it."""
+        return self._topic_numbers.get(topic)
+
+    def topic_size(self, topic_number: int) -> int:
+        """Number of problems in a topic."""
+        return self._topic_start[topic_number + 1] - self._topic_start[topic_number]
+
+    def topic_window(self, topic_number: int, min_difficulty: int, max_difficulty: int) -> range:
+        """Problem numbers of a topic with min_difficulty <= difficulty <= max_difficulty."""
+        start = self._topic_start[topic_number]
+        end = self._topic_start[topic_number + 1]
+        return range(
+            bisect_left(self.difficulty, min_difficulty, start, end),
+            bisect_right(self.difficulty, max_difficulty, start, end),
+        )
+
+    def difficulty_window(self, min_difficulty: int, max_difficulty: int) -> Sequence[int]:
+        """Problem numbers (all topics) with min_difficulty <= difficulty <= max_difficulty."""
+        key = self.difficulty.__getitem__
+        return self._by_difficulty[
+            bisect_left(self._by_difficulty, min_difficulty, key=key):
+            bisect_right(self._by_difficulty, max_difficulty, key=key)
+        ]
+
+    def problem_id(self, number: int) -> str:
+        """ID of a problem."""
+        return self._string(number * _FIELDS_PER_PROBLEM)
+
+    def free_in_range(self, start: int, end: int, excluded: int) -> List[int]:
+        """Problem numbers in [start, end) whose bit is clear in the `excluded` bitset."""
+        if end <= start:
+            return []
+        return set_bits(~(excluded >> start) & ((1 << (end - start)) - 1), start)
+
+    def free_numbers(self, numbers: Iterable[int], excluded: int) -> List[int]:
+        """Problem numbers from `numbers` whose bit is clear in the `excluded` bitset."""
+        if not excluded:
+            return list(numbers)
+        bits = excluded.to_bytes((self.count + 7) // 8, "little")
+        return [number for number in numbers if not bits[number >> 3] >> (number & 7) & 1]
+
+    def bitset(self, numbers: Iterable[int]) -> int:
+        """Bitset (an int, bit i = problem i) of the given problem numbers."""
+        bits = bytearray((self.count + 7) // 8)
+        for number in numbers:
+            bits[number >> 3] |= 1 << (number & 7)
+        return int.from_bytes(bits, "little")
+
+    def index_of(self, problem_id: str) -> Optional[int]:
+        """
+        Number of the problem with this ID, or None.
+
+        If the catalog repeats an ID, the last occurrence wins (as when
+        loading it into a dict).
+        """
+        numbers = self.numbers_of(problem_id)
+        return numbers[-1] if numbers else None
+
+    def numbers_of(self, problem_id: str) -> Sequence[int]:
+        """Numbers of every problem with this ID (usually one)."""
+        return self._by_id[
+            bisect_left(self._by_id, problem_id, key=self.problem_id):
+            bisect_right(self._by_id, problem_id, key=self.problem_id)
+        ]
+
+    def record(self, number: int) -> Dict[str, Any]:
+        """All fields of a problem, decoded."""
+        first = number * _FIELDS_PER_PROBLEM
+        record: Dict[str, Any] = {
+            field: self._string(first + i) for i, field in enumerate(STRING_FIELDS)
+        }
+        start = self._string_offsets[first + len(STRING_FIELDS)]
+        end = self._string_offsets[first + _FIELDS_PER_PROBLEM]
+        record.update(zip(DETAIL_FIELDS, marshal.loads(self._pool[start:end])))
+        record["difficulty"] = self.difficulty[number]
+        record["topic"] = self.topics[self.topic[number]]
+        return record
+
+    def _string(self, field_index: int) -> str:
+        start = self._string_offsets[field_index]
+        end = self._string_offsets[field_index + 1]
+        return str(self._pool[start:end], "utf-8")
+
+    def close(self) -> None:
+        """Release the buffer (and unmap the shared memory segment, if any)."""
+        for section in self._sections.values():
+            section.release()
+        self._sections.clear()
+        self._view.release()
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+
+def create_shared_catalog(buffer, name: Optional[str] = None) -> SharedMemory:
+    """
+    Copy a packed catalog into a new shared memory segment.
+
+    The caller owns the segment: keep the returned object alive while
+    workers use it, then close() and unlink() it.
+    """
+    shm = SharedMemory(name=name, create=True, size=len(buffer))
+    shm.buf[:len(buffer)] = buffer
+    return shm
+
+
+def attach_shared_catalog(name: str) -> CatalogIndex:
+    """
+    Map an existing shared catalog segment read-only.
+
+    Raises:
+        FileNotFoundError: If no segment with this name exists
+    """
+    # Before Python 3.13, attaching registers the segment with this process's
+    # resource tracker, which unlinks it when the process exits - taking the
+    # catalog away from every other worker. Only the creator should own it.
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        shm = SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+    return CatalogIndex(shm.buf, shm=shm)
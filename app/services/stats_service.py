@@ -0,0 +1,211 @@
+"""
+System statistics service.
+
+Keeps user and contest totals in the system_counters table. Counters are
+updated in the same transaction as the change they count (user created,
+contest started/ended/abandoned), so they commit or roll back together
+with it. Reads go through a short in-process TTL cache.
+
+A background reconciliation job recounts the real tables after startup and
+periodically, correcting drift from rows written outside the services
+(migrations, benchmark seeding, manual SQL).
+"""
+
+import asyncio
+import os
+import time
+from threading import Lock
+from typing import Dict, Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from ..models import Contest, ContestStatus, SystemCounter, User
+from .invalidation_bus import STATS_CHANGED, get_invalidation_bus
+
+# Counter names
+USERS = "users"
+CONTESTS = "contests"
+CONTESTS_ACTIVE = "contests_active"
+CONTESTS_COMPLETED = "contests_completed"
+CONTESTS_ABANDONED = "contests_abandoned"
+
+COUNTER_NAMES = [USERS, CONTESTS, CONTESTS_ACTIVE, CONTESTS_COMPLETED, CONTESTS_ABANDONED]
+
+# Counter of each contest status
+STATUS_COUNTERS = {
+    ContestStatus.ACTIVE: CONTESTS_ACTIVE,
+    ContestStatus.COMPLETED: CONTESTS_COMPLETED,
+    ContestStatus.ABANDONED: CONTESTS_ABANDONED,
+}
+
+STATS_CACHE_TTL_SECONDS = float(os.getenv("STATS_CACHE_TTL_SECONDS", "5"))
+STATS_RECONCILE_SECONDS = float(os.getenv("STATS_RECONCILE_SECONDS", "900"))
+
+
+class StatsService:
+    """Service for system-wide counters."""
+
+    def __init__(self, ttl_seconds: float = STATS_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._cache: Optional[Dict[str, int]] = None
+        self._cached_at = 0.0
+        self._lock = Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def increment(self, db: Session, **deltas: int) -> None:
+        """
+        Add to counters within the caller's transaction (the caller commits).
+
+        Each counter is updated with a single atomic `value = value + delta`
+        statement. Counters are updated in name order so concurrent
+        transactions lock them in the same order.
+
+        Args:
+            db: Database session
+            **deltas: Counter name -> amount, e.g. contests=1, contests_active=1
+        """
+        for name in sorted(deltas):
+            delta = deltas[name]
+            if not delta:
+                continue
+            db.execute(
+                update(SystemCounter)
+                .where(SystemCounter.name == name)
+                .values(value=SystemCounter.value + delta, updated_at=func.now())
+                .execution_options(synchronize_session=False)
+            )
+
+    def contest_status_changed(
+        self, db: Session, old_status: ContestStatus, new_status: ContestStatus
+    ) -> None:
+        """Move a contest from one status counter to another."""
+        deltas = {STATUS_COUNTERS[old_status]: -1}
+        deltas[STATUS_COUNTERS[new_status]] = deltas.get(STATUS_COUNTERS[new_status], 0) + 1
+        self.increment(db, **deltas)
+
+    def get_stats(self, db: Session) -> Dict[str, int]:
+        """Return all counters (cached for ttl_seconds)."""
+        with self._lock:
+            if self._cache is not None and time.monotonic() - self._cached_at < self.ttl_seconds:
+                return dict(self._cache)
+
+        rows = db.query(SystemCounter.name, SystemCounter.value).all()
+        counters = {name: 0 for name in COUNTER_NAMES}
+        counters.update({row.name: row.value for row in rows})
+
+        with self._lock:
+            self._cache = counters
+            self._cached_at = time.monotonic()
+        return dict(counters)
+
+    def invalidate(self) -> None:
+        """Drop the cached counters."""
+        with self._lock:
+            self._cache = None
+
+    def reconcile(self, db: Session) -> Dict[str, int]:
+        """
+        Recount users and contests and correct the counters.
+
+        The counter rows are locked first (on PostgreSQL), so transactions
+        that change a counter wait until the recount is committed and their
+        increments are applied on top of it.
+
+        Returns:
+            Counters that were wrong: name -> (stored - actual)
+        """
+        self._ensure_counters(db)
+
+        stored = {
+            row.name: row
+            for row in db.query(SystemCounter)
+            .filter(SystemCounter.name.in_(COUNTER_NAMES))
+            .order_by(SystemCounter.name)
+            .with_for_update()
+            .all()
+        }
+
+        actual = {name: 0 for name in COUNTER_NAMES}
+        actual[USERS] = db.query(func.count(User.id)).scalar() or 0
+        for status, count in db.query(Contest.status, func.count(Contest.id)).group_by(Contest.status):
+            actual[CONTESTS] += count
+            if status in STATUS_COUNTERS:
+                actual[STATUS_COUNTERS[status]] = count
+
+        drift = {}
+        for name, value in actual.items():
+            counter = stored[name]
+            if counter.value != value:
+                drift[name] = counter.value - value
+                counter.value = value
+
+        db.commit()
+        self.invalidate()
+
+        if drift:
+            # Other workers may have cached the wrong values
+            get_invalidation_bus().publish(STATS_CHANGED, local=False)
+            print(f"Stats counters corrected: {drift}")
+        return drift
+
+    def _ensure_counters(self, db: Session) -> None:
+        """Create missing counter rows (at zero; reconcile sets the values)."""
+        existing = {row.name for row in db.query(SystemCounter.name)}
+        missing = [name for name in COUNTER_NAMES if name not in existing]
+        if not missing:
+            return
+
+        for name in missing:
+            db.add(SystemCounter(name=name, value=0))
+        try:
+            db.commit()
+        except Exception:
+            # Created by another worker at the same time
+            db.rollback()
+
+    async def _reconcile_loop(self, session_factory) -> None:
+        """Reconcile now and then periodically, in a worker thread."""
+        while True:
+            try:
+                await asyncio.to_thread(self._reconcile_with_session, session_factory)
+            except Exception as e:
+                print(f"Stats reconciliation failed: {e}")
+            await asyncio.sleep(STATS_RECONCILE_SECONDS)
+
+    def _reconcile_with_session(self, session_factory) -> Dict[str, int]:
+        db = session_factory()
+        try:
+            return self.reconcile(db)
+        finally:
+            db.close()
+
+    def start(self, session_factory) -> None:
+        """
+        Start reconciling in the background (immediately, then periodically).
+
+        Returns without waiting for the first recount, so it does not delay
+        startup. Must be called from a running event loop (the app lifespan).
+        """
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._reconcile_loop(session_factory))
+
+    async def stop(self) -> None:
+        """Stop periodic reconciliation."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+# Singleton instance
+_stats_service: Optional[StatsService] = None
+
+
+def get_stats_service() -> StatsService:
+    """Get the singleton stats service instance."""
+    global _stats_service
+    if _stats_service is None:
+        _stats_service = StatsService()
+        get_invalidation_bus().subscribe(STATS_CHANGED, lambda key: _stats_service.invalidate())
+    return _stats_service
@@ -0,0 +1,309 @@
+"""
+Token budgeting for reflection prompts.
+
+Estimates prompt size per provider and compacts long editorials and user
+approaches so prompts stay within provider context limits. It also picks
+max_tokens per request so that a reflection is expected to finish within a
+latency target (REFLECTION_LATENCY_SLO_SECONDS).
+"""
+
+import hashlib
+import math
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+
+@dataclass(frozen=True)
+class ProviderLimits:
+    """Context and throughput characteristics of a provider."""
+    context_tokens: int  # total context window (prompt + output)
+    max_output_tokens: int  # hard cap on max_tokens
+    bytes_per_token: float  # UTF-8 bytes per token, for estimates
+    first_token_seconds: float  # typical time to first token
+    prompt_tokens_per_second: float  # prompt processing speed
+    output_tokens_per_second: float  # generation speed
+
+
+# Conservative figures for the models each provider is used with
+PROVIDER_LIMITS: Dict[str, ProviderLimits] = {
+    "gemini": ProviderLimits(
+        context_tokens=1_000_000,
+        max_output_tokens=8192,
+        bytes_per_token=4.0,
+        first_token_seconds=1.5,
+        prompt_tokens_per_second=20_000,
+        output_tokens_per_second=120,
+    ),
+    "groq": ProviderLimits(
+        context_tokens=131_072,
+        max_output_tokens=32_768,
+        bytes_per_token=3.8,
+        first_token_seconds=0.5,
+        prompt_tokens_per_second=10_000,
+        output_tokens_per_second=250,
+    ),
+    # Free OpenRouter models are small, with short contexts and slow queues
+    "openrouter": ProviderLimits(
+        context_tokens=32_768,
+        max_output_tokens=4096,
+        bytes_per_token=3.5,
+        first_token_seconds=4.0,
+        prompt_tokens_per_second=2_000,
+        output_tokens_per_second=40,
+    ),
+}
+
+# Overall prompt budget. Keeps requests fast and within Groq's free-tier
+# tokens-per-minute limits.
+PROMPT_TOKEN_BUDGET = int(os.getenv("REFLECTION_PROMPT_TOKEN_BUDGET", "6000"))
+
+# Latency target for a single reflection request
+LATENCY_SLO_SECONDS = float(os.getenv("REFLECTION_LATENCY_SLO_SECONDS", "30"))
+
+# Never ask for fewer output tokens than this (a reflection needs room)
+MIN_OUTPUT_TOKENS = 600
+
+# Share of the prompt budget available to the editorial and the user approach
+EDITORIAL_SHARE = 0.75
+USER_APPROACH_SHARE = 0.15
+
+# Tokens reserved for chat formatting and the system prompt
+CONTEXT_MARGIN_TOKENS = 256
+
+TRUNCATION_MARKER = "[... truncated ...]"
+
+# Lines that look like source code rather than explanation
+_CODE_LINE = re.compile(
+    r"^\s*(#include|using namespace|template\s*<|int main|def |import |public |"
+    r"for\s*\(|while\s*\(|if\s*\(|return\b|[{}]\s*$|.*;\s*$)"
+)
+
+
+def estimate_tokens(text: Optional[str], provider: str = "gemini") -> int:
+    """Estimate the number of tokens in a text for a provider."""
+    if not text:
+        return 0
+    limits = PROVIDER_LIMITS.get(provider, PROVIDER_LIMITS["gemini"])
+    return math.ceil(len(text.encode("utf-8")) / limits.bytes_per_token)
+
+
+def problem_letter_from_url(url: Optional[str]) -> Optional[str]:
+    """
+    Extract the problem index (e.g. "B" or "E2") from a problem URL.
+
+    Supports Codeforces problemset/contest/gym URLs and AtCoder task URLs.
+    """
+    if not url:
+        return None
+
+    match = re.search(r"codeforces\.com/(?:problemset/problem/\d+|(?:contest|gym)/\d+/problem)/([A-Za-z]\d?)", url)
+    if match:
+        return match.group(1).upper()
+
+    match = re.search(r"atcoder\.jp/contests/[^/]+/tasks/[^/?#]*_([a-z]\d?)\b", url)
+    if match:
+        return match.group(1).upper()
+
+    return None
+
+
+def _paragraphs(text: str) -> List[str]:
+    """Split text into paragraphs (blank-line separated, whitespace normalized)."""
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    paragraphs = []
+    for block in re.split(r"\n\s*\n", text):
+        lines = [line.rstrip() for line in block.split("\n")]
+        block = "\n".join(line for line in lines if line.strip())
+        if block:
+            paragraphs.append(block)
+    return paragraphs
+
+
+def deduplicate(text: str) -> str:
+    """
+    Remove repeated paragraphs and lines.
+
+    Pasted editorial pages often contain the same hint, spoiler and code
+    blocks several times.
+    """
+    seen = set()
+    kept = []
+
+    for paragraph in _paragraphs(text):
+        lines = []
+        for line in paragraph.split("\n"):
+            key = hashlib.md5(" ".join(line.split()).lower().encode("utf-8")).digest()
+            # Short lines ("}", "Solution", "Code") legitimately repeat
+            if len(line.strip()) > 20 and key in seen:
+                continue
+            seen.add(key)
+            lines.append(line)
+        if lines:
+            kept.append("\n".join(lines))
+
+    return "\n\n".join(kept)
+
+
+def _is_section_header(line: str, letter: str) -> bool:
+    """Check whether a line starts the editorial section of a problem."""
+    return bool(
+        re.match(rf"^\s*{letter}\s*[.:)\-]\s*\S", line, re.IGNORECASE)
+        or re.match(rf"^\s*{letter}\s*$", line, re.IGNORECASE)
+        or re.search(rf"\bProblem\s+{letter}\b", line, re.IGNORECASE)
+    )
+
+
+def extract_problem_section(text: str, letter: str) -> Optional[str]:
+    """
+    Extract one problem's section from a contest editorial.
+
+    A section starts at a header such as "B. Title", "B" or "Problem B" and
+    ends at the header of the next problem (B -> C, E1 -> E2 or F).
+
+    Returns:
+        The section text, or None if no header for the letter was found
+    """
+    letter = letter.upper()
+    base = letter[0]
+    next_letters = [chr(ord(base) + 1)]
+    if len(letter) > 1 and letter[1:].isdigit():
+        next_letters.insert(0, f"{base}{int(letter[1:]) + 1}")
+
+    section = []
+    in_section = False
+
+    for line in text.split("\n"):
+        if not in_section:
+            if _is_section_header(line, letter):
+                in_section = True
+                section.append(line)
+            continue
+
+        if any(_is_section_header(line, nxt) for nxt in next_letters):
+            break
+        section.append(line)
+
+    return "\n".join(section) if section else None
+
+
+def _is_code_paragraph(paragraph: str) -> bool:
+    """Check whether most lines of a paragraph look like code."""
+    lines = [line for line in paragraph.split("\n") if line.strip()]
+    if not lines:
+        return False
+    code_lines = sum(1 for line in lines if _CODE_LINE.match(line))
+    return code_lines >= max(2, len(lines) // 2)
+
+
+def trim_to_tokens(text: str, max_tokens: int, provider: str = "gemini", keep_tail: bool = False) -> str:
+    """
+    Trim text to about `max_tokens`, cutting at paragraph or line boundaries.
+
+    Args:
+        text: Text to trim
+        max_tokens: Token budget
+        provider: Provider used for the estimate
+        keep_tail: Keep the end as well as the beginning (useful for notes
+            where the conclusion matters)
+    """
+    if estimate_tokens(text, provider) <= max_tokens:
+        return text
+
+    limits = PROVIDER_LIMITS.get(provider, PROVIDER_LIMITS["gemini"])
+    max_bytes = int(max_tokens * limits.bytes_per_token) - len(TRUNCATION_MARKER) - 2
+    if max_bytes <= 0:
+        return TRUNCATION_MARKER
+
+    encoded = text.encode("utf-8")
+    if keep_tail:
+        head = encoded[: max_bytes * 2 // 3].decode("utf-8", "ignore")
+        tail = encoded[-(max_bytes // 3):].decode("utf-8", "ignore")
+        head = head[: head.rfind("\n")] if "\n" in head else head
+        tail = tail[tail.find("\n") + 1:] if "\n" in tail else tail
+        return f"{head}\n{TRUNCATION_MARKER}\n{tail}"
+
+    head = encoded[:max_bytes].decode("utf-8", "ignore")
+    cut = max(head.rfind("\n\n"), head.rfind("\n"))
+    if cut > len(head) // 2:
+        head = head[:cut]
+    return f"{head}\n{TRUNCATION_MARKER}"
+
+
+def compact_editorial(
+    text: Optional[str],
+    max_tokens: int,
+    problem_letter: Optional[str] = None,
+    provider: str = "gemini",
+) -> Optional[str]:
+    """
+    Shrink an editorial to fit a token budget.
+
+    Steps:
+        1. Remove repeated paragraphs and lines.
+        2. Keep only the section for the problem letter, if one is found.
+        3. Drop code blocks, since the ideas matter more than the code.
+        4. Trim what is left at paragraph boundaries.
+
+    Each step only runs while the text is still over budget, so short
+    editorials are passed through unchanged.
+    """
+    if not text or estimate_tokens(text, provider) <= max_tokens:
+        return text
+
+    text = deduplicate(text)
+
+    if problem_letter and estimate_tokens(text, provider) > max_tokens:
+        section = extract_problem_section(text, problem_letter)
+        if section:
+            text = section
+
+    if estimate_tokens(text, provider) > max_tokens:
+        prose = [p for p in _paragraphs(text) if not _is_code_paragraph(p)]
+        if prose:
+            text = "\n\n".join(prose)
+
+    return trim_to_tokens(text, max_tokens, provider)
+
+
+def compact_user_approach(text: Optional[str], max_tokens: int, provider: str = "gemini") -> Optional[str]:
+    """Trim a user approach to a token budget, keeping its start and end."""
+    if not text:
+        return text
+    return trim_to_tokens(text, max_tokens, provider, keep_tail=True)
+
+
+def choose_max_tokens(
+    provider: str,
+    prompt: str,
+    requested: int,
+    slo_seconds: Optional[float] = None,
+) -> Optional[int]:
+    """
+    Choose max_tokens for a request.
+
+    The result is the smallest of:
+        - the requested amount
+        - the provider's output cap
+        - what fits in the context window after the prompt
+        - what the provider can generate within the latency SLO
+
+    It is never below MIN_OUTPUT_TOKENS unless the context is too small.
+
+    Returns:
+        max_tokens to request, or None if the prompt does not fit the provider
+    """
+    limits = PROVIDER_LIMITS.get(provider, PROVIDER_LIMITS["gemini"])
+    slo = LATENCY_SLO_SECONDS if slo_seconds is None else slo_seconds
+    prompt_tokens = estimate_tokens(prompt, provider)
+
+    room = limits.context_tokens - prompt_tokens - CONTEXT_MARGIN_TOKENS
+    if room < MIN_OUTPUT_TOKENS:
+        return None
+
+    generation_seconds = slo - limits.first_token_seconds - prompt_tokens / limits.prompt_tokens_per_second
+    slo_tokens = int(max(0.0, generation_seconds) * limits.output_tokens_per_second)
+
+    budget = min(requested, limits.max_output_tokens, room, max(slo_tokens, MIN_OUTPUT_TOKENS))
+    return max(budget, MIN_OUTPUT_TOKENS)
@@ -0,0 +1,209 @@
+"""
+Weighted topic scheduling for contest problem selection.
+
+Picking contest topics by shuffling every catalog topic and cycling wastes
+most attempts on the long tail of sparse `skill_*` topics, which often have
+nothing near the target difficulty. The weighted scheduler instead:
+
+- precomputes, per topic, how many problems it has below each difficulty
+  (one count per difficulty point), so a topic's difficulty window is two
+  table lookups (and the windows of recent targets are cached);
+- counts each topic's available supply for a contest: problems in the
+  window that the user has not attempted (a popcount over the exclusion
+  bitset);
+- samples topics without replacement, weighted by supply times the user's
+  need for the topic.
+
+Topics with no eligible problem are never scheduled, and a topic is only
+scheduled again once every topic with supply has had a turn (and only while
+it has problems left). Each scheduled topic therefore yields a problem, so
+selection needs exactly as many draws as there are slots.
+
+Schedulers are pluggable: ProblemService asks one for the topic order
+(TOPIC_SCHEDULER=weighted, the default) or, with TOPIC_SCHEDULER=shuffle,
+keeps the original shuffle-and-cycle loop.
+"""
+
+import heapq
+import random
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from .shared_catalog import CatalogIndex
+
+# Names accepted by TOPIC_SCHEDULER
+SCHEDULERS = ("weighted", "shuffle")
+
+# (target difficulty, tolerance) combinations whose windows are kept
+WINDOW_CACHE_SIZE = 256
+
+# Need weights: every topic starts at 1. Failed attempts raise it (up to
+# 1 + NEED_FAILURE_WEIGHT at a 0% solve rate) and active weak topics that
+# did not get a weak topic slot are multiplied by WEAK_TOPIC_NEED.
+NEED_FAILURE_WEIGHT = 1.0
+WEAK_TOPIC_NEED = 2.0
+
+
+def topic_need(
+    topic_stats: Iterable[tuple],
+    weak_topics: Iterable[str] = (),
+) -> Dict[str, float]:
+    """
+    How much a user needs practice on each topic (default 1.0).
+
+    Args:
+        topic_stats: (topic, problems_solved, problems_attempted) rows, e.g.
+            from UserTopicRating
+        weak_topics: The user's active weak topics
+
+    Returns:
+        Topic -> need weight, for topics that differ from the default
+    """
+    need: Dict[str, float] = {}
+    for topic, solved, attempted in topic_stats:
+        if attempted:
+            failure_rate = max(0, attempted - (solved or 0)) / attempted
+            need[topic] = 1.0 + NEED_FAILURE_WEIGHT * failure_rate
+    for topic in weak_topics:
+        need[topic] = need.get(topic, 1.0) * WEAK_TOPIC_NEED
+    return need
+
+
+class WeightedTopicScheduler:
+    """Schedules contest topics by available supply and user need."""
+
+    def __init__(self, catalog: CatalogIndex):
+        """
+        Args:
+            catalog: Loaded catalog index (problems sorted by topic, difficulty)
+        """
+        self.catalog = catalog
+        self.num_topics = len(catalog.topics)
+
+        if len(catalog):
+            self.min_difficulty = min(catalog.difficulty)
+            self.max_difficulty = max(catalog.difficulty)
+        else:
+            self.min_difficulty = self.max_difficulty = 0
+        self._width = self.max_difficulty - self.min_difficulty + 2
+
+        # _below[t * width + i]: problems of topic t with difficulty < min + i
+        self._below = array("i", bytes(4 * self._width * self.num_topics))
+        self._start = array("i", bytes(4 * self.num_topics))
+        for topic_number in range(self.num_topics):
+            row = topic_number * self._width
+            problems = catalog.topic_window(topic_number, self.min_difficulty, self.max_difficulty)
+            self._start[topic_number] = problems.start
+            for i in range(1, self._width):
+                below = bisect_left(catalog.difficulty, self.min_difficulty + i, problems.start, problems.stop)
+                self._below[row + i] = below - problems.start
+
+        self._windows = lru_cache(maxsize=WINDOW_CACHE_SIZE)(self._compute_windows)
+
+    def window(self, topic_number: int, min_difficulty: int, max_difficulty: int) -> range:
+        """Problem numbers of a topic with min_difficulty <= difficulty <= max_difficulty."""
+        row = topic_number * self._width
+        start = self._start[topic_number]
+        low = min(max(min_difficulty - self.min_difficulty, 0), self._width - 1)
+        high = min(max(max_difficulty - self.min_difficulty + 1, 0), self._width - 1)
+        if high <= low:
+            return range(start, start)
+        return range(start + self._below[row + low], start + self._below[row + high])
+
+    def _compute_windows(self, target_difficulty: int, tolerance: int) -> List[tuple]:
+        """(topic number, wide window, near window) for topics with problems in the wide window."""
+        windows = []
+        for topic_number in range(self.num_topics):
+            wide = self.window(topic_number, target_difficulty - tolerance * 2, target_difficulty + tolerance * 2)
+            if wide:
+                near = self.window(topic_number, target_difficulty - tolerance, target_difficulty + tolerance)
+                windows.append((topic_number, wide, near))
+        return windows
+
+    def supply(self, target_difficulty: int, tolerance: int, excluded: int) -> Dict[int, tuple]:
+        """
+        Available problems per topic around a target difficulty.
+
+        Counts follow _select_problem_for_topic: problems within `tolerance`,
+        or within twice the tolerance if none of those are left.
+
+        Returns:
+            Topic number -> (weighted supply, capacity), for topics with any
+            available problem. Capacity is how many problems the topic can
+            give (its wide window).
+        """
+        supply = {}
+        for topic_number, wide, near in self._windows(target_difficulty, tolerance):
+            capacity = len(wide) - _count_bits(excluded, wide.start, wide.stop)
+            if capacity <= 0:
+                continue
+            available = len(near) - _count_bits(excluded, near.start, near.stop)
+            supply[topic_number] = (available or capacity, capacity)
+        return supply
+
+    def schedule(
+        self,
+        count: int,
+        target_difficulty: int,
+        tolerance: int,
+        excluded: int,
+        skip_topics: Iterable[str] = (),
+        need: Optional[Dict[str, float]] = None,
+    ) -> List[str]:
+        """
+        Choose the topics of a contest's regular problems.
+
+        Args:
+            count: Number of problems to schedule
+            target_difficulty: Contest target difficulty
+            tolerance: Difficulty tolerance
+            excluded: Problems to exclude, as a bitset
+            skip_topics: Topics to leave for later rounds (weak topics
+                already in the contest)
+            need: Topic -> need weight (see topic_need; default 1.0)
+
+        Returns:
+            Up to `count` topics, in draw order. Fewer only when the
+            available problems run out.
+        """
+        need = need or {}
+        supply = self.supply(target_difficulty, tolerance, excluded)
+        weights = {
+            topic_number: max(available * need.get(self.catalog.topics[topic_number], 1.0), 1e-9)
+            for topic_number, (available, _) in supply.items()
+        }
+        remaining = {topic_number: capacity for topic_number, (_, capacity) in supply.items()}
+        skipped = {self.catalog.topic_number(topic) for topic in skip_topics}
+
+        scheduled: List[str] = []
+        first_round = True
+        while len(scheduled) < count:
+            candidates = [
+                topic_number for topic_number, left in remaining.items()
+                if left > 0 and not (first_round and topic_number in skipped)
+            ]
+            if not candidates:
+                if first_round and any(left > 0 for left in remaining.values()):
+                    first_round = False
+                    continue
+                break
+            first_round = False
+
+            # Weighted sampling without replacement (Efraimidis-Spirakis keys)
+            drawn = heapq.nlargest(
+                count - len(scheduled), candidates,
+                key=lambda topic_number: random.random() ** (1.0 / weights[topic_number]),
+            )
+            for topic_number in drawn:
+                remaining[topic_number] -= 1
+                scheduled.append(self.catalog.topics[topic_number])
+        return scheduled
+
+
+def _count_bits(bits: int, start: int, stop: int) -> int:
+    """Number of set bits of `bits` in positions [start, stop)."""
+    if not bits or stop <= start:
+        return 0
+    return ((bits >> start) & ((1 << (stop - start)) - 1)).bit_count()
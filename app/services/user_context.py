@@ -0,0 +1,149 @@
+"""
+Per-user contest context.
+
+Starting a contest reads the same user-scoped rows every time: the user's
+rating, their active weak topics (and levels) and their per-topic stats.
+Those only change when a contest ends (RatingService) or the user is
+deleted, so they are loaded once into a UserContext and kept in a bounded
+LRU cache, like the exclusion bitsets (see exclusion_service).
+
+Every change bumps the cache's version. A context loaded while a change
+was being made is returned but not cached. Mutations publish USER_CHANGED
+on the invalidation bus after they commit, which drops the user's entry in
+every worker. Entries are also reloaded after USER_CONTEXT_TTL_SECONDS.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..instrumentation import REGISTRY, Counter
+from ..models import User, UserTopicRating, WeakTopic
+from .invalidation_bus import USER_CHANGED, get_invalidation_bus
+
+USER_CONTEXT_CACHE_USERS = int(os.getenv("USER_CONTEXT_CACHE_USERS", "10000"))
+USER_CONTEXT_TTL_SECONDS = float(os.getenv("USER_CONTEXT_TTL_SECONDS", "300"))
+
+CONTEXT_REQUESTS = REGISTRY.register(Counter(
+    "user_context_requests_total",
+    "User context lookups by outcome (hit: served from the cache, miss: loaded from the database).",
+    ["outcome"],
+))
+
+
+@dataclass
+class UserContext:
+    """Snapshot of the user data contest creation needs (detached from the session)."""
+
+    user_id: int
+    rating: int
+    # Active weak topics, in database order
+    weak_topics: List[str] = field(default_factory=list)
+    # Active weak topic -> current level
+    weak_topic_levels: Dict[str, int] = field(default_factory=dict)
+    # (topic, problems_solved, problems_attempted) per UserTopicRating
+    topic_stats: List[Tuple[str, int, int]] = field(default_factory=list)
+    version: int = 0
+    loaded_at: float = 0.0
+
+
+class UserContextService:
+    """Service for cached per-user contest context."""
+
+    def __init__(
+        self,
+        max_users: int = USER_CONTEXT_CACHE_USERS,
+        ttl_seconds: float = USER_CONTEXT_TTL_SECONDS,
+    ):
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, UserContext]" = OrderedDict()
+        self._lock = Lock()
+        # Bumped by every invalidation, so a load that raced with one isn't cached
+        self.version = 0
+
+    def get(self, db: Session, user_id: int) -> Optional[UserContext]:
+        """
+        Get a user's context, loading it if it is not cached.
+
+        Args:
+            db: Database session
+            user_id: User ID
+
+        Returns:
+            UserContext, or None if the user does not exist
+        """
+        with self._lock:
+            context = self._entries.get(user_id)
+            if context is not None and time.monotonic() - context.loaded_at < self.ttl_seconds:
+                self._entries.move_to_end(user_id)
+                CONTEXT_REQUESTS.inc(outcome="hit")
+                return context
+            version = self.version
+
+        CONTEXT_REQUESTS.inc(outcome="miss")
+        context = self.load(db, user_id)
+        if context is None:
+            return None
+        context.version = version
+
+        with self._lock:
+            if self.version == version:
+                self._entries[user_id] = context
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_users:
+                    self._entries.popitem(last=False)
+        return context
+
+    def load(self, db: Session, user_id: int) -> Optional[UserContext]:
+        """Load a user's context from the database (None if the user does not exist)."""
+        user = db.query(User.id, User.rating).filter(User.id == user_id).first()
+        if user is None:
+            return None
+
+        weak_topics = db.query(WeakTopic.topic, WeakTopic.current_level).filter(
+            WeakTopic.user_id == user_id,
+            WeakTopic.is_active == True,
+        ).all()
+
+        topic_stats = db.query(
+            UserTopicRating.topic,
+            UserTopicRating.problems_solved,
+            UserTopicRating.problems_attempted,
+        ).filter(UserTopicRating.user_id == user_id).all()
+
+        return UserContext(
+            user_id=user_id,
+            rating=user.rating,
+            weak_topics=[wt.topic for wt in weak_topics],
+            weak_topic_levels={wt.topic: wt.current_level for wt in weak_topics},
+            topic_stats=[(row.topic, row.problems_solved or 0, row.problems_attempted or 0) for row in topic_stats],
+            loaded_at=time.monotonic(),
+        )
+
+    def invalidate(self, user_id: Optional[int] = None) -> None:
+        """Drop a user's cached context (or all of them). Call after committing a change."""
+        with self._lock:
+            self.version += 1
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+
+# Singleton instance
+_user_context_service: Optional[UserContextService] = None
+
+
+def get_user_context_service() -> UserContextService:
+    """Get the singleton user context service instance."""
+    global _user_context_service
+    if _user_context_service is None:
+        _user_context_service = UserContextService()
+        get_invalidation_bus().subscribe(USER_CHANGED, _user_context_service.invalidate)
+    return _user_context_service
@@ -0,0 +1,172 @@
+"""
+Startup phases and readiness.
+
+The server starts accepting requests as soon as the database is reachable
+and its schema is current. Slower work (loading the problem catalog) runs
+in background threads, and /ready reports when it is done. Every phase is
+timed, together with the gap between process start and the moment the
+server could serve its first request.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .instrumentation import REGISTRY, Gauge
+
+# Phase states
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def _process_start_time() -> float:
+    """
+    Wall-clock time this process was started.
+
+    Read from /proc on Linux, so interpreter startup and imports are counted.
+    Elsewhere falls back to the time this module was imported.
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22 (starttime) is in clock ticks since boot; the command
+            # name (field 2) may contain spaces, so split after its ')'
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/stat") as f:
+            boot_time = next(int(line.split()[1]) for line in f if line.startswith("btime"))
+        return boot_time + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, StopIteration):
+        return time.time()
+
+
+PROCESS_STARTED_AT = _process_start_time()
+
+
+class StartupTracker:
+    """Tracks startup phases and decides readiness."""
+
+    def __init__(self, started_at: float = PROCESS_STARTED_AT):
+        self.started_at = started_at
+        self.serving_at: Optional[float] = None
+        self._phases: Dict[str, Dict[str, Any]] = {}
+        self._required: List[str] = []
+        self._lock = threading.Lock()
+
+    def begin(self, name: str, required: bool = True) -> None:
+        """Mark a phase as running. Required phases must finish before /ready passes."""
+        with self._lock:
+            self._phases[name] = {"status": RUNNING, "started": time.time(), "seconds": None, "error": None}
+            if required and name not in self._required:
+                self._required.append(name)
+
+    def finish(self, name: str, error: Optional[BaseException] = None) -> None:
+        """Mark a phase as done (or failed with `error`)."""
+        with self._lock:
+            phase = self._phases[name]
+            phase["seconds"] = round(time.time() - phase["started"], 3)
+            phase["status"] = FAILED if error is not None else DONE
+            phase["error"] = str(error) if error is not None else None
+
+    def run(self, name: str, func: Callable[[], Any], required: bool = True) -> Any:
+        """Run a phase in the current thread (exceptions are recorded and re-raised)."""
+        self.begin(name, required)
+        try:
+            result = func()
+        except BaseException as e:
+            self.finish(name, e)
+            raise
+        self.finish(name)
+        return result
+
+    def run_in_background(self, name: str, func: Callable[[], Any], required: bool = True) -> threading.Thread:
+        """Run a phase in a daemon thread (exceptions are recorded and logged)."""
+        self.begin(name, required)
+
+        def target():
+            try:
+                func()
+            except Exception as e:
+                self.finish(name, e)
+                print(f"Startup phase '{name}' failed: {e}")
+                return
+            self.finish(name)
+            print(f"Startup phase '{name}' finished in {self._phases[name]['seconds']:.2f}s")
+
+        thread = threading.Thread(target=target, name=f"startup-{name}", daemon=True)
+        thread.start()
+        return thread
+
+    def mark_serving(self) -> float:
+        """
+        Record that the server is about to accept requests.
+
+        Returns:
+            Seconds from process start until now
+        """
+        self.serving_at = time.time()
+        return self.serving_at - self.started_at
+
+    def is_ready(self) -> bool:
+        """True when the server is serving and every required phase is done."""
+        with self._lock:
+            return self.serving_at is not None and all(
+                self._phases[name]["status"] == DONE for name in self._required
+            )
+
+    def status(self) -> Dict[str, Any]:
+        """Readiness, phase states and timings."""
+        ready = self.is_ready()
+        with self._lock:
+            phases = {
+                name: {key: value for key, value in phase.items() if key != "started"}
+                for name, phase in self._phases.items()
+            }
+            ready_at = None
+            if ready:
+                finished = [
+                    phase["started"] + phase["seconds"] for name, phase in self._phases.items()
+                    if name in self._required
+                ]
+                ready_at = max([self.serving_at] + finished)
+
+        return {
+            "ready": ready,
+            "worker": os.getpid(),
+            "phases": phases,
+            "seconds_to_serving": (
+                round(self.serving_at - self.started_at, 3) if self.serving_at is not None else None
+            ),
+            "seconds_to_ready": round(ready_at - self.started_at, 3) if ready_at is not None else None,
+        }
+
+
+# Singleton instance
+_startup_tracker: Optional[StartupTracker] = None
+
+
+def get_startup_tracker() -> StartupTracker:
+    """Get the singleton startup tracker instance."""
+    global _startup_tracker
+    if _startup_tracker is None:
+        _startup_tracker = StartupTracker()
+    return _startup_tracker
+
+
+def _startup_seconds() -> Dict[Tuple[str, ...], float]:
+    """Finished phase durations, plus process start until serving."""
+    status = get_startup_tracker().status()
+    values = {
+        (name,): phase["seconds"] for name, phase in status["phases"].items()
+        if phase["seconds"] is not None
+    }
+    if status["seconds_to_serving"] is not None:
+        values[("serving",)] = status["seconds_to_serving"]
+    return values
+
+
+REGISTRY.register(Gauge(
+    "app_startup_seconds",
+    "Seconds each startup phase took (phase=serving: process start until requests were accepted).",
+    ["phase"], callback=_startup_seconds,
+))
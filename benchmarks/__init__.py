@@ -0,0 +1,6 @@
+"""
+Benchmark suite for the MasterCP contest system.
+
+Run the benchmarks from the repository root as modules, e.g.
+``python -m benchmarks.api_bench``. See benchmarks/README.md.
+"""
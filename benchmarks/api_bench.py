@@ -0,0 +1,612 @@
+"""
+Load benchmark for the contest API.
+
+Drives realistic contest flows against the FastAPI app and reports latency
+percentiles and throughput per endpoint:
+
+    create user -> start contest -> start problem / submit (x N) -> end -> statistics
+
+Half of the flows (by default) reuse seeded users that already have problem
+history, topic ratings and weak topics, so contest creation has to work
+around realistic exclusion sets.
+
+MODES:
+    inprocess: the app runs inside this process behind httpx's ASGI transport
+    uvicorn:   the app runs in a uvicorn subprocess and is called over HTTP
+
+DATABASES:
+    By default each run uses a fresh SQLite file in a temporary directory.
+    Pass --database-url to run against PostgreSQL instead (use --reset to drop
+    and recreate the tables first).
+
+Usage:
+    python -m benchmarks.api_bench
+    python -m benchmarks.api_bench --mode uvicorn --concurrency 16
+    python -m benchmarks.api_bench --database-url postgresql://... --reset
+    python -m benchmarks.api_bench --update-baseline
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Allowed slowdown (p50/p95) or throughput drop before a run counts as a regression
+DEFAULT_THRESHOLD = 0.25
+
+# Tail latencies are noisier, so p95 gets this multiple of the threshold
+TAIL_THRESHOLD_FACTOR = 2.0
+
+# Latency differences smaller than this are treated as noise
+MIN_LATENCY_DELTA_MS = 2.0
+
+# Runs with a higher share of failed requests always fail the comparison
+MAX_ERROR_RATE = 0.01
+
+
+class FlowError(Exception):
+    """Raised when a request in a flow returns an unexpected status."""
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Percentile of pre-sorted values with linear interpolation (q in 0-100)."""
+    if not sorted_values:
+        return 0.0
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = position - lower
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction
+
+
+class LatencyRecorder:
+    """Collects request latencies per endpoint."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, endpoint: str, seconds: float, ok: bool) -> None:
+        """Record one request."""
+        self.samples.setdefault(endpoint, []).append(seconds)
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self, duration: float) -> Dict[str, Any]:
+        """Summarize the recorded requests for a run that took `duration` seconds."""
+        endpoints = {}
+        total_requests = 0
+        total_errors = 0
+
+        for endpoint, samples in sorted(self.samples.items()):
+            ordered = sorted(samples)
+            errors = self.errors.get(endpoint, 0)
+            total_requests += len(ordered)
+            total_errors += errors
+
+            endpoints[endpoint] = {
+                "count": len(ordered),
+                "errors": errors,
+                "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+                "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+                "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+                "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+                "throughput_rps": round(len(ordered) / duration, 2) if duration else 0.0,
+            }
+
+        return {
+            "endpoints": endpoints,
+            "total": {
+                "requests": total_requests,
+                "errors": total_errors,
+                "duration_s": round(duration, 2),
+                "throughput_rps": round(total_requests / duration, 2) if duration else 0.0,
+            },
+        }
+
+
+class FlowRunner:
+    """Runs contest flows against an API client and records their latencies."""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        recorder: LatencyRecorder,
+        prefix: str,
+        num_problems: int,
+        solve_rate: float,
+    ):
+        self.client = client
+        self.recorder = recorder
+        self.prefix = prefix
+        self.num_problems = num_problems
+        self.solve_rate = solve_rate
+        self.flows_completed = 0
+        self.flows_failed = 0
+        self.flow_latencies: List[float] = []
+
+    async def request(
+        self,
+        endpoint: str,
+        method: str,
+        url: str,
+        payload: Optional[Dict[str, Any]] = None,
+    ) -> Any:
+        """Send one request, record it under `endpoint` and return the JSON body."""
+        start = time.perf_counter()
+        response = await self.client.request(method, url, json=payload)
+        elapsed = time.perf_counter() - start
+
+        ok = response.status_code < 400
+        self.recorder.record(endpoint, elapsed, ok)
+
+        if not ok:
+            raise FlowError(f"{endpoint}: HTTP {response.status_code} {response.text[:200]}")
+        return response.json() if response.content else None
+
+    async def run_flow(self, flow_id: int, user_id: Optional[int], rng: random.Random) -> None:
+        """
+        Run one contest flow.
+
+        Args:
+            flow_id: Unique flow number (used for usernames)
+            user_id: Existing user to run the flow for, or None to create one
+            rng: Random source for solve outcomes
+        """
+        start = time.perf_counter()
+        contest_id = None
+
+        try:
+            if user_id is None:
+                user = await self.request(
+                    "POST /users/", "POST", "/users/",
+                    {"username": f"{self.prefix}_u{flow_id}"},
+                )
+                user_id = user["id"]
+
+            contest = await self.request(
+                "POST /contests/start/{user_id}", "POST", f"/contests/start/{user_id}",
+                {"num_problems": self.num_problems},
+            )
+            contest_id = contest["id"]
+
+            for problem in contest["problems"]:
+                problem_id = problem["problem_id"]
+                await self.request(
+                    "POST /contests/{contest_id}/start-problem/{problem_id}", "POST",
+                    f"/contests/{contest_id}/start-problem/{problem_id}",
+                )
+                await self.request(
+                    "POST /contests/{contest_id}/submit", "POST",
+                    f"/contests/{contest_id}/submit",
+                    {
+                        "problem_id": problem_id,
+                        "solved": rng.random() < self.solve_rate,
+                        "user_approach": "Sorted the input and used two pointers.",
+                    },
+                )
+
+            await self.request(
+                "POST /contests/{contest_id}/end", "POST", f"/contests/{contest_id}/end",
+            )
+            contest_id = None
+
+            await self.request(
+                "GET /users/{user_id}/statistics", "GET", f"/users/{user_id}/statistics",
+            )
+
+            self.flows_completed += 1
+            self.flow_latencies.append(time.perf_counter() - start)
+
+        except (FlowError, httpx.HTTPError) as e:
+            self.flows_failed += 1
+            if self.flows_failed <= 5:
+                print(f"  ⚠️  Flow {flow_id} failed: {e}")
+
+            # Don't leave an active contest behind, or the user's next flow fails too
+            if contest_id is not None:
+                try:
+                    await self.client.post(f"/contests/{contest_id}/abandon")
+                except httpx.HTTPError:
+                    pass
+
+
+def plan_flows(
+    num_flows: int,
+    concurrency: int,
+    seeded_users: List[int],
+    returning_fraction: float,
+    seed: int,
+) -> List[List[Tuple[int, Optional[int], int]]]:
+    """
+    Split flows across workers.
+
+    Each worker owns a disjoint slice of the seeded users, so no user ever
+    has two contests running at once.
+
+    Returns:
+        Per-worker lists of (flow_id, user_id or None, flow_seed)
+    """
+    rng = random.Random(seed)
+    plans: List[List[Tuple[int, Optional[int], int]]] = [[] for _ in range(concurrency)]
+    owned = [seeded_users[w::concurrency] for w in range(concurrency)]
+    next_user = [0] * concurrency
+
+    for flow_id in range(num_flows):
+        worker = flow_id % concurrency
+        user_id = None
+        if owned[worker] and rng.random() < returning_fraction:
+            user_id = owned[worker][next_user[worker] % len(owned[worker])]
+            next_user[worker] += 1
+        plans[worker].append((flow_id, user_id, rng.randrange(1 << 30)))
+
+    return plans
+
+
+async def run_phase(
+    client: httpx.AsyncClient,
+    plans: List[List[Tuple[int, Optional[int], int]]],
+    prefix: str,
+    args: argparse.Namespace,
+) -> Tuple[FlowRunner, float]:
+    """Run planned flows with one task per worker and return the runner and duration."""
+    runner = FlowRunner(client, LatencyRecorder(), prefix, args.num_problems, args.solve_rate)
+
+    async def worker(plan):
+        for flow_id, user_id, flow_seed in plan:
+            await runner.run_flow(flow_id, user_id, random.Random(flow_seed))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(plan) for plan in plans))
+    return runner, time.perf_counter() - start
+
+
+async def run_benchmark(
+    base_url: Optional[str],
+    plans: List[List[Tuple[int, Optional[int], int]]],
+    warmup_plans: List[List[Tuple[int, Optional[int], int]]],
+    prefix: str,
+    args: argparse.Namespace,
+) -> Tuple[FlowRunner, float]:
+    """Run the warmup and the timed phase, in-process or against `base_url`."""
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    timeout = httpx.Timeout(60.0)
+
+    if base_url is not None:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+            await run_phase(client, warmup_plans, f"{prefix}w", args)
+            return await run_phase(client, plans, prefix, args)
+
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", limits=limits, timeout=timeout
+        ) as client:
+            await run_phase(client, warmup_plans, f"{prefix}w", args)
+            return await run_phase(client, plans, prefix, args)
+
+
+def find_free_port() -> int:
+    """Ask the OS for a free TCP port."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_uvicorn(workers: int, verbose: bool) -> Tuple[subprocess.Popen, str]:
+    """Start the app under uvicorn and wait until /health responds."""
+    port = find_free_port()
+    command = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning",
+    ]
+    output = None if verbose else subprocess.DEVNULL
+    process = subprocess.Popen(command, cwd=REPO_ROOT, env=os.environ.copy(),
+                               stdout=output, stderr=output)
+
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1.0).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+
+    process.terminate()
+    raise RuntimeError("uvicorn did not become ready within 120s")
+
+
+def prepare_database(
+    catalog_path: str,
+    args: argparse.Namespace,
+    prefix: str,
+) -> List[int]:
+    """Create tables and seed the user base. Returns the seeded user IDs."""
+    from app.catalog_io import iter_catalog
+    from app.database import Base, SessionLocal, engine, init_db
+
+    from .synthetic import seed_user_base
+
+    if args.reset:
+        print("🗑️  Dropping existing tables...")
+        from app import models  # noqa: F401 - register models before drop_all
+        Base.metadata.drop_all(bind=engine)
+
+    init_db()
+
+    problems = [(r["id"], r.get("internal_rating", 50)) for r in iter_catalog(catalog_path)]
+
+    print(f"👥 Seeding {args.seed_users} users with {args.history_size} history rows each...")
+    db = SessionLocal()
+    try:
+        user_ids = seed_user_base(
+            db, problems, args.seed_users,
+            history_size=args.history_size, prefix=prefix, seed=args.seed,
+        )
+    finally:
+        db.close()
+
+    # Each process gets its own pool; don't hand connections to the server process
+    engine.dispose()
+    return user_ids
+
+
+def compare_to_baseline(
+    result: Dict[str, Any],
+    baseline: Dict[str, Any],
+    threshold: float,
+) -> List[str]:
+    """
+    Compare a run with a baseline scenario.
+
+    Returns:
+        List of human-readable regressions (empty if none)
+    """
+    regressions = []
+
+    for endpoint, base in baseline.get("endpoints", {}).items():
+        current = result["endpoints"].get(endpoint)
+        if current is None:
+            regressions.append(f"{endpoint}: missing from this run")
+            continue
+
+        for key, allowed in (("p50_ms", threshold), ("p95_ms", threshold * TAIL_THRESHOLD_FACTOR)):
+            limit = base[key] * (1 + allowed)
+            if current[key] > limit and current[key] - base[key] > MIN_LATENCY_DELTA_MS:
+                regressions.append(
+                    f"{endpoint}: {key} {current[key]:.1f} > {base[key]:.1f} (+{allowed:.0%})"
+                )
+
+    base_total = baseline.get("total", {})
+    if base_total:
+        floor = base_total["throughput_rps"] * (1 - threshold)
+        if result["total"]["throughput_rps"] < floor:
+            regressions.append(
+                f"throughput {result['total']['throughput_rps']:.1f} req/s < "
+                f"{base_total['throughput_rps']:.1f} (-{threshold:.0%})"
+            )
+
+    total = result["total"]
+    if total["requests"] and total["errors"] / total["requests"] > MAX_ERROR_RATE:
+        regressions.append(f"error rate {total['errors']}/{total['requests']} requests")
+
+    return regressions
+
+
+def print_summary(result: Dict[str, Any]) -> None:
+    """Print a per-endpoint latency table."""
+    print("\n" + "=" * 100)
+    print(f"{'Endpoint':<55}{'count':>7}{'err':>5}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}")
+    print("-" * 100)
+    for endpoint, stats in result["endpoints"].items():
+        print(
+            f"{endpoint:<55}{stats['count']:>7}{stats['errors']:>5}"
+            f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}"
+            f"{stats['throughput_rps']:>9.1f}"
+        )
+    print("-" * 100)
+
+    total = result["total"]
+    flows = result["flows"]
+    print(
+        f"Total: {total['requests']} requests, {total['errors']} errors in "
+        f"{total['duration_s']:.1f}s ({total['throughput_rps']:.1f} req/s)"
+    )
+    print(
+        f"Flows: {flows['completed']} completed, {flows['failed']} failed, "
+        f"{flows['throughput_per_s']:.2f} flows/s, p50 {flows['p50_ms']:.0f} ms, "
+        f"p95 {flows['p95_ms']:.0f} ms"
+    )
+    print("=" * 100)
+
+
+def load_baseline(path: str) -> Dict[str, Any]:
+    """Load the baseline file (empty structure if it doesn't exist)."""
+    if not os.path.exists(path):
+        return {"threshold": DEFAULT_THRESHOLD, "scenarios": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Load benchmark for the contest API")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess",
+                        help="Run the app in-process or in a uvicorn subprocess")
+    parser.add_argument("--database-url", help="Database to benchmark (default: fresh SQLite file)")
+    parser.add_argument("--reset", action="store_true",
+                        help="Drop and recreate all tables before seeding")
+    parser.add_argument("--catalog", help="Use an existing catalog instead of a synthetic one")
+    parser.add_argument("--problems", type=int, default=20000,
+                        help="Synthetic catalog size (default: 20000)")
+    parser.add_argument("--seed-users", type=int, default=200,
+                        help="Users to seed with history (default: 200)")
+    parser.add_argument("--history-size", type=int, default=150,
+                        help="Problem history rows per seeded user (default: 150)")
+    parser.add_argument("--flows", type=int, default=200,
+                        help="Timed contest flows (default: 200)")
+    parser.add_argument("--warmup-flows", type=int, default=16,
+                        help="Untimed warmup flows (default: 16)")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Concurrent virtual users (default: 8)")
+    parser.add_argument("--num-problems", type=int, default=5,
+                        help="Problems per contest (default: 5)")
+    parser.add_argument("--solve-rate", type=float, default=0.7,
+                        help="Probability that a submission is solved (default: 0.7)")
+    parser.add_argument("--returning-fraction", type=float, default=0.5,
+                        help="Share of flows run by seeded users (default: 0.5)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="uvicorn worker processes (uvicorn mode only)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--scenario", help="Scenario name (default: <mode>-<database>)")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline file to compare with")
+    parser.add_argument("--threshold", type=float,
+                        help="Allowed regression (default: from baseline file, else 0.25)")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Store this run as the scenario's baseline")
+    parser.add_argument("--verbose", action="store_true", help="Show application output")
+    return parser.parse_args()
+
+
+def main() -> int:
+    """Run the benchmark."""
+    args = parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="mastercp-bench-")
+    database_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    dialect = "postgresql" if database_url.startswith("postgres") else "sqlite"
+    scenario = args.scenario or f"{args.mode}-{dialect}"
+    prefix = f"b{int(time.time()) % 100000}"
+
+    print("=" * 60)
+    print(f"MASTERCP API BENCHMARK ({scenario})")
+    print("=" * 60)
+
+    process = None
+    try:
+        if args.catalog:
+            catalog_path = os.path.abspath(args.catalog)
+        else:
+            from .synthetic import write_synthetic_catalog
+
+            catalog_path = os.path.join(workdir, "catalog.jsonl.gz")
+            print(f"📚 Generating synthetic catalog ({args.problems} problems)...")
+            write_synthetic_catalog(catalog_path, args.problems, seed=args.seed)
+
+        # The app reads these at import time, so they must be set before importing it
+        os.environ["DATABASE_URL"] = database_url
+        os.environ["PROBLEMS_FILE"] = catalog_path
+
+        random.seed(args.seed)
+        seeded_users = prepare_database(catalog_path, args, prefix)
+
+        plans = plan_flows(args.flows, args.concurrency, seeded_users,
+                           args.returning_fraction, args.seed)
+        warmup_plans = plan_flows(args.warmup_flows, args.concurrency, [], 0.0, args.seed + 1)
+
+        base_url = None
+        if args.mode == "uvicorn":
+            print(f"🚀 Starting uvicorn ({args.workers} worker(s))...")
+            process, base_url = start_uvicorn(args.workers, args.verbose)
+
+        print(f"🏃 Running {args.warmup_flows} warmup + {args.flows} timed flows "
+              f"with {args.concurrency} virtual users...")
+        runner, duration = asyncio.run(
+            run_benchmark(base_url, plans, warmup_plans, prefix, args)
+        )
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    result = runner.recorder.summary(duration)
+    flow_latencies = sorted(runner.flow_latencies)
+    result["flows"] = {
+        "completed": runner.flows_completed,
+        "failed": runner.flows_failed,
+        "throughput_per_s": round(runner.flows_completed / duration, 2) if duration else 0.0,
+        "p50_ms": round(percentile(flow_latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(flow_latencies, 95) * 1000, 1),
+    }
+    result["meta"] = {
+        "scenario": scenario,
+        "mode": args.mode,
+        "database": dialect,
+        "catalog": "file" if args.catalog else f"synthetic:{args.problems}",
+        "seed_users": args.seed_users,
+        "history_size": args.history_size,
+        "flows": args.flows,
+        "concurrency": args.concurrency,
+        "num_problems": args.num_problems,
+        "workers": args.workers if args.mode == "uvicorn" else None,
+        "python": platform.python_version(),
+        "platform": platform.platform(terse=True),
+        "recorded_at": datetime.utcnow().isoformat(timespec="seconds"),
+    }
+
+    print_summary(result)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+    baseline = load_baseline(args.baseline)
+    threshold = args.threshold if args.threshold is not None else baseline.get(
+        "threshold", DEFAULT_THRESHOLD
+    )
+
+    if args.update_baseline:
+        baseline.setdefault("scenarios", {})[scenario] = result
+        baseline.setdefault("threshold", DEFAULT_THRESHOLD)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        print(f"💾 Baseline for '{scenario}' updated in {args.baseline}")
+        return 0
+
+    scenario_baseline = baseline.get("scenarios", {}).get(scenario)
+    if scenario_baseline is None:
+        print(f"ℹ️  No baseline for '{scenario}' (run with --update-baseline to record one)")
+        return 0
+
+    regressions = compare_to_baseline(result, scenario_baseline, threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) against baseline '{scenario}':")
+        for regression in regressions:
+            print(f"  - {regression}")
+        return 1
+
+    print(f"\n✅ Within {threshold:.0%} of baseline '{scenario}'")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""
+Microbenchmarks for ProblemService.select_problems_for_contest.
+
+Builds synthetic catalogs of different sizes, topic skews and difficulty
+distributions. On each catalog it times contest selection for users with
+exclusion sets of different sizes. Besides wall time, it counts how often the
+slow paths run:
+
+- per-topic lookups (_select_problem_for_topic calls)
+- the full-catalog fallback
+- selections that came up short
+
+(The numpy engine draws a contest without these helpers, so its lookup and
+fallback counts are zero.)
+
+Each scenario is seeded, so two runs on the same machine are directly
+comparable. Save a run with --output and compare a later run against it with
+--compare.
+
+Usage:
+    python -m benchmarks.selection_bench
+    python -m benchmarks.selection_bench --sizes 10000,100000,1000000 --exclusions 0,5000,50000
+    python -m benchmarks.selection_bench --output before.json
+    python -m benchmarks.selection_bench --compare before.json
+    python -m benchmarks.selection_bench --engine numpy --compare before.json
+"""
+
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.problem_service import ProblemService
+from app.services.selection_engine import ENGINES
+
+from .api_bench import percentile
+from .synthetic import DIFFICULTY_DISTRIBUTIONS, build_topics, generate_catalog, generate_exclusions
+
+
+@dataclass
+class Scenario:
+    """One benchmark configuration."""
+    catalog_size: int
+    topic_skew: float
+    difficulty_distribution: str
+    exclusion_size: int
+    target_difficulty: int
+    weak_topics: int
+    num_problems: int
+
+    @property
+    def name(self) -> str:
+        """Stable scenario key used in result files."""
+        return (
+            f"n={self.catalog_size} skew={self.topic_skew:g} dist={self.difficulty_distribution} "
+            f"excl={self.exclusion_size} target={self.target_difficulty} "
+            f"weak={self.weak_topics} k={self.num_problems}"
+        )
+
+
+class CallCounter:
+    """Counts calls to the selection helpers of a ProblemService instance."""
+
+    def __init__(self, service: ProblemService):
+        self.topic_lookups = 0
+        self.fallbacks = 0
+
+        select_for_topic = service._select_problem_for_topic
+        select_fallback = service._select_fallback_problems
+
+        def counted_select_for_topic(*args, **kwargs):
+            self.topic_lookups += 1
+            return select_for_topic(*args, **kwargs)
+
+        def counted_fallback(*args, **kwargs):
+            self.fallbacks += 1
+            return select_fallback(*args, **kwargs)
+
+        service._select_problem_for_topic = counted_select_for_topic
+        service._select_fallback_problems = counted_fallback
+
+
+def build_service(
+    size: int,
+    skew: float,
+    distribution: str,
+    seed: int,
+    engine: str = "python",
+) -> Tuple[ProblemService, List[Tuple[str, int]]]:
+    """Build a ProblemService over a synthetic catalog."""
+    service = ProblemService(problems_file="<synthetic>", selection_engine=engine)
+    service.load_records(generate_catalog(
+        size, topic_skew=skew, difficulty_distribution=distribution, seed=seed,
+    ))
+    problems = [(p.id, p.difficulty) for p in service.iter_problems()]
+    return service, problems
+
+
+def run_scenario(
+    service: ProblemService,
+    problems: List[Tuple[str, int]],
+    scenario: Scenario,
+    iterations: int,
+    seed: int,
+) -> Dict[str, Any]:
+    """
+    Time repeated contest selections for one scenario.
+
+    Returns:
+        Timing and call-count statistics
+    """
+    excluded = generate_exclusions(
+        problems, scenario.exclusion_size,
+        target_difficulty=scenario.target_difficulty, seed=seed,
+    )
+    weak_topics = build_topics(scenario.weak_topics)
+    # Contests are created with the user's cached exclusion bitset
+    excluded = service.exclusion_bitset(excluded)
+
+    counter = CallCounter(service)
+    random.seed(seed)
+    timings = []
+    short = 0
+
+    gc.collect()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        selected = service.select_problems_for_contest(
+            target_difficulty=scenario.target_difficulty,
+            num_problems=scenario.num_problems,
+            weak_topics=weak_topics,
+            excluded=excluded,
+        )
+        timings.append(time.perf_counter() - start)
+        if len(selected) < scenario.num_problems:
+            short += 1
+
+    # Undo the counting wrappers so the next scenario starts clean
+    del service._select_problem_for_topic
+    del service._select_fallback_problems
+
+    timings.sort()
+    return {
+        "scenario": asdict(scenario),
+        "iterations": iterations,
+        "mean_ms": round(sum(timings) / len(timings) * 1000, 4),
+        "p50_ms": round(percentile(timings, 50) * 1000, 4),
+        "p95_ms": round(percentile(timings, 95) * 1000, 4),
+        "max_ms": round(timings[-1] * 1000, 4),
+        "topic_lookups_per_call": round(counter.topic_lookups / iterations, 2),
+        "fallback_rate": round(counter.fallbacks / iterations, 3),
+        "short_rate": round(short / iterations, 3),
+    }
+
+
+def parse_list(value: str, cast) -> List:
+    """Parse a comma-separated command line list."""
+    return [cast(item) for item in value.split(",") if item.strip()]
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark contest problem selection")
+    parser.add_argument("--sizes", default="10000,100000",
+                        help="Catalog sizes (default: 10000,100000)")
+    parser.add_argument("--skews", default="0,1.2",
+                        help="Zipf topic skews (default: 0,1.2)")
+    parser.add_argument("--distributions", default="normal",
+                        help=f"Difficulty distributions, from {DIFFICULTY_DISTRIBUTIONS}")
+    parser.add_argument("--exclusions", default="0,1000,20000",
+                        help="Exclusion set sizes (default: 0,1000,20000)")
+    parser.add_argument("--targets", default="30,60,95",
+                        help="Target difficulties (default: 30,60,95)")
+    parser.add_argument("--weak-topics", type=int, default=2,
+                        help="Weak topics per user (default: 2)")
+    parser.add_argument("--num-problems", type=int, default=5,
+                        help="Problems per contest (default: 5)")
+    parser.add_argument("--iterations", type=int, default=50,
+                        help="Selections per scenario (default: 50)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--engine", choices=ENGINES, default="python",
+                        help="Selection engine (default: python)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Compare with results from an earlier --output run")
+    return parser.parse_args()
+
+
+def print_results(results: List[Dict[str, Any]], previous: Optional[Dict[str, Dict]]) -> None:
+    """Print a results table, with speedups if earlier results are given."""
+    header = f"{'Scenario':<78}{'p50 ms':>10}{'p95 ms':>10}{'lookups':>9}{'fallbk':>8}{'short':>7}"
+    if previous is not None:
+        header += f"{'speedup':>9}"
+
+    print("\n" + "=" * len(header))
+    print(header)
+    print("-" * len(header))
+
+    for result in results:
+        name = Scenario(**result["scenario"]).name
+        line = (
+            f"{name:<78}{result['p50_ms']:>10.3f}{result['p95_ms']:>10.3f}"
+            f"{result['topic_lookups_per_call']:>9.1f}{result['fallback_rate']:>8.2f}"
+            f"{result['short_rate']:>7.2f}"
+        )
+        if previous is not None:
+            before = previous.get(name)
+            if before and result["mean_ms"] > 0:
+                line += f"{before['mean_ms'] / result['mean_ms']:>8.2f}x"
+            else:
+                line += f"{'-':>9}"
+        print(line)
+
+    print("=" * len(header))
+
+
+def main() -> int:
+    """Run the selection benchmark."""
+    args = parse_args()
+
+    sizes = parse_list(args.sizes, int)
+    skews = parse_list(args.skews, float)
+    distributions = parse_list(args.distributions, str)
+    exclusions = parse_list(args.exclusions, int)
+    targets = parse_list(args.targets, int)
+
+    previous = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = {
+                Scenario(**r["scenario"]).name: r for r in json.load(f)["results"]
+            }
+
+    print("=" * 60)
+    print("PROBLEM SELECTION BENCHMARK")
+    print("=" * 60)
+    print(f"Engine: {args.engine}")
+
+    results = []
+    for size in sizes:
+        for skew in skews:
+            for distribution in distributions:
+                print(f"\n📚 Building catalog: {size} problems, skew {skew:g}, {distribution}...")
+                start = time.perf_counter()
+                service, problems = build_service(size, skew, distribution, args.seed, args.engine)
+                print(f"  Built in {time.perf_counter() - start:.1f}s")
+
+                for exclusion_size in exclusions:
+                    for target in targets:
+                        scenario = Scenario(
+                            catalog_size=size,
+                            topic_skew=skew,
+                            difficulty_distribution=distribution,
+                            exclusion_size=exclusion_size,
+                            target_difficulty=target,
+                            weak_topics=args.weak_topics,
+                            num_problems=args.num_problems,
+                        )
+                        result = run_scenario(service, problems, scenario,
+                                              args.iterations, args.seed)
+                        results.append(result)
+                        print(f"  ⏱️  {scenario.name}: p50 {result['p50_ms']:.3f} ms")
+
+                del service, problems
+                gc.collect()
+
+    print_results(results, previous)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"seed": args.seed, "engine": args.engine, "results": results}, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
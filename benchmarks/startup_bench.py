@@ -0,0 +1,191 @@
+"""
+Startup benchmark for the API server.
+
+Starts the app under uvicorn several times and measures, from the moment the
+process is spawned:
+
+    serving: until /health first answers 200 (the server accepts requests)
+    ready:   until /ready first answers 200 (database and catalog loaded)
+
+The first run starts against an empty database, so it includes creating the
+tables; later runs reuse it and show the warm path (schema version already
+current). The server's own phase timings from /ready are reported as well.
+
+Usage:
+    python -m benchmarks.startup_bench
+    python -m benchmarks.startup_bench --runs 10 --problems 100000
+    python -m benchmarks.startup_bench --database-url postgresql://...
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from .api_bench import REPO_ROOT, find_free_port
+
+# Seconds between polls of /health and /ready
+POLL_INTERVAL = 0.01
+
+
+def wait_for(client: httpx.Client, url: str, process: subprocess.Popen, deadline: float) -> Optional[httpx.Response]:
+    """Poll `url` until it answers 200. Returns the response, or None on timeout."""
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+        try:
+            response = client.get(url)
+            if response.status_code == 200:
+                return response
+        except httpx.HTTPError:
+            pass
+        time.sleep(POLL_INTERVAL)
+    return None
+
+
+def measure_startup(env: Dict[str, str], timeout: float, verbose: bool) -> Dict[str, Any]:
+    """Start uvicorn once and time it until it is serving and ready."""
+    port = find_free_port()
+    command = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+    ]
+    output = None if verbose else subprocess.DEVNULL
+    base_url = f"http://127.0.0.1:{port}"
+
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=REPO_ROOT, env=env, stdout=output, stderr=output)
+    try:
+        deadline = started + timeout
+        with httpx.Client(timeout=1.0) as client:
+            if wait_for(client, f"{base_url}/health", process, deadline) is None:
+                raise RuntimeError(f"uvicorn did not serve /health within {timeout}s")
+            serving = time.perf_counter() - started
+
+            response = wait_for(client, f"{base_url}/ready", process, deadline)
+            if response is None:
+                raise RuntimeError(f"/ready did not pass within {timeout}s")
+            ready = time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    report = response.json()
+    return {
+        "serving_s": round(serving, 3),
+        "ready_s": round(ready, 3),
+        "server_seconds_to_serving": report.get("seconds_to_serving"),
+        "phases": {name: phase.get("seconds") for name, phase in report.get("phases", {}).items()},
+    }
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """Median, min and max of a list of timings."""
+    return {
+        "median": round(statistics.median(values), 3),
+        "min": round(min(values), 3),
+        "max": round(max(values), 3),
+    }
+
+
+def print_runs(runs: List[Dict[str, Any]]) -> None:
+    """Print one line per run and the warm-run summary."""
+    phase_names = sorted({name for run in runs for name in run["phases"]})
+
+    print()
+    header = f"{'run':>4} {'serving':>9} {'ready':>9}" + "".join(f" {name:>10}" for name in phase_names)
+    print(header)
+    print("-" * len(header))
+    for i, run in enumerate(runs):
+        label = "cold" if i == 0 else str(i)
+        line = f"{label:>4} {run['serving_s']:>8.3f}s {run['ready_s']:>8.3f}s"
+        for name in phase_names:
+            seconds = run["phases"].get(name)
+            line += f" {seconds:>9.3f}s" if seconds is not None else f" {'-':>10}"
+        print(line)
+
+    warm = runs[1:]
+    if warm:
+        serving = summarize([run["serving_s"] for run in warm])
+        ready = summarize([run["ready_s"] for run in warm])
+        print()
+        print(f"Warm runs ({len(warm)}): serving median {serving['median']:.3f}s "
+              f"(min {serving['min']:.3f}s, max {serving['max']:.3f}s), "
+              f"ready median {ready['median']:.3f}s")
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Startup benchmark for the API server")
+    parser.add_argument("--runs", type=int, default=5,
+                        help="Server starts, including the first (cold) one (default: 5)")
+    parser.add_argument("--database-url", help="Database to start against (default: fresh SQLite file)")
+    parser.add_argument("--catalog", help="Use an existing catalog instead of a synthetic one")
+    parser.add_argument("--problems", type=int, default=20000,
+                        help="Synthetic catalog size (default: 20000)")
+    parser.add_argument("--timeout", type=float, default=120.0,
+                        help="Seconds to wait for each start (default: 120)")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show application output")
+    return parser.parse_args()
+
+
+def main() -> int:
+    """Run the benchmark."""
+    args = parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="mastercp-startup-")
+    database_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'startup.db')}"
+
+    print("=" * 60)
+    print("MASTERCP STARTUP BENCHMARK")
+    print("=" * 60)
+
+    try:
+        if args.catalog:
+            catalog_path = os.path.abspath(args.catalog)
+        else:
+            from .synthetic import write_synthetic_catalog
+
+            catalog_path = os.path.join(workdir, "catalog.jsonl.gz")
+            print(f"📚 Generating synthetic catalog ({args.problems} problems)...")
+            write_synthetic_catalog(catalog_path, args.problems)
+
+        env = os.environ.copy()
+        env.update({
+            "DATABASE_URL": database_url,
+            "PROBLEMS_FILE": catalog_path,
+            "MODEL_CATALOG_FILE": os.path.join(workdir, "model_catalog.json"),
+        })
+
+        runs = []
+        for i in range(args.runs):
+            print(f"🚀 Start {i + 1}/{args.runs}...")
+            runs.append(measure_startup(env, args.timeout, args.verbose))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_runs(runs)
+
+    if args.output:
+        result = {
+            "runs": runs,
+            "catalog": "file" if args.catalog else f"synthetic:{args.problems}",
+            "database": "postgresql" if database_url.startswith("postgres") else "sqlite",
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+"""
+Synthetic data for benchmarks.
+
+Generates problem catalogs in the standardized catalog format and seeds a
+database with users who have a realistic amount of history. Everything is
+driven by an explicit seed, so runs are reproducible.
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterator, List, Optional, Sequence, Set, Tuple
+
+from app.catalog_io import write_catalog
+from app.services.problem_service import ProblemService
+
+# Difficulty distributions supported by generate_catalog
+DIFFICULTY_DISTRIBUTIONS = ["uniform", "normal", "easy", "hard"]
+
+
+def build_topics(num_topics: int) -> List[str]:
+    """Return topic names: the core topics first, then synthetic ones."""
+    topics = list(ProblemService.CORE_TOPICS[:num_topics])
+    for i in range(len(topics), num_topics):
+        topics.append(f"synthetic_topic_{i}")
+    return topics
+
+
+def zipf_weights(count: int, skew: float) -> List[float]:
+    """Zipf weights for `count` ranks (skew 0 gives a uniform distribution)."""
+    return [1.0 / ((rank + 1) ** skew) for rank in range(count)]
+
+
+def sample_difficulty(rng: random.Random, distribution: str) -> int:
+    """Draw a problem difficulty on the 1-100 scale."""
+    if distribution == "uniform":
+        value = rng.uniform(1, 100)
+    elif distribution == "normal":
+        value = rng.gauss(50, 18)
+    elif distribution == "easy":
+        value = rng.betavariate(2, 5) * 100
+    elif distribution == "hard":
+        value = rng.betavariate(5, 2) * 100
+    else:
+        raise ValueError(f"Unknown difficulty distribution: {distribution}")
+    return max(1, min(100, int(round(value))))
+
+
+def generate_catalog(
+    num_problems: int,
+    num_topics: int = len(ProblemService.CORE_TOPICS),
+    topic_skew: float = 1.0,
+    difficulty_distribution: str = "normal",
+    seed: int = 42,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Generate synthetic problem records.
+
+    Args:
+        num_problems: Number of problems to generate
+        num_topics: Number of distinct topics
+        topic_skew: Zipf exponent for topic popularity (0 = uniform)
+        difficulty_distribution: One of DIFFICULTY_DISTRIBUTIONS
+        seed: Random seed
+
+    Returns:
+        Iterator of catalog records (same shape as standardized_problems)
+    """
+    rng = random.Random(seed)
+    topics = build_topics(num_topics)
+
+    cum_weights = []
+    total = 0.0
+    for weight in zipf_weights(len(topics), topic_skew):
+        total += weight
+        cum_weights.append(total)
+
+    chunk_size = 10000
+    for start in range(0, num_problems, chunk_size):
+        count = min(chunk_size, num_problems - start)
+        chunk_topics = rng.choices(topics, cum_weights=cum_weights, k=count)
+
+        for offset, topic in enumerate(chunk_topics):
+            i = start + offset
+            yield {
+                "id": f"SYN{i}",
+                "name": f"Synthetic Problem {i}",
+                "url": f"https://example.com/problems/{i}",
+                "source": "synthetic",
+                "internal_rating": sample_difficulty(rng, difficulty_distribution),
+                "primary_skills": [],
+                "secondary_skills": [],
+                "pattern_id": topic,
+                "tags": [topic],
+            }
+
+
+def write_synthetic_catalog(path: str, num_problems: int, seed: int = 42, **options) -> int:
+    """Write a synthetic catalog file and return the number of problems written."""
+    def metadata():
+        return {"synthetic": True, "seed": seed, **options}
+
+    records = generate_catalog(num_problems, seed=seed, **options)
+    return write_catalog(path, records, metadata_factory=metadata)
+
+
+def generate_exclusions(
+    problems: Sequence[Tuple[str, int]],
+    size: int,
+    target_difficulty: Optional[int] = None,
+    spread: int = 15,
+    seed: int = 42,
+) -> Set[str]:
+    """
+    Pick a set of problem IDs a user has already attempted.
+
+    Real users mostly attempt problems near their own level, so when a target
+    difficulty is given, three quarters of the set is drawn from problems
+    within `spread` of it.
+
+    Args:
+        problems: (problem_id, difficulty) pairs
+        size: Number of problem IDs to return (capped at the catalog size)
+        target_difficulty: Difficulty the exclusions cluster around (optional)
+        spread: Width of the cluster around the target
+        seed: Random seed
+
+    Returns:
+        Set of problem IDs
+    """
+    rng = random.Random(seed)
+    size = min(size, len(problems))
+    excluded: Set[str] = set()
+
+    if target_difficulty is not None:
+        nearby = [pid for pid, d in problems if abs(d - target_difficulty) <= spread]
+        near_count = min(len(nearby), (size * 3) // 4)
+        excluded.update(rng.sample(nearby, near_count))
+
+    while len(excluded) < size:
+        excluded.add(problems[rng.randrange(len(problems))][0])
+
+    return excluded
+
+
+def seed_user_base(
+    db,
+    problems: Sequence[Tuple[str, int]],
+    num_users: int,
+    history_size: int = 100,
+    prefix: str = "bench",
+    seed: int = 42,
+) -> List[int]:
+    """
+    Insert users with problem history, topic ratings and weak topics.
+
+    Args:
+        db: Database session
+        problems: (problem_id, difficulty) pairs from the catalog
+        num_users: Number of users to create
+        history_size: Problem history rows per user
+        prefix: Username prefix (keeps runs against a shared database apart)
+        seed: Random seed
+
+    Returns:
+        IDs of the created users
+    """
+    from app.models import ProblemHistory, User, UserTopicRating, WeakTopic
+
+    rng = random.Random(seed)
+    topics = list(ProblemService.CORE_TOPICS)
+    now = datetime.utcnow()
+
+    users = [
+        User(
+            username=f"{prefix}_seed_{i}",
+            rating=rng.randint(10, 80),
+            total_contests=rng.randint(0, 50),
+        )
+        for i in range(num_users)
+    ]
+    db.add_all(users)
+    db.flush()
+
+    history_rows = []
+    topic_rows = []
+    weak_rows = []
+
+    for user in users:
+        excluded = generate_exclusions(
+            problems,
+            history_size,
+            target_difficulty=user.rating + 10,
+            seed=rng.randrange(1 << 30),
+        )
+        for problem_id in excluded:
+            solved = rng.random() < 0.6
+            history_rows.append({
+                "user_id": user.id,
+                "problem_id": problem_id,
+                "last_attempted_at": now - timedelta(days=rng.uniform(0, 60)),
+                "times_attempted": 1,
+                "times_solved": 1 if solved else 0,
+                "best_time_seconds": rng.randint(300, 5400) if solved else None,
+            })
+
+        for topic in rng.sample(topics, min(len(topics), 8)):
+            topic_rows.append({
+                "user_id": user.id,
+                "topic": topic,
+                "rating": max(1, min(100, user.rating + rng.randint(-15, 15))),
+                "problems_solved": rng.randint(0, 30),
+                "problems_attempted": rng.randint(30, 60),
+            })
+
+        for topic in rng.sample(topics, rng.randint(0, 2)):
+            weak_rows.append({
+                "user_id": user.id,
+                "topic": topic,
+                "current_level": max(1, user.rating - 10),
+                "target_level": user.rating + 10,
+                "is_active": True,
+            })
+
+    if history_rows:
+        db.bulk_insert_mappings(ProblemHistory, history_rows)
+    if topic_rows:
+        db.bulk_insert_mappings(UserTopicRating, topic_rows)
+    if weak_rows:
+        db.bulk_insert_mappings(WeakTopic, weak_rows)
+
+    db.commit()
+    return [user.id for user in users]
@@ -4,10 +4,25 @@ Database Migration Script
 
 Migrates data from SQLite to PostgreSQL (Neon) or initializes fresh Neon database.
 Supports full data migration from existing SQLite database.
+
+Data is copied in bulk with PostgreSQL COPY, tables in the same foreign-key
+level run in parallel, and finished tables are checkpointed so an interrupted
+run can continue with --resume. Use --row-by-row for the old INSERT path.
+
+Testing against a local PostgreSQL:
+    DATABASE_SSLMODE=disable python migrate_to_neon.py \\
+        --sqlite-path ./mastercp.db --database-url postgresql://localhost/mastercp --yes
 """
 
+import argparse
+import io
+import json
 import os
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -37,11 +52,17 @@ def check_neon_url():
     return db_url
 
 
-def get_sqlite_engine():
+# Bulk migration defaults
+BULK_BATCH_SIZE = 5000
+BULK_WORKERS = 4
+CHECKPOINT_FILE = Path(__file__).parent / ".migration_checkpoint.json"
+
+
+def get_sqlite_engine(sqlite_path=None):
     """Create SQLite engine for reading existing data."""
     from sqlalchemy import create_engine
 
-    sqlite_path = Path(__file__).parent / "mastercp.db"
+    sqlite_path = Path(sqlite_path) if sqlite_path else Path(__file__).parent / "mastercp.db"
     if not sqlite_path.exists():
         return None
 
@@ -179,6 +200,240 @@ def migrate_data(sqlite_engine, pg_engine):
     return total_rows_migrated
 
 
+def get_table_levels(metadata, table_names):
+    """
+    Group tables into dependency levels using their foreign keys.
+
+    Tables in the same level only reference tables from earlier levels,
+    so they can be copied in parallel once the earlier levels are done.
+    """
+    remaining = [name for name in table_names if name in metadata.tables]
+    levels = []
+
+    while remaining:
+        level = []
+        for name in remaining:
+            parents = {
+                fk.column.table.name
+                for fk in metadata.tables[name].foreign_keys
+                if fk.column.table.name != name
+            }
+            if parents.issubset(set(metadata.tables) - set(remaining)):
+                level.append(name)
+
+        if not level:
+            # Circular references: fall back to the given order
+            level = remaining[:1]
+
+        levels.append(level)
+        remaining = [name for name in remaining if name not in level]
+
+    return levels
+
+
+def _copy_text_value(value):
+    """Format a Python value for PostgreSQL COPY text format."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        # bytea hex format; the backslash itself must be escaped for COPY
+        return "\\\\x" + bytes(value).hex()
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def load_checkpoint(checkpoint_path, source):
+    """Load completed tables from a checkpoint written for the same source."""
+    if not checkpoint_path or not Path(checkpoint_path).exists():
+        return {}
+
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    if data.get("source") != source:
+        print(f"ℹ️  Ignoring checkpoint for a different source ({data.get('source')})")
+        return {}
+
+    return data.get("completed", {})
+
+
+def save_checkpoint(checkpoint_path, source, completed):
+    """Atomically record the tables that have been fully migrated."""
+    if not checkpoint_path:
+        return
+
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"source": source, "completed": completed}, f, indent=2)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def copy_table(sqlite_engine, pg_engine, table, batch_size=BULK_BATCH_SIZE, report=print):
+    """
+    Copy one table from SQLite to PostgreSQL with COPY FROM STDIN.
+
+    Rows are streamed from SQLite in batches and each batch is sent as one
+    COPY, all inside a single PostgreSQL transaction per table.
+
+    Returns:
+        Number of rows copied
+    """
+    from sqlalchemy import func, inspect, select
+
+    pg_columns = {c["name"] for c in inspect(pg_engine).get_columns(table.name)}
+    columns = [c for c in table.columns if c.name in pg_columns]
+    column_list = ", ".join(f'"{c.name}"' for c in columns)
+    copy_sql = f'COPY "{table.name}" ({column_list}) FROM STDIN'
+
+    with sqlite_engine.connect() as sqlite_conn:
+        total = sqlite_conn.execute(select(func.count()).select_from(table)).scalar()
+
+        raw_conn = pg_engine.raw_connection()
+        try:
+            cursor = raw_conn.cursor()
+            cursor.execute(f'TRUNCATE TABLE "{table.name}" CASCADE')
+
+            query = select(*columns)
+            if table.primary_key.columns:
+                query = query.order_by(*table.primary_key.columns)
+            result = sqlite_conn.execution_options(stream_results=True).execute(query)
+
+            copied = 0
+            started = time.monotonic()
+            while True:
+                rows = result.fetchmany(batch_size)
+                if not rows:
+                    break
+
+                buffer = io.StringIO()
+                for row in rows:
+                    buffer.write("\t".join(_copy_text_value(v) for v in row))
+                    buffer.write("\n")
+                buffer.seek(0)
+                cursor.copy_expert(copy_sql, buffer)
+
+                copied += len(rows)
+                elapsed = max(time.monotonic() - started, 1e-6)
+                report(
+                    f"  ⏳ {table.name}: {copied}/{total} rows "
+                    f"({copied / elapsed:,.0f} rows/s)"
+                )
+
+            # Reset sequence for tables with auto-increment
+            if "id" in table.columns:
+                cursor.execute(
+                    f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                    f'COALESCE((SELECT MAX(id) FROM "{table.name}"), 1))'
+                )
+
+            raw_conn.commit()
+        except Exception:
+            raw_conn.rollback()
+            raise
+        finally:
+            raw_conn.close()
+
+    return copied
+
+
+def migrate_data_bulk(
+    sqlite_engine,
+    pg_engine,
+    batch_size=BULK_BATCH_SIZE,
+    workers=BULK_WORKERS,
+    checkpoint_path=CHECKPOINT_FILE,
+    resume=False,
+):
+    """
+    Migrate data from SQLite to PostgreSQL using COPY.
+
+    Tables are copied level by level in foreign-key order; tables within a
+    level run in parallel. Each finished table is written to a checkpoint so
+    an interrupted migration can resume from the first unfinished table.
+    """
+    from sqlalchemy import MetaData, inspect
+
+    print("\n" + "=" * 60)
+    print("BULK MIGRATING DATA FROM SQLITE TO POSTGRESQL (COPY)")
+    print("=" * 60)
+
+    sqlite_meta = MetaData()
+    sqlite_meta.reflect(bind=sqlite_engine)
+
+    pg_tables = set(inspect(pg_engine).get_table_names())
+    for name in sqlite_meta.tables:
+        if name not in pg_tables:
+            print(f"⏭️  Skipping {name} (not in PostgreSQL)")
+
+    source = str(sqlite_engine.url)
+    completed = load_checkpoint(checkpoint_path, source) if resume else {}
+    if completed:
+        print(f"↩️  Resuming; already migrated: {', '.join(completed)}")
+    else:
+        save_checkpoint(checkpoint_path, source, completed)
+
+    levels = get_table_levels(
+        sqlite_meta, [name for name in sqlite_meta.tables if name in pg_tables]
+    )
+    print_lock = threading.Lock()
+    checkpoint_lock = threading.Lock()
+
+    def report(message):
+        with print_lock:
+            print(message)
+
+    def migrate_table(table_name):
+        rows = copy_table(
+            sqlite_engine,
+            pg_engine,
+            sqlite_meta.tables[table_name],
+            batch_size=batch_size,
+            report=report,
+        )
+        with checkpoint_lock:
+            completed[table_name] = rows
+            save_checkpoint(checkpoint_path, source, completed)
+        report(f"  ✅ Migrated {rows} rows to {table_name}")
+        return rows
+
+    started = time.monotonic()
+    for level in levels:
+        pending = [name for name in level if name not in completed]
+        for name in level:
+            if name in completed:
+                print(f"⏭️  Skipping {name} (checkpointed, {completed[name]} rows)")
+        if not pending:
+            continue
+
+        print(f"\n📦 Migrating {', '.join(pending)}...")
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pending)))) as pool:
+            # list() re-raises the first failure after the level finishes
+            list(pool.map(migrate_table, pending))
+
+    total_rows_migrated = sum(completed.values())
+    elapsed = time.monotonic() - started
+    print(f"\n✅ Total rows migrated: {total_rows_migrated} in {elapsed:.1f}s")
+
+    if checkpoint_path and Path(checkpoint_path).exists():
+        os.remove(checkpoint_path)
+
+    return total_rows_migrated
+
+
 def initialize_neon_database():
     """Initialize Neon database tables."""
     print("\n" + "=" * 60)
@@ -210,8 +465,26 @@ def initialize_neon_database():
         return False, None
 
 
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Migrate MasterCP data from SQLite to PostgreSQL")
+    parser.add_argument("--sqlite-path", help="SQLite database to migrate (default: ./mastercp.db)")
+    parser.add_argument("--database-url", help="Target PostgreSQL URL (default: DATABASE_URL from .env)")
+    parser.add_argument("--yes", "-y", action="store_true", help="Migrate without asking for confirmation")
+    parser.add_argument("--resume", action="store_true", help="Resume from the last migration checkpoint")
+    parser.add_argument("--workers", type=int, default=BULK_WORKERS, help="Tables copied in parallel per dependency level")
+    parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE, help="Rows per COPY batch")
+    parser.add_argument("--row-by-row", action="store_true", help="Use the slow INSERT-per-row migration")
+    parser.add_argument("--skip-verify", action="store_true", help="Skip checksum verification after migrating")
+    return parser.parse_args()
+
+
 def main():
     """Main migration flow."""
+    args = parse_args()
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+
     print("\n🔄 MasterCP Database Migration Tool")
     print("=" * 60)
 
@@ -233,7 +506,7 @@ def main():
 
     # Step 2: Check for existing SQLite database
     print("\n📋 Step 2: Checking for existing SQLite database...")
-    sqlite_engine = get_sqlite_engine()
+    sqlite_engine = get_sqlite_engine(args.sqlite_path)
     has_sqlite_data = False
     sqlite_tables = []
     sqlite_counts = {}
@@ -286,16 +559,37 @@ def main():
             print("⚠️  WARNING: Neon database already has data!")
             print("   Migrating will REPLACE all existing data in Neon.")
 
-        response = input("\nMigrate data from SQLite to Neon? [y/N]: ").strip().lower()
+        if args.yes:
+            response = "y"
+        else:
+            response = input("\nMigrate data from SQLite to Neon? [y/N]: ").strip().lower()
 
         if response == "y":
             try:
-                migrate_data(sqlite_engine, pg_engine)
+                if args.row_by_row:
+                    migrate_data(sqlite_engine, pg_engine)
+                else:
+                    migrate_data_bulk(
+                        sqlite_engine,
+                        pg_engine,
+                        batch_size=args.batch_size,
+                        workers=args.workers,
+                        resume=args.resume,
+                    )
+
+                if not args.skip_verify:
+                    from verify_migration import print_report, verify_migration
+
+                    if not print_report(verify_migration(sqlite_engine, pg_engine)):
+                        print("\n❌ Verification found differences between SQLite and Neon")
+                        return 1
             except Exception as e:
                 print(f"\n❌ Migration failed: {e}")
                 import traceback
 
                 traceback.print_exc()
+                if not args.row_by_row:
+                    print("\nRe-run with --resume to continue from the last completed table.")
                 return 1
         else:
             print("\nSkipping data migration. Fresh database initialized.")
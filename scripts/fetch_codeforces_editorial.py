@@ -15,11 +15,17 @@ import argparse
 import os
 import re
 import sys
-from typing import Optional, Tuple
-from bs4 import BeautifulSoup
+from pathlib import Path
+from typing import Dict, Optional, Tuple
 import requests
 from dotenv import load_dotenv
 
+# Add repository root to path (for the app package)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Page parsing is shared with the app's background prefetcher
+from app.services.editorial_prefetcher import extract_editorial_text, find_editorial_link  # noqa: E402
+
 # Load environment variables
 load_dotenv()
 
@@ -38,6 +44,10 @@ class CodeforcesEditorialFetcher:
         """
         self.cookies = cookies or os.getenv("CODEFORCES_COOKIES", "")
         self.session = self._create_session()
+        # Problems of one contest share an editorial page, so lookups and
+        # fetched pages are cached for the lifetime of the fetcher
+        self._editorial_urls: Dict[int, Optional[str]] = {}
+        self._editorial_pages: Dict[str, str] = {}
     
     def _create_session(self) -> requests.Session:
         """Create a requests session with appropriate headers and cookies."""
@@ -78,6 +88,15 @@ class CodeforcesEditorialFetcher:
         Returns:
             Editorial URL if found, None otherwise
         """
+        if contest_id in self._editorial_urls:
+            return self._editorial_urls[contest_id]
+
+        editorial_url = self._find_editorial_url(contest_id)
+        self._editorial_urls[contest_id] = editorial_url
+        return editorial_url
+
+    def _find_editorial_url(self, contest_id: int) -> Optional[str]:
+        """Look up the editorial URL of a contest on Codeforces."""
         # Try to get the contest page
         contest_url = f"{self.BASE_URL}/contest/{contest_id}"
         
@@ -85,15 +104,11 @@ class CodeforcesEditorialFetcher:
             response = self.session.get(contest_url, timeout=10)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
             # Look for tutorial/editorial link
             # Codeforces usually has a "Tutorial" link in the contest page
-            tutorial_links = soup.find_all('a', href=re.compile(r'/blog/entry/\d+'))
-            
-            if tutorial_links:
-                editorial_path = tutorial_links[0]['href']
-                return f"{self.BASE_URL}{editorial_path}"
+            editorial_url = find_editorial_link(response.text, contest_url)
+            if editorial_url:
+                return editorial_url
             
             # Alternative: Try common editorial URL pattern
             # Sometimes editorials are at /contest/{id}/tutorial
@@ -118,6 +133,17 @@ class CodeforcesEditorialFetcher:
         Returns:
             Tuple of (success, content)
         """
+        if url in self._editorial_pages:
+            return True, self._editorial_pages[url]
+
+        success, content = self._fetch_editorial(url, debug)
+        if success:
+            # Failures are not cached, they may be temporary
+            self._editorial_pages[url] = content
+        return success, content
+
+    def _fetch_editorial(self, url: str, debug: bool = False) -> Tuple[bool, str]:
+        """Download an editorial page and extract its text."""
         try:
             if debug:
                 print(f"DEBUG: Fetching URL: {url}", file=sys.stderr)
@@ -142,29 +168,9 @@ class CodeforcesEditorialFetcher:
             
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.text, 'html.parser')
+            content = extract_editorial_text(response.text)
             
-            # Try multiple selectors for Codeforces content
-            selectors = [
-                ('div', {'class': 'ttypography'}),
-                ('div', {'class': 'content'}),
-                ('div', {'class': 'topic-text'}),
-                ('div', {'id': 'pageContent'}),
-                ('article', {}),
-            ]
-            
-            content_div = None
-            for tag, attrs in selectors:
-                content_div = soup.find(tag, attrs)
-                if content_div:
-                    if debug:
-                        print(f"DEBUG: Found content with selector: {tag} {attrs}", file=sys.stderr)
-                    break
-            
-            if content_div:
-                # Extract text content
-                content = content_div.get_text(separator='\n', strip=True)
-                
+            if content:
                 if debug:
                     print(f"DEBUG: Extracted {len(content)} characters", file=sys.stderr)
                     print(f"DEBUG: First 200 chars: {content[:200]}", file=sys.stderr)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Codeforces Editorial Prefetcher
+
+Fetches official Codeforces editorials ahead of time and stores them in the
+shared editorial store, so reflections can use them without the user pasting
+anything. Problems are grouped by contest, so each editorial page is
+downloaded only once however many of its problems are prefetched. Identical
+editorial texts are stored once (deduplicated by content hash).
+
+Usage:
+    python scripts/prefetch_editorials.py --contest 2191 2192
+    python scripts/prefetch_editorials.py --from-contests
+    python scripts/prefetch_editorials.py --from-catalog --limit 200 --delay 3
+"""
+
+import argparse
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+# Add repository root to path (for the app package) and this directory
+# (for the fetcher)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fetch_codeforces_editorial import CodeforcesEditorialFetcher  # noqa: E402
+
+from app.database import SessionLocal, init_db  # noqa: E402
+from app.models import ContestProblem  # noqa: E402
+from app.services.editorial_prefetcher import parse_codeforces_id  # noqa: E402
+from app.services.editorial_store import get_editorial_store  # noqa: E402
+from app.services.problem_service import get_problem_service  # noqa: E402
+
+def group_by_contest(problem_ids: Iterable[str]) -> Dict[int, List[str]]:
+    """Group Codeforces problem IDs by contest, skipping other sources."""
+    contests: Dict[int, List[str]] = defaultdict(list)
+    for problem_id in problem_ids:
+        parsed = parse_codeforces_id(problem_id)
+        if parsed is None:
+            continue
+        contest_id, _ = parsed
+        if problem_id not in contests[contest_id]:
+            contests[contest_id].append(problem_id)
+    return contests
+
+
+def problems_from_contests(db) -> List[str]:
+    """Problem IDs that appear in user contests (most recent first)."""
+    rows = (
+        db.query(ContestProblem.problem_id)
+        .filter(ContestProblem.source == "codeforces")
+        .order_by(ContestProblem.id.desc())
+        .all()
+    )
+    return [row.problem_id for row in rows]
+
+
+def problems_from_catalog() -> List[str]:
+    """All Codeforces problem IDs in the catalog."""
+    return [p.id for p in get_problem_service().iter_problems() if p.id.startswith("cf-")]
+
+
+def prefetch(
+    contests: Dict[int, List[str]],
+    fetcher: CodeforcesEditorialFetcher,
+    refresh: bool = False,
+    delay: float = 2.0,
+) -> Dict[str, int]:
+    """
+    Fetch and store editorials for the given problems.
+
+    Args:
+        contests: Problem IDs grouped by contest ID
+        fetcher: Editorial fetcher (caches pages per contest)
+        refresh: Fetch again even if a problem already has an editorial
+        delay: Seconds to wait between contests (be polite to Codeforces)
+
+    Returns:
+        Counts of stored, skipped and failed problems
+    """
+    store = get_editorial_store()
+    stats = {"stored": 0, "skipped": 0, "failed": 0}
+    db = SessionLocal()
+
+    try:
+        for index, (contest_id, problem_ids) in enumerate(contests.items()):
+            pending = [
+                problem_id for problem_id in problem_ids
+                if refresh or not store.has_problem(db, problem_id, include_user=False)
+            ]
+            stats["skipped"] += len(problem_ids) - len(pending)
+            if not pending:
+                continue
+
+            if index and delay > 0:
+                time.sleep(delay)
+
+            print(f"📥 Contest {contest_id}: {len(pending)} problem(s)")
+            for problem_id in pending:
+                _, letter = parse_codeforces_id(problem_id)
+                success, content, editorial_url = fetcher.get_editorial_for_problem(contest_id, letter)
+
+                if not success or not content.strip():
+                    print(f"  ❌ {problem_id}: {content.splitlines()[0] if content else 'empty editorial'}")
+                    stats["failed"] += 1
+                    continue
+
+                editorial = store.put(
+                    db,
+                    content,
+                    problem_id=problem_id,
+                    source_url=editorial_url,
+                    source="codeforces",
+                )
+                db.commit()
+                stats["stored"] += 1
+                print(f"  ✅ {problem_id}: editorial #{editorial.id} ({editorial.content_length} chars)")
+    finally:
+        db.close()
+
+    return stats
+
+
+def main() -> int:
+    """Main CLI interface."""
+    parser = argparse.ArgumentParser(description="Prefetch Codeforces editorials into the editorial store")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--contest", type=int, nargs="+", help="Contest IDs to prefetch")
+    source.add_argument("--from-contests", action="store_true",
+                        help="Prefetch problems that appear in user contests")
+    source.add_argument("--from-catalog", action="store_true",
+                        help="Prefetch every Codeforces problem in the catalog")
+    parser.add_argument("--limit", type=int, help="Maximum number of contests to fetch")
+    parser.add_argument("--delay", type=float, default=2.0,
+                        help="Seconds between contests (default: 2)")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Fetch again even if an editorial is already stored")
+    parser.add_argument("--cookies", help="Codeforces cookies (overrides env var)")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("CODEFORCES EDITORIAL PREFETCH")
+    print("=" * 60)
+
+    init_db()
+
+    if args.contest:
+        catalog = group_by_contest(problems_from_catalog())
+        contests = {contest_id: catalog.get(contest_id, []) for contest_id in args.contest}
+        for contest_id, problem_ids in contests.items():
+            if not problem_ids:
+                print(f"⚠️  Contest {contest_id} has no problems in the catalog")
+    elif args.from_contests:
+        db = SessionLocal()
+        try:
+            contests = group_by_contest(problems_from_contests(db))
+        finally:
+            db.close()
+    else:
+        contests = group_by_contest(problems_from_catalog())
+
+    if args.limit:
+        contests = dict(list(contests.items())[: args.limit])
+
+    total = sum(len(ids) for ids in contests.values())
+    print(f"📚 {total} problem(s) in {len(contests)} contest(s)")
+
+    fetcher = CodeforcesEditorialFetcher(cookies=args.cookies)
+    stats = prefetch(contests, fetcher, refresh=args.refresh, delay=args.delay)
+
+    print("\n" + "=" * 60)
+    print(f"✅ Stored:  {stats['stored']}")
+    print(f"⏭️  Skipped: {stats['skipped']} (already stored)")
+    print(f"❌ Failed:  {stats['failed']}")
+    print("=" * 60)
+
+    return 0 if stats["stored"] or not stats["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Multi-worker server launcher with a shared problem catalog.
+
+Builds the problem catalog index once in this (master) process, places it in
+a shared memory segment and starts uvicorn with the given number of workers.
+Each worker attaches the segment read-only (via CATALOG_SHM_NAME) instead of
+loading its own copy of the catalog, so adding workers adds almost no
+catalog memory. The segment is removed when the server stops.
+
+Usage:
+    python scripts/serve.py --workers 4
+    python scripts/serve.py --workers 2 --host 0.0.0.0 --port $PORT
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add repository root to path (for the app package)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import uvicorn  # noqa: E402
+
+from app.catalog_io import iter_catalog  # noqa: E402
+from app.services.problem_service import ProblemService  # noqa: E402
+from app.services.shared_catalog import build_catalog, create_shared_catalog  # noqa: E402
+
+
+def main() -> int:
+    """Main CLI interface."""
+    parser = argparse.ArgumentParser(description="Run the API with a catalog shared between workers")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="Port (default: 8000)")
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes (default: 2)")
+    parser.add_argument("--catalog", help="Catalog file (default: PROBLEMS_FILE or output/)")
+    parser.add_argument("--log-level", default="info", help="uvicorn log level (default: info)")
+    args = parser.parse_args()
+
+    # Workers must load the file themselves if the segment is missing, so
+    # use the same catalog path for both
+    service = ProblemService(problems_file=args.catalog, shared_name="")
+    if not os.path.exists(service.problems_file):
+        print(f"❌ Problems file not found: {service.problems_file}")
+        return 1
+    os.environ["PROBLEMS_FILE"] = os.path.abspath(service.problems_file)
+
+    print(f"📚 Building shared catalog from {service.problems_file}...")
+    start = time.perf_counter()
+    buffer = build_catalog(service.iter_catalog_entries(iter_catalog(service.problems_file)))
+    shm = create_shared_catalog(buffer, name=f"mastercp-catalog-{os.getpid()}")
+    del buffer
+    print(f"✅ Catalog in shared memory '{shm.name}' "
+          f"({shm.size / 1e6:.1f} MB, {time.perf_counter() - start:.2f}s)")
+
+    # Workers inherit the environment and attach the segment by name
+    os.environ["CATALOG_SHM_NAME"] = shm.name
+
+    try:
+        print(f"🚀 Starting uvicorn with {args.workers} worker(s) on {args.host}:{args.port}")
+        uvicorn.run(
+            "app.main:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            log_level=args.log_level,
+        )
+    finally:
+        shm.close()
+        shm.unlink()
+        print(f"🧹 Removed shared catalog '{shm.name}'")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,19 +19,26 @@ MAPPING PHILOSOPHY:
 - 51-75: Advanced (complex algorithms)
 - 76-100: Expert (competition-level hard)
 
+OUTPUT:
+- output/standardized_problems.jsonl.gz, a streaming JSON Lines catalog (see app/catalog_io.py)
+- Use --output with a .jsonl or .jsonl.zst path for other compressions
+
 TUNING GUIDE:
 - Edit the *_MAPPING dictionaries to adjust difficulty mappings
 - Edit SKILL_PRIORITY to change which tags are prioritized
 - Edit PATTERN_KEYWORDS to map tags to pattern IDs
 """
 
+import argparse
 import json
 import os
 import re
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 from dataclasses import dataclass, asdict
 from enum import Enum
 
+from app.catalog_io import iter_catalog, write_catalog
+
 # =============================================================================
 # CONFIGURATION - EDIT THESE TO TUNE MAPPINGS
 # =============================================================================
@@ -745,19 +752,61 @@ def load_json(filepath: str) -> Optional[Dict]:
     return None
 
 
-def main():
-    print("=" * 60)
-    print("Problem Difficulty Standardization")
-    print("=" * 60)
+class CatalogStatistics:
+    """Statistics accumulated while problems stream through the pipeline."""
 
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    output_dir = os.path.join(script_dir, "output")
+    RATING_RANGES = [
+        (25, "1-25 (Beginner)"),
+        (50, "26-50 (Intermediate)"),
+        (75, "51-75 (Advanced)"),
+        (100, "76-100 (Expert)"),
+    ]
 
-    all_problems: List[StandardizedProblem] = []
-    validator = ValidationError()
+    def __init__(self):
+        self.total = 0
+        self.by_source: Dict[str, int] = {}
+        self.by_rating_range: Dict[str, int] = {name: 0 for _, name in self.RATING_RANGES}
+
+    def add(self, problem: StandardizedProblem) -> None:
+        self.total += 1
+        self.by_source[problem.source] = self.by_source.get(problem.source, 0) + 1
+
+        for upper, name in self.RATING_RANGES:
+            if problem.internal_rating <= upper or upper == 100:
+                self.by_rating_range[name] += 1
+                break
+
+    def metadata(self) -> Dict[str, Any]:
+        return {
+            "total_problems": self.total,
+            "sources": list(self.by_source.keys()),
+            "rating_distribution": self.by_rating_range,
+        }
+
+    def report(self) -> None:
+        print("\n" + "=" * 60)
+        print("Statistics")
+        print("=" * 60)
+
+        print(f"\nTotal problems: {self.total}")
+        print("\nBy source:")
+        for source, count in sorted(self.by_source.items()):
+            print(f"  {source}: {count}")
+
+        print("\nBy internal rating range:")
+        for range_name, count in self.by_rating_range.items():
+            print(f"  {range_name}: {count}")
 
+
+def iter_standardized_problems(output_dir: str, validator: ValidationError) -> Iterator[StandardizedProblem]:
+    """
+    Yield standardized problems from all platform files, one at a time.
+
+    Each input file is still parsed as a whole, but only one platform file is
+    held in memory at a time and standardized problems are never accumulated.
+    """
     # -------------------------------------------------------------------------
-    # Load and process USACO Guide problems
+    # USACO Guide problems
     # -------------------------------------------------------------------------
     print("\nProcessing USACO Guide problems...")
 
@@ -766,19 +815,17 @@ def main():
         data = load_json(filepath)
 
         if data:
-            modules = data.get("modules", [])
             count = 0
-            for module in modules:
+            for module in data.get("modules", []):
                 for problem in module.get("problems", []):
-                    std_problem = process_usaco_problem(problem, module, division, validator)
-                    all_problems.append(std_problem)
+                    yield process_usaco_problem(problem, module, division, validator)
                     count += 1
             print(f"  {division.capitalize()}: {count} problems")
         else:
             print(f"  {division.capitalize()}: File not found ({filepath})")
 
     # -------------------------------------------------------------------------
-    # Load and process Codeforces problems
+    # Codeforces problems
     # -------------------------------------------------------------------------
     print("\nProcessing Codeforces problems...")
 
@@ -786,16 +833,18 @@ def main():
     cf_data = load_json(cf_filepath)
 
     if cf_data:
-        problems = cf_data.get("problems", [])
-        for problem in problems:
-            std_problem = process_codeforces_problem(problem, validator)
-            all_problems.append(std_problem)
+        problems = cf_data.pop("problems", [])
+        del cf_data
+        for i in range(len(problems)):
+            # Drop each raw problem once processed so its memory can be freed
+            problem, problems[i] = problems[i], None
+            yield process_codeforces_problem(problem, validator)
         print(f"  Processed: {len(problems)} problems")
     else:
         print(f"  File not found ({cf_filepath})")
 
     # -------------------------------------------------------------------------
-    # Load and process AtCoder problems
+    # AtCoder problems
     # -------------------------------------------------------------------------
     print("\nProcessing AtCoder problems...")
 
@@ -803,77 +852,78 @@ def main():
     atcoder_data = load_json(atcoder_filepath)
 
     if atcoder_data:
-        problems = atcoder_data.get("problems", [])
-        for problem in problems:
-            std_problem = process_atcoder_problem(problem, validator)
-            all_problems.append(std_problem)
+        problems = atcoder_data.pop("problems", [])
+        del atcoder_data
+        for i in range(len(problems)):
+            problem, problems[i] = problems[i], None
+            yield process_atcoder_problem(problem, validator)
         print(f"  Processed: {len(problems)} problems")
     else:
         print(f"  File not found ({atcoder_filepath})")
 
-    # -------------------------------------------------------------------------
-    # Validation and Statistics
-    # -------------------------------------------------------------------------
-    validator.report()
 
-    # Statistics
-    print("\n" + "=" * 60)
-    print("Statistics")
+def main():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    output_dir = os.path.join(script_dir, "output")
+
+    parser = argparse.ArgumentParser(
+        description="Standardize problem difficulties into a streaming catalog"
+    )
+    parser.add_argument(
+        "--output", "-o",
+        default=os.path.join(output_dir, "standardized_problems.jsonl.gz"),
+        help="Output catalog (.jsonl, .jsonl.gz or .jsonl.zst; default: %(default)s)",
+    )
+    parser.add_argument(
+        "--legacy-json",
+        action="store_true",
+        help="Also write the old indented standardized_problems.json",
+    )
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Problem Difficulty Standardization")
     print("=" * 60)
 
-    by_source = {}
-    by_rating_range = {
-        "1-25 (Beginner)": 0,
-        "26-50 (Intermediate)": 0,
-        "51-75 (Advanced)": 0,
-        "76-100 (Expert)": 0,
-    }
-
-    for p in all_problems:
-        by_source[p.source] = by_source.get(p.source, 0) + 1
-
-        if p.internal_rating <= 25:
-            by_rating_range["1-25 (Beginner)"] += 1
-        elif p.internal_rating <= 50:
-            by_rating_range["26-50 (Intermediate)"] += 1
-        elif p.internal_rating <= 75:
-            by_rating_range["51-75 (Advanced)"] += 1
-        else:
-            by_rating_range["76-100 (Expert)"] += 1
+    validator = ValidationError()
+    stats = CatalogStatistics()
 
-    print(f"\nTotal problems: {len(all_problems)}")
-    print("\nBy source:")
-    for source, count in sorted(by_source.items()):
-        print(f"  {source}: {count}")
+    def records() -> Iterator[Dict[str, Any]]:
+        for problem in iter_standardized_problems(output_dir, validator):
+            stats.add(problem)
+            yield asdict(problem)
 
-    print("\nBy internal rating range:")
-    for range_name, count in by_rating_range.items():
-        print(f"  {range_name}: {count}")
+    # -------------------------------------------------------------------------
+    # Stream standardized problems straight to disk
+    # -------------------------------------------------------------------------
+    write_catalog(args.output, records(), metadata_factory=stats.metadata)
 
     # -------------------------------------------------------------------------
-    # Save standardized problems
+    # Validation and Statistics
     # -------------------------------------------------------------------------
+    validator.report()
+    stats.report()
+
     print("\n" + "=" * 60)
-    print("Saving output...")
+    print("Output")
     print("=" * 60)
 
-    output_path = os.path.join(output_dir, "standardized_problems.json")
-
-    # Convert to dict for JSON serialization
-    output_data = {
-        "metadata": {
-            "total_problems": len(all_problems),
-            "sources": list(by_source.keys()),
-            "rating_distribution": by_rating_range,
-        },
-        "problems": [asdict(p) for p in all_problems]
-    }
-
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(output_data, f, indent=2, ensure_ascii=False)
-
-    print(f"Saved: {output_path}")
-    print(f"File size: {os.path.getsize(output_path) / (1024*1024):.2f} MB")
+    print(f"Saved: {args.output}")
+    print(f"File size: {os.path.getsize(args.output) / (1024*1024):.2f} MB")
+
+    if args.legacy_json:
+        legacy_path = os.path.join(output_dir, "standardized_problems.json")
+        with open(legacy_path, 'w', encoding='utf-8') as f:
+            f.write('{\n  "metadata": ')
+            json.dump(stats.metadata(), f, ensure_ascii=False)
+            f.write(',\n  "problems": [\n')
+            for i, record in enumerate(iter_catalog(args.output)):
+                if i:
+                    f.write(",\n")
+                f.write("    ")
+                json.dump(record, f, ensure_ascii=False)
+            f.write("\n  ]\n}\n")
+        print(f"Saved legacy catalog: {legacy_path}")
 
     print("\n" + "=" * 60)
     print("Done!")
@@ -0,0 +1,82 @@
+"""
+Test configuration.
+
+Tests run against a throwaway SQLite database, with the background services
+(editorial prefetching, contest packs, contest expiry) switched off. The
+settings are read at import time, so they are set before importing the app.
+"""
+
+import os
+import tempfile
+
+_db_dir = tempfile.mkdtemp(prefix="mastercp-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ["EDITORIAL_PREFETCH_ENABLED"] = "false"
+os.environ["CONTEST_PACKS_ENABLED"] = "false"
+os.environ["CONTEST_EXPIRY_ENABLED"] = "false"
+os.environ["INVALIDATION_BUS"] = "memory"
+
+import itertools
+
+import pytest
+
+from app.database import SessionLocal, init_db
+from app.models import Contest, ContestProblem, ContestStatus, SubmissionStatus, User
+
+_usernames = itertools.count()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    """Create the tables once per test run."""
+    init_db()
+
+
+@pytest.fixture
+def session_factory():
+    return SessionLocal
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def make_contest(db):
+    """Create a user with an active contest of the given problem IDs (no catalog needed)."""
+
+    def make(problem_ids=("p1", "p2", "p3"), rating=30, status=SubmissionStatus.PENDING, **contest_fields):
+        user = User(username=f"user{next(_usernames)}", rating=rating)
+        db.add(user)
+        db.flush()
+        contest = Contest(
+            user_id=user.id,
+            status=ContestStatus.ACTIVE,
+            rating_at_start=rating,
+            num_problems=len(problem_ids),
+            target_difficulty=rating + 10,
+            **contest_fields,
+        )
+        db.add(contest)
+        db.flush()
+        for problem_id in problem_ids:
+            db.add(ContestProblem(
+                contest_id=contest.id,
+                problem_id=problem_id,
+                problem_name=problem_id,
+                problem_url=f"https://example.com/{problem_id}",
+                topic=f"topic_{problem_id}",
+                difficulty=rating + 10,
+                source="test",
+                is_weak_topic_problem=False,
+                status=status,
+            ))
+        db.commit()
+        return contest
+
+    return make
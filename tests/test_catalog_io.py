@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+from app.catalog_io import iter_catalog, write_catalog
+
+
+def test_write_catalog_replaces_the_file(tmp_path):
+    path = str(tmp_path / "problems.jsonl.gz")
+
+    assert write_catalog(path, [{"id": "a"}, {"id": "b"}]) == 2
+
+    assert [record["id"] for record in iter_catalog(path)] == ["a", "b"]
+    assert os.listdir(tmp_path) == ["problems.jsonl.gz"]
+
+
+def test_failed_write_leaves_no_temporary_file(tmp_path):
+    path = str(tmp_path / "problems.jsonl")
+    write_catalog(path, [{"id": "old"}])
+
+    def records():
+        yield {"id": "new"}
+        raise RuntimeError("source failed")
+
+    with pytest.raises(RuntimeError):
+        write_catalog(path, records())
+
+    assert os.listdir(tmp_path) == ["problems.jsonl"]
+    assert [record["id"] for record in iter_catalog(path)] == ["old"]
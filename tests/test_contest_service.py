@@ -0,0 +1,239 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import Contest, ContestProblem, ContestStatus, ProblemHistory, SubmissionStatus, User
+from app.services.contest_service import get_contest_service
+from app.services.rating_service import RatingService
+
+
+def _rating(session_factory, user_id):
+    db = session_factory()
+    try:
+        return db.query(User.rating).filter(User.id == user_id).scalar()
+    finally:
+        db.close()
+
+
+def test_end_contest_applies_ratings_once_for_a_stale_session(session_factory, make_contest):
+    contest = make_contest(rating=30, status=SubmissionStatus.SOLVED)
+    contest_service = get_contest_service()
+
+    first = session_factory()
+    second = session_factory()
+    try:
+        # The second session has already read the contest as active
+        assert second.get(Contest, contest.id).status == ContestStatus.ACTIVE
+
+        result = contest_service.end_contest(first, contest.id)
+        assert result["rating_change"] == RatingService.RATING_INCREASE
+
+        with pytest.raises(ValueError, match="is not active"):
+            contest_service.end_contest(second, contest.id)
+    finally:
+        first.close()
+        second.close()
+
+    assert _rating(session_factory, contest.user_id) == 30 + RatingService.RATING_INCREASE
+
+
+def test_concurrent_end_contest_ends_it_once(session_factory, make_contest):
+    contest = make_contest(rating=30, status=SubmissionStatus.SOLVED)
+    contest_service = get_contest_service()
+    barrier = threading.Barrier(2)
+    outcomes = []
+
+    def end():
+        db = session_factory()
+        try:
+            barrier.wait()
+            contest_service.end_contest(db, contest.id, auto_end=True)
+            outcomes.append("ended")
+        except ValueError as e:
+            outcomes.append(str(e))
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=end) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(outcomes) == sorted(["ended", f"Contest {contest.id} is not active"])
+    assert _rating(session_factory, contest.user_id) == 30 + RatingService.RATING_INCREASE
+
+
+def test_abandon_after_end_is_rejected(db, make_contest):
+    contest = make_contest()
+    contest_service = get_contest_service()
+    contest_service.end_contest(db, contest.id)
+
+    with pytest.raises(ValueError, match="is not active"):
+        contest_service.abandon_contest(db, contest.id)
+    db.expire_all()
+    assert db.get(Contest, contest.id).status == ContestStatus.COMPLETED
+
+
+def _submission(problem_id, solved=True, time_taken_seconds=60):
+    return {
+        "problem_id": problem_id,
+        "solved": solved,
+        "partial": False,
+        "time_taken_seconds": time_taken_seconds,
+        "user_approach": None,
+    }
+
+
+def test_submit_problems_after_the_time_limit_ends_the_contest(db, make_contest):
+    contest = make_contest(
+        problem_ids=("p1", "p2"),
+        started_at=datetime.utcnow() - timedelta(minutes=121),
+        time_limit_minutes=120,
+    )
+
+    outcomes = get_contest_service().submit_problems(
+        db, contest.id, [_submission("unknown"), _submission("p1")],
+    )
+
+    assert [outcome.error for outcome in outcomes] == ["Contest time limit exceeded"] * 2
+    db.expire_all()
+    assert db.get(Contest, contest.id).status == ContestStatus.COMPLETED
+
+
+def test_submit_problems_reports_unknown_problems_per_item(db, make_contest):
+    contest = make_contest(problem_ids=("p1", "p2"))
+
+    outcomes = get_contest_service().submit_problems(
+        db, contest.id, [_submission("unknown"), _submission("p1"), _submission("p2", solved=False)],
+    )
+
+    assert outcomes[0].error == f"Problem unknown not found in contest {contest.id}"
+    assert [(outcome.status, outcome.error) for outcome in outcomes[1:]] == [
+        (SubmissionStatus.SOLVED, None),
+        (SubmissionStatus.FAILED, None),
+    ]
+
+    outcomes = get_contest_service().submit_problems(db, contest.id, [_submission("unknown")])
+    assert outcomes[0].error == f"Problem unknown not found in contest {contest.id}"
+
+
+def test_submit_problems_rechecks_a_contest_that_expired_during_the_batch(db, make_contest, monkeypatch):
+    contest = make_contest(
+        problem_ids=("p1", "p2"),
+        started_at=datetime.utcnow() - timedelta(minutes=121),
+        time_limit_minutes=120,
+    )
+    contest_service = get_contest_service()
+    check_contest = contest_service._check_contest
+    checks = []
+
+    def check_before_the_deadline_once(db, contest_id, now):
+        # The batch's first check still finds the contest open
+        if not checks:
+            now -= timedelta(minutes=2)
+        checks.append(now)
+        return check_contest(db, contest_id, now)
+
+    monkeypatch.setattr(contest_service, "_check_contest", check_before_the_deadline_once)
+    outcomes = contest_service.submit_problems(db, contest.id, [_submission("unknown"), _submission("p1")])
+
+    assert len(checks) == 2
+    assert [outcome.error for outcome in outcomes] == ["Contest time limit exceeded"] * 2
+    db.expire_all()
+    assert db.get(Contest, contest.id).status == ContestStatus.COMPLETED
+
+
+def _start_problem_ago(db, contest, problem_id, seconds):
+    problem = get_contest_service().start_problem(db, contest.id, problem_id)
+    problem.started_at = datetime.utcnow() - timedelta(seconds=seconds)
+    db.commit()
+
+
+def test_submit_problem_takes_the_time_from_the_problem_start(db, make_contest):
+    contest = make_contest(problem_ids=("p1", "p2"))
+    _start_problem_ago(db, contest, "p1", 300)
+    _start_problem_ago(db, contest, "p2", 300)
+    contest_service = get_contest_service()
+
+    outcome = contest_service.submit_problem(db, contest.id, "p1", solved=True)
+    assert outcome.status == SubmissionStatus.SOLVED
+    assert outcome.attempts == 1
+    assert 300 <= outcome.time_taken_seconds <= 305
+
+    outcome = contest_service.submit_problem(db, contest.id, "p2", solved=True, time_taken_seconds=42)
+    assert outcome.time_taken_seconds == 42
+
+
+def test_submit_problems_takes_the_time_from_the_problem_start(db, make_contest):
+    contest = make_contest(problem_ids=("p1", "p2"))
+    _start_problem_ago(db, contest, "p1", 300)
+
+    outcomes = get_contest_service().submit_problems(
+        db, contest.id, [_submission("p1", time_taken_seconds=None), _submission("p2")],
+    )
+
+    assert 300 <= outcomes[0].time_taken_seconds <= 305
+    assert outcomes[1].time_taken_seconds == 60
+    history = db.query(ProblemHistory).filter(
+        ProblemHistory.user_id == contest.user_id, ProblemHistory.problem_id == "p1",
+    ).one()
+    assert history.best_time_seconds == outcomes[0].time_taken_seconds
+
+
+def test_submit_problems_counts_duplicates_as_attempts(db, make_contest):
+    contest = make_contest(problem_ids=("p1", "p2"))
+
+    outcomes = get_contest_service().submit_problems(
+        db, contest.id, [_submission("p1", solved=False), _submission("p2"), _submission("p1")],
+    )
+
+    assert [(outcome.problem_id, outcome.status, outcome.attempts) for outcome in outcomes] == [
+        ("p1", SubmissionStatus.FAILED, 1),
+        ("p2", SubmissionStatus.SOLVED, 1),
+        ("p1", SubmissionStatus.SOLVED, 2),
+    ]
+    db.expire_all()
+    problem = db.query(ContestProblem).filter(
+        ContestProblem.contest_id == contest.id, ContestProblem.problem_id == "p1",
+    ).one()
+    assert (problem.status, problem.attempts) == (SubmissionStatus.SOLVED, 2)
+    history = db.query(ProblemHistory).filter(
+        ProblemHistory.user_id == contest.user_id, ProblemHistory.problem_id == "p1",
+    ).one()
+    assert (history.times_attempted, history.times_solved) == (2, 1)
+
+
+def test_submit_problem_rejects_unknown_problems(db, make_contest):
+    contest = make_contest(problem_ids=("p1",))
+
+    with pytest.raises(ValueError, match=f"Problem unknown not found in contest {contest.id}"):
+        get_contest_service().submit_problem(db, contest.id, "unknown", solved=True)
+
+
+def test_submissions_to_an_ended_contest_are_rejected(db, make_contest):
+    contest = make_contest(problem_ids=("p1",))
+    contest_service = get_contest_service()
+    contest_service.end_contest(db, contest.id)
+
+    with pytest.raises(ValueError, match="is not active"):
+        contest_service.submit_problem(db, contest.id, "p1", solved=True)
+    outcomes = contest_service.submit_problems(db, contest.id, [_submission("p1")])
+    assert outcomes[0].error == f"Contest {contest.id} is not active"
+
+
+def test_submit_problem_after_the_time_limit_ends_the_contest(db, make_contest):
+    contest = make_contest(
+        problem_ids=("p1",),
+        started_at=datetime.utcnow() - timedelta(minutes=121),
+        time_limit_minutes=120,
+    )
+
+    with pytest.raises(ValueError, match="Contest time limit exceeded"):
+        get_contest_service().submit_problem(db, contest.id, "p1", solved=True)
+    db.expire_all()
+    assert db.get(Contest, contest.id).status == ContestStatus.COMPLETED
+    # Ending the contest failed the problem; the late submission was not counted
+    problem = db.query(ContestProblem).filter(ContestProblem.contest_id == contest.id).one()
+    assert (problem.status, problem.attempts) == (SubmissionStatus.FAILED, 0)
@@ -0,0 +1,15 @@
+from app.services import editorial_prefetcher
+from app.services.editorial_prefetcher import FAILURE_RETRY_SECONDS, EditorialPrefetcher
+
+
+def test_failures_older_than_the_retry_interval_are_dropped(monkeypatch):
+    prefetcher = EditorialPrefetcher()
+    clock = [1000.0]
+    monkeypatch.setattr(editorial_prefetcher.time, "time", lambda: clock[0])
+
+    prefetcher._record_failure(1)
+    prefetcher._record_failure(2)
+    clock[0] += FAILURE_RETRY_SECONDS
+    prefetcher._record_failure(3)
+
+    assert set(prefetcher._failures) == {3}
@@ -0,0 +1,33 @@
+from app.services import exclusion_service
+from app.services.exclusion_service import ExclusionService
+from app.services.problem_service import ProblemService
+
+
+def _record(problem_id, topic="dp"):
+    return {
+        "id": problem_id,
+        "name": problem_id,
+        "url": f"https://example.com/{problem_id}",
+        "source": "test",
+        "internal_rating": 40,
+        "pattern_id": topic,
+    }
+
+
+def test_record_attempt_excludes_every_copy_of_a_repeated_id(db, monkeypatch):
+    problem_service = ProblemService(problems_file="/nonexistent/catalog.jsonl.gz")
+    # "dup" is in the catalog twice (under two topics)
+    problem_service.load_records([
+        _record("a"), _record("dup"), _record("b", "graphs"), _record("dup", "graphs"),
+    ])
+    both_copies = problem_service.exclusion_bitset(["dup"])
+    assert both_copies.bit_count() == 2
+
+    monkeypatch.setattr(exclusion_service, "get_problem_service", lambda: problem_service)
+    service = ExclusionService()
+    # Cache an (empty) bitset for a user with no history
+    assert service.get_bitset(db, user_id=1) == 0
+
+    service.record_attempt(1, "dup")
+
+    assert service.get_bitset(db, user_id=1) == both_copies
@@ -0,0 +1,15 @@
+import os
+
+from app.services.model_catalog import ModelCatalog
+
+
+def test_failed_save_removes_the_temporary_file(tmp_path):
+    # A directory where the catalog file should be makes the rename fail
+    path = tmp_path / "catalog.json"
+    path.mkdir()
+    catalog = ModelCatalog(path=str(path))
+    catalog._entries["key"] = {"models": ["gemini-2.5-flash"], "fetched_at": 1.0}
+
+    catalog._save()
+
+    assert os.listdir(tmp_path) == ["catalog.json"]
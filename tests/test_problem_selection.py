@@ -0,0 +1,52 @@
+import pytest
+
+from app.services.problem_service import ProblemService
+from app.services.selection_engine import numpy_available
+
+TOPICS = [f"topic{index}" for index in range(8)]
+
+
+def _catalog():
+    # Five problems per topic around the target difficulty
+    return [
+        {
+            "id": f"{topic}-{index}",
+            "name": f"{topic}-{index}",
+            "url": f"https://example.com/{topic}/{index}",
+            "source": "test",
+            "internal_rating": 36 + 2 * index,
+            "pattern_id": topic,
+        }
+        for topic in TOPICS
+        for index in range(5)
+    ]
+
+
+@pytest.mark.parametrize("topic_scheduler", ["weighted", "shuffle"])
+@pytest.mark.parametrize("selection_engine", ["python", "numpy"])
+def test_selection_respects_exclusions_and_spreads_topics(selection_engine, topic_scheduler):
+    if selection_engine == "numpy" and not numpy_available():
+        pytest.skip("numpy is not installed")
+    problem_service = ProblemService(
+        problems_file="/nonexistent/catalog.jsonl.gz",
+        selection_engine=selection_engine,
+        topic_scheduler=topic_scheduler,
+    )
+    problem_service.load_records(_catalog())
+    # Most of every topic is excluded: two problems per topic remain
+    excluded_ids = {f"{topic}-{index}" for topic in TOPICS for index in (0, 2, 4)}
+
+    for _ in range(20):
+        selected = problem_service.select_problems_for_contest(
+            target_difficulty=40,
+            num_problems=5,
+            weak_topics=["topic0", "topic1"],
+            excluded_problem_ids=excluded_ids,
+        )
+
+        ids = [item["problem"].id for item in selected]
+        assert len(selected) == 5
+        assert not excluded_ids & set(ids)
+        assert len(set(ids)) == len(ids)
+        assert len({item["topic"] for item in selected}) == len(selected)
+        assert sum(item["is_weak_topic_problem"] for item in selected) == 1
@@ -0,0 +1,24 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app import profiling
+from app.profiling import SamplingProfiler, check_admin_token
+
+
+def test_check_admin_token_handles_non_ascii_tokens(monkeypatch):
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", "sécret")
+
+    assert check_admin_token("sécret")
+    assert not check_admin_token("secret")
+    assert not check_admin_token("é")
+    assert not check_admin_token(None)
+
+
+def test_sampler_skips_idle_threadpool_workers():
+    profiler = SamplingProfiler()
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="idle-pool") as pool:
+        pool.submit(lambda: None).result()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        profiler._sample(threading.get_ident(), names)
+
+    assert not [stack for stack in profiler._stacks if stack.startswith("idle-pool")]
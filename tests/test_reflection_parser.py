@@ -0,0 +1,27 @@
+import pytest
+
+from app.services.reflection_parser import IncrementalJSONParser, parse_tolerant
+
+
+@pytest.mark.parametrize("response, expected", [
+    (
+        '{"tips": ["a" "b"], "what_to_improve": "x"}',
+        {"tips": ["a", "b"], "what_to_improve": "x"},
+    ),
+    (
+        '{"pivot_sentence": "x" "tips": ["a"]}',
+        {"pivot_sentence": "x", "tips": ["a"]},
+    ),
+    (
+        '{"pivot_sentence": "say "two pointers" here", "tips": "a "" b"}',
+        {"pivot_sentence": 'say "two pointers" here', "tips": 'a "" b'},
+    ),
+])
+def test_adjacent_strings_are_separate_values(response, expected):
+    assert parse_tolerant(response) == expected
+
+    # The same when streamed a character at a time
+    parser = IncrementalJSONParser()
+    for char in response:
+        parser.feed(char)
+    assert parser.finish() == expected
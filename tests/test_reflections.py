@@ -0,0 +1,40 @@
+import asyncio
+
+from app.models import ContestProblem, ProblemReflection
+from app.routers.reflections import EditorialInput, _resolve_editorial, submit_editorial
+from app.services.editorial_store import get_editorial_store
+
+
+def _contest_problem(db, contest):
+    return db.query(ContestProblem).filter(ContestProblem.contest_id == contest.id).one()
+
+
+def test_pasted_editorials_are_not_shared_with_other_users(db, make_contest):
+    first = _contest_problem(db, make_contest(problem_ids=("pasted-p1",)))
+    second = _contest_problem(db, make_contest(problem_ids=("pasted-p1",)))
+
+    asyncio.run(submit_editorial(
+        first.contest_id, first.id, EditorialInput(editorial_text="First user's notes"), db,
+    ))
+    own = db.query(ProblemReflection).filter(ProblemReflection.contest_problem_id == first.id).one()
+    assert _resolve_editorial(db, first, own)[0] == "First user's notes"
+
+    other = ProblemReflection(contest_problem_id=second.id)
+    assert _resolve_editorial(db, second, other) == (None, None)
+    assert other.editorial_id is None
+
+    # A fetched editorial is shared
+    get_editorial_store().put(
+        db, "Official editorial", problem_id="pasted-p1",
+        source_url="https://example.com/editorial", source="codeforces",
+    )
+    db.commit()
+    assert _resolve_editorial(db, second, other) == ("Official editorial", "https://example.com/editorial")
+
+
+def test_legacy_pasted_mappings_are_ignored(db):
+    store = get_editorial_store()
+    store.put(db, "Pasted before the fix", problem_id="legacy-p1")
+    db.commit()
+
+    assert store.get_for_problem(db, "legacy-p1") is None
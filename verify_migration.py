@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Migration Verification Script
+
+Verifies that a PostgreSQL (Neon) database holds the same data as the SQLite
+database it was migrated from, without pulling whole tables to the client.
+
+How it works:
+- Every row is turned into a canonical text form inside the database and
+  hashed with MD5 (built into PostgreSQL, registered as a function for SQLite).
+- For a range of primary keys, each side returns one row per bucket with the
+  row count and the sum of two 32-bit slices of the row hashes. The sums are
+  order-independent, so both databases can aggregate in any order.
+- Buckets that differ are split again (bisection with fan-out) until a range
+  is small enough to compare per-row hashes, which pinpoints the exact rows.
+
+A matching table costs one MIN/MAX query and one GROUP BY query per side.
+
+Usage:
+    python verify_migration.py
+    python verify_migration.py --sqlite-path ./mastercp.db --database-url postgresql://...
+"""
+
+import argparse
+import hashlib
+import math
+import os
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+# Number of sub-ranges each mismatching range is split into
+FANOUT = 16
+
+# Ranges spanning at most this many ids are compared row by row
+LEAF_SPAN = 64
+
+# Stop collecting differences for a table after this many rows
+MAX_DIFFERENCES = 1000
+
+# Number of differing rows printed per table
+MAX_REPORTED_ROWS = 20
+
+# Separator between canonical column values (ASCII unit separator)
+COLUMN_SEPARATOR = 31
+
+
+@dataclass
+class RowDifference:
+    """A single row that differs between source and target."""
+
+    row_id: int
+    kind: str  # "missing_in_target", "extra_in_target" or "changed"
+    columns: List[str] = field(default_factory=list)
+
+
+@dataclass
+class TableVerification:
+    """Verification result for one table."""
+
+    table: str
+    source_rows: int = 0
+    target_rows: int = 0
+    queries: int = 0
+    differences: List[RowDifference] = field(default_factory=list)
+    truncated: bool = False
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.differences
+
+
+def _register_sqlite_functions(dbapi_connection, connection_record):
+    """Register the hash helpers SQLite lacks."""
+    dbapi_connection.create_function(
+        "md5",
+        1,
+        lambda value: hashlib.md5(value.encode("utf-8")).hexdigest() if value is not None else None,
+        deterministic=True,
+    )
+    dbapi_connection.create_function(
+        "hex_to_int",
+        1,
+        lambda value: int(value, 16) if value else 0,
+        deterministic=True,
+    )
+
+
+def prepare_engine(engine):
+    """Make an engine ready for verification queries."""
+    from sqlalchemy import event
+
+    if engine.dialect.name == "sqlite" and not event.contains(
+        engine, "connect", _register_sqlite_functions
+    ):
+        event.listen(engine, "connect", _register_sqlite_functions)
+        # Connections opened before the listener was added lack the functions
+        engine.dispose()
+    return engine
+
+
+def _column_text(column, dialect: str) -> str:
+    """SQL expression rendering one column as canonical text (NULL-safe)."""
+    from sqlalchemy import Boolean, DateTime, LargeBinary
+
+    name = f'"{column.name}"'
+
+    if isinstance(column.type, Boolean):
+        value = (
+            f"CASE WHEN {name} THEN '1' ELSE '0' END"
+            if dialect == "postgresql"
+            else f"CAST(CAST({name} AS INTEGER) AS TEXT)"
+        )
+    elif isinstance(column.type, DateTime):
+        # Second precision (SQLite defaults store no fractional seconds);
+        # SQLite text is cut before parsing so fractions are truncated, not rounded
+        value = (
+            f"to_char({name}, 'YYYY-MM-DD HH24:MI:SS')"
+            if dialect == "postgresql"
+            else f"strftime('%Y-%m-%d %H:%M:%S', substr({name}, 1, 19))"
+        )
+    elif isinstance(column.type, LargeBinary):
+        value = f"encode({name}, 'hex')" if dialect == "postgresql" else f"lower(hex({name}))"
+    else:
+        value = f"CAST({name} AS TEXT)"
+
+    # Prefix non-NULL values so NULL and any string value can never collide
+    return f"COALESCE('=' || {value}, '!')"
+
+
+def _row_text(columns, dialect: str) -> str:
+    """SQL expression rendering a whole row as canonical text."""
+    separator = f"chr({COLUMN_SEPARATOR})" if dialect == "postgresql" else f"char({COLUMN_SEPARATOR})"
+    return f" || {separator} || ".join(_column_text(c, dialect) for c in columns)
+
+
+def _hash_slice(expression: str, start: int, dialect: str) -> str:
+    """SQL expression turning 8 hex digits of an MD5 hash into an integer."""
+    if dialect == "postgresql":
+        return f"('x' || substr({expression}, {start}, 8))::bit(32)::bigint"
+    return f"hex_to_int(substr({expression}, {start}, 8))"
+
+
+class TableSide:
+    """One side (source or target) of a table comparison."""
+
+    def __init__(self, engine, table, columns, key: str):
+        self.engine = engine
+        self.dialect = engine.dialect.name
+        self.table = table
+        self.columns = columns
+        self.key = key
+        self.row_text = _row_text(columns, self.dialect)
+
+    def _execute(self, sql: str, params: Optional[dict] = None):
+        from sqlalchemy import text
+
+        with self.engine.connect() as conn:
+            return conn.execute(text(sql), params or {}).fetchall()
+
+    def bounds(self) -> Tuple[Optional[int], Optional[int], int]:
+        """Return (min key, max key, row count)."""
+        row = self._execute(
+            f'SELECT MIN("{self.key}"), MAX("{self.key}"), COUNT(*) FROM "{self.table}"'
+        )[0]
+        return row[0], row[1], row[2]
+
+    def bucket_hashes(self, lo: int, hi: int, width: int) -> Dict[int, Tuple[int, int, int]]:
+        """Return {bucket: (count, hash sum 1, hash sum 2)} for keys in [lo, hi)."""
+        rows = self._execute(
+            f"""
+            SELECT bucket, COUNT(*), SUM({_hash_slice("h", 1, self.dialect)}),
+                   SUM({_hash_slice("h", 9, self.dialect)})
+            FROM (
+                SELECT ("{self.key}" - :lo) / :width AS bucket, md5({self.row_text}) AS h
+                FROM "{self.table}"
+                WHERE "{self.key}" >= :lo AND "{self.key}" < :hi
+            ) hashed
+            GROUP BY bucket
+            """,
+            {"lo": lo, "hi": hi, "width": width},
+        )
+        return {int(r[0]): (int(r[1]), int(r[2]), int(r[3])) for r in rows}
+
+    def row_hashes(self, lo: int, hi: int) -> Dict[int, str]:
+        """Return {key: row hash} for keys in [lo, hi)."""
+        rows = self._execute(
+            f"""
+            SELECT "{self.key}", md5({self.row_text})
+            FROM "{self.table}"
+            WHERE "{self.key}" >= :lo AND "{self.key}" < :hi
+            """,
+            {"lo": lo, "hi": hi},
+        )
+        return {int(r[0]): r[1] for r in rows}
+
+    def column_values(self, keys: List[int]) -> Dict[int, Tuple[str, ...]]:
+        """Return canonical column texts for a few rows."""
+        if not keys:
+            return {}
+        placeholders = ", ".join(f":k{i}" for i in range(len(keys)))
+        column_texts = ", ".join(_column_text(c, self.dialect) for c in self.columns)
+        rows = self._execute(
+            f'SELECT "{self.key}", {column_texts} FROM "{self.table}" '
+            f'WHERE "{self.key}" IN ({placeholders})',
+            {f"k{i}": k for i, k in enumerate(keys)},
+        )
+        return {int(r[0]): tuple(r[1:]) for r in rows}
+
+
+def verify_table(source_engine, target_engine, table) -> TableVerification:
+    """Compare one table between source and target by checksum bisection."""
+    from sqlalchemy import Integer, inspect
+
+    result = TableVerification(table=table.name)
+
+    pk_columns = list(table.primary_key.columns)
+    if len(pk_columns) != 1 or not isinstance(pk_columns[0].type, Integer):
+        result.error = "verification needs a single integer primary key"
+        return result
+    key = pk_columns[0].name
+
+    # Only compare columns present on both sides
+    source_columns = {c["name"] for c in inspect(source_engine).get_columns(table.name)}
+    target_columns = {c["name"] for c in inspect(target_engine).get_columns(table.name)}
+    columns = [
+        c for c in table.columns if c.name in source_columns and c.name in target_columns
+    ]
+
+    source = TableSide(source_engine, table.name, columns, key)
+    target = TableSide(target_engine, table.name, columns, key)
+
+    source_min, source_max, result.source_rows = source.bounds()
+    target_min, target_max, result.target_rows = target.bounds()
+    result.queries += 2
+
+    mins = [v for v in (source_min, target_min) if v is not None]
+    maxs = [v for v in (source_max, target_max) if v is not None]
+    if not mins:
+        return result  # Both sides empty
+
+    def compare_rows(lo: int, hi: int) -> None:
+        source_hashes = source.row_hashes(lo, hi)
+        target_hashes = target.row_hashes(lo, hi)
+        result.queries += 2
+
+        for row_id in sorted(set(source_hashes) | set(target_hashes)):
+            if len(result.differences) >= MAX_DIFFERENCES:
+                result.truncated = True
+                return
+            if row_id not in target_hashes:
+                result.differences.append(RowDifference(row_id, "missing_in_target"))
+            elif row_id not in source_hashes:
+                result.differences.append(RowDifference(row_id, "extra_in_target"))
+            elif source_hashes[row_id] != target_hashes[row_id]:
+                result.differences.append(RowDifference(row_id, "changed"))
+
+    def compare_range(lo: int, hi: int) -> None:
+        if result.truncated:
+            return
+        if hi - lo <= LEAF_SPAN:
+            compare_rows(lo, hi)
+            return
+
+        width = math.ceil((hi - lo) / FANOUT)
+        source_buckets = source.bucket_hashes(lo, hi, width)
+        target_buckets = target.bucket_hashes(lo, hi, width)
+        result.queries += 2
+
+        for bucket in sorted(set(source_buckets) | set(target_buckets)):
+            if source_buckets.get(bucket) != target_buckets.get(bucket):
+                bucket_lo = lo + bucket * width
+                compare_range(bucket_lo, min(hi, bucket_lo + width))
+
+    compare_range(min(mins), max(maxs) + 1)
+
+    # Name the differing columns for the rows we will report
+    changed = [d for d in result.differences if d.kind == "changed"][:MAX_REPORTED_ROWS]
+    if changed:
+        keys = [d.row_id for d in changed]
+        source_values = source.column_values(keys)
+        target_values = target.column_values(keys)
+        result.queries += 2
+        for difference in changed:
+            before = source_values.get(difference.row_id, ())
+            after = target_values.get(difference.row_id, ())
+            difference.columns = [
+                column.name
+                for column, a, b in zip(columns, before, after)
+                if a != b
+            ]
+
+    return result
+
+
+def verify_migration(source_engine, target_engine, table_names=None) -> List[TableVerification]:
+    """Verify all application tables that exist in both databases."""
+    from sqlalchemy import inspect
+
+    from app import models  # noqa: F401 - registers the tables
+    from app.database import Base
+
+    prepare_engine(source_engine)
+    prepare_engine(target_engine)
+
+    source_tables = set(inspect(source_engine).get_table_names())
+    target_tables = set(inspect(target_engine).get_table_names())
+
+    results = []
+    for table in Base.metadata.sorted_tables:
+        if table_names and table.name not in table_names:
+            continue
+        if table.name not in source_tables or table.name not in target_tables:
+            continue
+
+        try:
+            results.append(verify_table(source_engine, target_engine, table))
+        except Exception as e:
+            results.append(TableVerification(table=table.name, error=str(e)))
+
+    return results
+
+
+def print_report(results: List[TableVerification]) -> bool:
+    """Print a verification report. Returns True when everything matched."""
+    print("\n" + "=" * 60)
+    print("MIGRATION VERIFICATION (CHECKSUMS)")
+    print("=" * 60)
+
+    all_ok = True
+    total_queries = 0
+    for result in results:
+        total_queries += result.queries
+        if result.error:
+            all_ok = False
+            print(f"⚠️  {result.table}: {result.error}")
+            continue
+
+        if result.ok:
+            print(f"✅ {result.table}: {result.source_rows} rows match ({result.queries} queries)")
+            continue
+
+        all_ok = False
+        more = "+" if result.truncated else ""
+        print(
+            f"❌ {result.table}: {len(result.differences)}{more} differing rows "
+            f"(source {result.source_rows}, target {result.target_rows}, {result.queries} queries)"
+        )
+        for difference in result.differences[:MAX_REPORTED_ROWS]:
+            detail = f" columns: {', '.join(difference.columns)}" if difference.columns else ""
+            print(f"   - id {difference.row_id}: {difference.kind}{detail}")
+        if len(result.differences) > MAX_REPORTED_ROWS:
+            print(f"   ... and {len(result.differences) - MAX_REPORTED_ROWS} more")
+
+    print(f"\nTotal verification queries: {total_queries}")
+    return all_ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify a SQLite to PostgreSQL migration")
+    parser.add_argument("--sqlite-path", help="Source SQLite database (default: ./mastercp.db)")
+    parser.add_argument("--database-url", help="Target PostgreSQL URL (default: DATABASE_URL from .env)")
+    parser.add_argument("--table", action="append", help="Only verify this table (repeatable)")
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+
+    from migrate_to_neon import check_neon_url, get_sqlite_engine
+
+    if not check_neon_url():
+        return 1
+
+    sqlite_engine = get_sqlite_engine(args.sqlite_path)
+    if sqlite_engine is None:
+        print("❌ SQLite database not found")
+        return 1
+
+    from app.database import engine as pg_engine
+
+    results = verify_migration(sqlite_engine, pg_engine, args.table)
+    return 0 if print_report(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())